@@ -0,0 +1,357 @@
+"""
+Vectorized per-user analytics.
+
+`load_window` reads the last WINDOW_DAYS of one user's events into NumPy
+arrays with one query per table over a single connection; everything
+else works on those arrays:
+
+    window = analytics.load_window(user_id)
+    analytics.metabolic_stats(window)      # == database.get_metabolic_stats
+    analytics.weekly_summary(window)       # == database.get_weekly_summary
+    analytics.rolling_daily_average(window, "calories", 7)
+    analytics.weight_regression(window)    # least-squares kg/week
+
+The two summaries return exactly the dicts of their database counterparts
+(same keys, same rounding, same ordering of days and symptom ties), which
+stay as the readable reference implementation and are what the tests
+compare against. Sums are accumulated in the same row order as the dict
+loops, so floats match to the last bit.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import database
+import metrics
+
+WINDOW_DAYS = 30
+WEEK_DAYS = 7
+# get_metabolic_stats reads the 30 latest weigh-ins, the weekly summary the 7 latest
+WEIGHT_LIMIT = 30
+WEEKLY_WEIGHT_LIMIT = 7
+
+# upper bound when no `now` is given: like the database functions, count everything logged
+LATEST = "9999-12-31T23:59:59.999999"
+
+ELECTROLYTE_SYMPTOMS = ('dizziness', 'weakness', 'cramps', 'headache')
+NEGATIVE_ENERGY_SYMPTOMS = ('low_energy', 'brain_fog')
+
+
+@dataclass(slots=True)
+class UserWindow:
+    """One user's recent events as columns, newest first (the history functions' order)"""
+    now: datetime
+    start_date: Optional[str]
+    meal_datetime: np.ndarray       # str
+    meal_strict: np.ndarray         # bool
+    meal_calories: np.ndarray       # float64
+    meal_protein: np.ndarray        # float64
+    meal_fat: np.ndarray            # float64
+    symptom_datetime: np.ndarray    # str
+    symptom_type: np.ndarray        # str
+    symptom_severity: np.ndarray    # int64
+    fast_start: np.ndarray          # str
+    fast_hours: np.ndarray          # float64, rounded to 0.1 like get_fasting_history
+    weight_datetime: np.ndarray     # str, latest WEIGHT_LIMIT weigh-ins
+    weight_kg: np.ndarray           # float64
+
+    def cutoff(self, days: int) -> str:
+        return (self.now - timedelta(days=days)).isoformat()
+
+
+# =============================================================================
+# LOADING
+# =============================================================================
+
+def _columns(rows: List[Tuple], dtypes: Tuple) -> List[np.ndarray]:
+    if not rows:
+        return [np.zeros(0, dtype=dtype) for dtype in dtypes]
+    return [np.array(column, dtype=dtype) for column, dtype in zip(zip(*rows), dtypes)]
+
+
+def _fast_hours(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    if not len(starts):
+        return np.zeros(0)
+    micros = (ends.astype("datetime64[us]") - starts.astype("datetime64[us]")).astype(np.int64)
+    # per-element Python round, as get_fasting_history does (np.round rounds differently)
+    return np.array([round(h, 1) for h in (micros / 1e6 / 3600).tolist()])
+
+
+@metrics.timed_fn("analytics.load_window")
+def load_window(user_id: int, now: Optional[datetime] = None) -> UserWindow:
+    """
+    Read the user's last WINDOW_DAYS of events (and latest weigh-ins) into
+    arrays. An explicit `now` (a report for a past date) also drops
+    anything logged after it.
+    """
+    until = now.isoformat() if now is not None else LATEST
+    now = now or datetime.now()
+    cutoff = (now - timedelta(days=WINDOW_DAYS)).isoformat()
+    conn = database.get_connection(user_id)
+    try:
+        meals = conn.execute(
+            '''SELECT datetime, carnivore_level = 'strict', calories, protein_g, fat_g
+               FROM meal_events WHERE user_id = ? AND datetime >= ? AND datetime <= ?
+               ORDER BY datetime DESC''',
+            (user_id, cutoff, until)
+        ).fetchall()
+        symptoms = conn.execute(
+            '''SELECT datetime, symptom_type, severity
+               FROM symptom_events WHERE user_id = ? AND datetime >= ? AND datetime <= ?
+               ORDER BY datetime DESC''',
+            (user_id, cutoff, until)
+        ).fetchall()
+        fasts = conn.execute(
+            '''SELECT start_time, end_time FROM fasting_events
+               WHERE user_id = ? AND end_time IS NOT NULL AND start_time >= ? AND end_time <= ?
+               ORDER BY start_time DESC''',
+            (user_id, cutoff, until)
+        ).fetchall()
+        weights = conn.execute(
+            '''SELECT datetime, weight_kg FROM weight_events WHERE user_id = ? AND datetime <= ?
+               ORDER BY datetime DESC LIMIT ?''',
+            (user_id, until, WEIGHT_LIMIT)
+        ).fetchall()
+        user = conn.execute("SELECT first_seen FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    finally:
+        conn.close()
+
+    meal_datetime, meal_strict, meal_calories, meal_protein, meal_fat = _columns(
+        meals, (str, np.bool_, np.float64, np.float64, np.float64))
+    symptom_datetime, symptom_type, symptom_severity = _columns(symptoms, (str, str, np.int64))
+    fast_start, fast_end = _columns(fasts, (str, str))
+    weight_datetime, weight_kg = _columns(weights, (str, np.float64))
+    return UserWindow(
+        now=now,
+        start_date=user[0] if user else None,
+        meal_datetime=meal_datetime,
+        meal_strict=meal_strict,
+        meal_calories=meal_calories,
+        meal_protein=meal_protein,
+        meal_fat=meal_fat,
+        symptom_datetime=symptom_datetime,
+        symptom_type=symptom_type,
+        symptom_severity=symptom_severity,
+        fast_start=fast_start,
+        fast_hours=_fast_hours(fast_start, fast_end),
+        weight_datetime=weight_datetime,
+        weight_kg=weight_kg,
+    )
+
+
+# =============================================================================
+# BUCKETING
+# =============================================================================
+
+def _day_buckets(datetimes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Day keys newest first (the order the dict loops first meet them, since
+    rows are newest first) and each row's bucket index into them.
+    """
+    days, inverse = np.unique(datetimes.astype("U10"), return_inverse=True)
+    return days[::-1], len(days) - 1 - inverse
+
+
+def _bucket_sums(index: np.ndarray, n: int, values: np.ndarray) -> np.ndarray:
+    # bincount accumulates in row order, like `daily[day] += value`
+    return np.bincount(index, weights=values, minlength=n)
+
+
+def _ranked_counts(values: np.ndarray, top: int = 3) -> List[Tuple[str, int]]:
+    """Most frequent values; ties keep first-seen order, as sorted(dict.items()) does"""
+    if not len(values):
+        return []
+    names, first, counts = np.unique(values, return_index=True, return_counts=True)
+    order = np.lexsort((first, -counts))[:top]
+    return list(zip(names[order].tolist(), counts[order].tolist()))
+
+
+def _weight_change(weight_kg: np.ndarray) -> Optional[float]:
+    return float(weight_kg[0] - weight_kg[-1]) if len(weight_kg) >= 2 else None
+
+
+# =============================================================================
+# SUMMARIES
+# =============================================================================
+
+@metrics.timed_fn("analytics.metabolic_stats")
+def metabolic_stats(window: UserWindow) -> Dict:
+    """Same dict as database.get_metabolic_stats, from the loaded window"""
+    days_on_protocol = database._days_on_protocol(window.start_date, window.now)
+
+    recent = window.meal_datetime >= window.cutoff(WEEK_DAYS)
+    if recent.any():
+        days, index = _day_buckets(window.meal_datetime[recent])
+        n = len(days)
+        # sums across days in the same newest-first order as the dict version
+        total_protein = sum(_bucket_sums(index, n, window.meal_protein[recent]).tolist())
+        total_fat = sum(_bucket_sums(index, n, window.meal_fat[recent]).tolist())
+        total_calories = sum(_bucket_sums(index, n, window.meal_calories[recent]).tolist())
+
+        avg_daily_protein = round(total_protein / n, 1)
+        avg_daily_fat = round(total_fat / n, 1)
+        avg_daily_calories = round(total_calories / n, 0)
+        avg_fat_protein_ratio = round(avg_daily_fat / avg_daily_protein, 2) if avg_daily_protein > 0 else 0
+    else:
+        avg_daily_protein = 0
+        avg_daily_fat = 0
+        avg_daily_calories = 0
+        avg_fat_protein_ratio = 0
+
+    meal_count = len(window.meal_strict)
+    if meal_count:
+        carnivore_compliance = round((int(window.meal_strict.sum()) / meal_count) * 100, 1)
+    else:
+        carnivore_compliance = 100.0
+
+    fast_count = len(window.fast_hours)
+    if fast_count:
+        fasting_frequency = round(fast_count / 4.3, 1)
+        avg_fasting_duration = round(sum(window.fast_hours.tolist()) / fast_count, 1)
+    else:
+        fasting_frequency = 0
+        avg_fasting_duration = 0
+
+    symptom_count = len(window.symptom_type)
+    if symptom_count:
+        symptom_frequency = round(symptom_count / 4.3, 1)
+        common_symptoms = [name for name, _ in _ranked_counts(window.symptom_type)]
+
+        severity = window.symptom_severity
+        electrolyte = np.isin(window.symptom_type, ELECTROLYTE_SYMPTOMS)
+        electrolyte_risk = database._electrolyte_risk(int(severity[electrolyte].sum()))
+
+        positive = window.symptom_type == 'high_energy'
+        negative = np.isin(window.symptom_type, NEGATIVE_ENERGY_SYMPTOMS)
+        energy_count = int(positive.sum() + negative.sum())
+        energy_total = int(severity[positive].sum() - severity[negative].sum())
+        energy_trend = database._energy_trend(energy_total / energy_count if energy_count else None)
+    else:
+        symptom_frequency = 0
+        common_symptoms = []
+        electrolyte_risk = "low"
+        energy_trend = "unknown"
+
+    weight_change = _weight_change(window.weight_kg)
+    weight_trend = database._weight_trend(round(weight_change, 1)) if weight_change is not None else "insufficient data"
+
+    keto_adaptation_score = database._keto_adaptation_score(
+        days_on_protocol, carnivore_compliance, avg_fat_protein_ratio, electrolyte_risk, avg_fasting_duration)
+
+    return {
+        "keto_adaptation_score": keto_adaptation_score,
+        "keto_adaptation_label": database._get_keto_label(keto_adaptation_score),
+        "electrolyte_risk": electrolyte_risk,
+        "energy_trend": energy_trend,
+        "days_on_protocol": days_on_protocol,
+        "avg_daily_protein": avg_daily_protein,
+        "avg_daily_fat": avg_daily_fat,
+        "avg_daily_calories": avg_daily_calories,
+        "avg_fat_protein_ratio": avg_fat_protein_ratio,
+        "fasting_frequency": fasting_frequency,
+        "avg_fasting_duration": avg_fasting_duration,
+        "symptom_frequency": symptom_frequency,
+        "common_symptoms": common_symptoms,
+        "weight_trend": weight_trend,
+        "carnivore_compliance": carnivore_compliance,
+    }
+
+
+@metrics.timed_fn("analytics.weekly_summary")
+def weekly_summary(window: UserWindow) -> Dict:
+    """Same dict as database.get_weekly_summary, from the loaded window"""
+    cutoff = window.cutoff(WEEK_DAYS)
+    recent = window.meal_datetime >= cutoff
+    days, index = _day_buckets(window.meal_datetime[recent])
+    n = len(days)
+    calories = _bucket_sums(index, n, window.meal_calories[recent]).tolist()
+    protein = _bucket_sums(index, n, window.meal_protein[recent]).tolist()
+    fat = _bucket_sums(index, n, window.meal_fat[recent]).tolist()
+    meals = np.bincount(index, minlength=n).tolist()
+    strict = np.bincount(index, weights=window.meal_strict[recent], minlength=n).astype(np.int64).tolist()
+    daily_breakdown = {
+        day: {'calories': calories[i], 'protein': protein[i], 'fat': fat[i], 'meals': meals[i], 'strict': strict[i]}
+        for i, day in enumerate(days.tolist())
+    }
+
+    total_meals = sum(meals)
+    total_strict = sum(strict)
+    total_calories = sum(calories)
+    total_protein = sum(protein)
+    total_fat = sum(fat)
+
+    symptom_types = window.symptom_type[window.symptom_datetime >= cutoff]
+    fast_hours = window.fast_hours[window.fast_start >= cutoff]
+    weight_change = _weight_change(window.weight_kg[:WEEKLY_WEIGHT_LIMIT]) or 0.0
+
+    return {
+        "days_tracked": n,
+        "total_meals": total_meals,
+        "total_calories": round(total_calories, 0),
+        "total_protein": round(total_protein, 0),
+        "total_fat": round(total_fat, 0),
+        "avg_daily_calories": round(total_calories / n, 0) if n else 0,
+        "avg_daily_protein": round(total_protein / n, 0) if n else 0,
+        "avg_daily_fat": round(total_fat / n, 0) if n else 0,
+        "compliance": round((total_strict / total_meals) * 100, 1) if total_meals else 100.0,
+        "fasts_completed": len(fast_hours),
+        "total_fasting_hours": round(sum(fast_hours.tolist()), 1),
+        "symptoms_logged": len(symptom_types),
+        "top_symptoms": _ranked_counts(symptom_types),
+        "weight_change": round(weight_change, 1),
+        "daily_breakdown": daily_breakdown,
+    }
+
+
+# =============================================================================
+# TRENDS
+# =============================================================================
+
+ROLLING_FIELDS = {"calories": "meal_calories", "protein": "meal_protein", "fat": "meal_fat"}
+
+
+def rolling_daily_average(window: UserWindow, field: str = "calories", size: int = 7) -> Dict[str, float]:
+    """
+    Trailing `size`-day mean of a daily meal total over every calendar day
+    of the window, oldest first. Days without meals count as 0; the first
+    days average over the days available so far.
+    """
+    if field not in ROLLING_FIELDS:
+        raise ValueError(f"Unknown field: {field}")
+    today = np.datetime64(window.now.date(), "D")
+    first = today - (WINDOW_DAYS - 1)
+    day = window.meal_datetime.astype("U10").astype("datetime64[D]")
+    inside = day >= first
+    daily = np.bincount((day[inside] - first).astype(np.int64),
+                        weights=getattr(window, ROLLING_FIELDS[field])[inside], minlength=WINDOW_DAYS)
+    sums = np.cumsum(daily)
+    sums[size:] = sums[size:] - sums[:-size]
+    averages = sums / np.minimum(np.arange(1, WINDOW_DAYS + 1), size)
+    dates = np.arange(first, today + 1).astype(str)
+    return dict(zip(dates.tolist(), np.round(averages, 1).tolist()))
+
+
+def weight_regression(window: UserWindow) -> Optional[float]:
+    """Least-squares weight slope over the latest weigh-ins in kg/week; None below 2 distinct days"""
+    if len(window.weight_kg) < 2:
+        return None
+    days = window.weight_datetime.astype("datetime64[s]").astype(np.float64) / 86400
+    if np.ptp(days) == 0:
+        return None
+    slope = np.polyfit(days, window.weight_kg, 1)[0]
+    return round(float(slope) * 7, 2)
+
+
+# =============================================================================
+# ENTRY POINTS
+# =============================================================================
+
+def get_metabolic_stats(user_id: int) -> Dict:
+    return metabolic_stats(load_window(user_id))
+
+
+def get_weekly_summary(user_id: int) -> Dict:
+    return weekly_summary(load_window(user_id))
@@ -0,0 +1,247 @@
+"""
+Batch report generator (nightly job).
+
+Renders every user's daily and weekly HTML report ahead of time, spread
+over a process pool, and stores them as artifacts that `/report html` and
+`/export html weekly` serve without touching the report code:
+
+    reports/<date>/<user_id>.daily.html     only if the user logged meals that day
+    reports/<date>/<user_id>.weekly.html
+    reports/<date>/<user_id>.json      written last: the user's data version
+    reports/<date>/_run.json           throughput of the last run
+
+    python batch_reports.py                   # today, one worker per CPU
+    python batch_reports.py --date 2025-01-31 --workers 8
+
+The job is resumable: a user whose `<user_id>.json` matches the current
+data version (database.get_user_data_version) is skipped, so an
+interrupted run - or a re-run later the same day - only renders users that
+are missing or logged something since.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time as day_time
+from typing import Dict, List, Optional, Sequence
+
+import analytics
+import database
+import metrics
+import report_generator
+
+logger = logging.getLogger(__name__)
+
+# spawn, as in supervisor.py: workers start clean instead of forking a
+# parent that may hold open SQLite connections
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+REPORTS_DIR = os.getenv("REPORTS_DIR", "reports")
+REPORT_KINDS = ("daily", "weekly")
+RUN_FILE = "_run.json"
+
+
+def _artifact_path(reports_dir: str, date: str, user_id: int, suffix: str) -> str:
+    return os.path.join(reports_dir, date, f"{user_id}.{suffix}")
+
+
+def _write_atomic(path: str, data: bytes):
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _window_end(date: str) -> datetime:
+    """The moment a report for `date` looks back from: now for today, the end of that day for a backfill"""
+    return min(datetime.now(), datetime.combine(datetime.fromisoformat(date).date(), day_time.max))
+
+
+def _read_meta(reports_dir: str, date: str, user_id: int) -> Optional[Dict]:
+    try:
+        with open(_artifact_path(reports_dir, date, user_id, "json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# =============================================================================
+# WORKER
+# =============================================================================
+
+@contextlib.contextmanager
+def _worker_environment():
+    """
+    Spawned workers import database from scratch, and that import runs
+    init_db() on DB_NAME / DB_SHARDS as read from the environment. Export
+    the parent's values while the pool starts its processes, so workers
+    open the parent's files and never create a default database in their
+    working directory.
+    """
+    settings = {"DB_NAME": database.DB_NAME, "DB_SHARDS": str(database.DB_SHARDS)}
+    saved = {key: os.environ.get(key) for key in settings}
+    os.environ.update(settings)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def render_user_reports(user_id: int, date: str, reports_dir: str = REPORTS_DIR) -> Dict:
+    """Render and store one user's reports; returns timing and size"""
+    start = time.perf_counter()
+    version = database.get_user_data_version(user_id)
+    username = database.get_username(user_id) or "Carnivore"
+
+    meals = database.get_meals(user_id, date)
+    stats = database.get_daily_stats(user_id, date)
+    totals = {
+        'protein': stats['total_protein_g'],
+        'fat': stats['total_fat_g'],
+        'calories': stats['total_calories'],
+    }
+    # the weekly window ends at `date`, not at the time the job runs (backfills)
+    weekly = analytics.weekly_summary(analytics.load_window(user_id, _window_end(date)))
+    reports = {"weekly": report_generator.generate_weekly_report(username, weekly)}
+    # no meals that day: no daily artifact, the bot answers "no data" itself
+    if meals:
+        reports["daily"] = report_generator.generate_daily_report(username, date, meals, totals)
+
+    size = 0
+    for kind, buffer in reports.items():
+        data = buffer.getvalue()
+        _write_atomic(_artifact_path(reports_dir, date, user_id, f"{kind}.html"), data)
+        size += len(data)
+    seconds = time.perf_counter() - start
+    meta = {"user_id": user_id, "version": version, "seconds": seconds, "bytes": size,
+            "generated_at": datetime.now().isoformat()}
+    _write_atomic(_artifact_path(reports_dir, date, user_id, "json"), json.dumps(meta).encode("utf-8"))
+    return meta
+
+
+def _is_current(reports_dir: str, date: str, user_id: int) -> bool:
+    meta = _read_meta(reports_dir, date, user_id)
+    return meta is not None and meta["version"] == database.get_user_data_version(user_id)
+
+
+# =============================================================================
+# JOB
+# =============================================================================
+
+def run_batch(date: Optional[str] = None, reports_dir: str = REPORTS_DIR, workers: Optional[int] = None,
+              user_ids: Optional[Sequence[int]] = None) -> Dict:
+    """
+    Render reports for every user (or `user_ids`) on `date` (default today).
+    workers=1 renders in-process; otherwise a spawn-based process pool.
+    Returns the run summary, also written to <reports_dir>/<date>/_run.json.
+    """
+    date = date or datetime.now().strftime('%Y-%m-%d')
+    os.makedirs(os.path.join(reports_dir, date), exist_ok=True)
+    user_ids = list(user_ids) if user_ids is not None else database.get_all_user_ids()
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    pending = [uid for uid in user_ids if not _is_current(reports_dir, date, uid)]
+    logger.info(f"Relatórios {date}: {len(pending)} de {len(user_ids)} usuários a gerar ({workers} workers)")
+
+    timings: List[float] = []
+    failed: List[int] = []
+
+    def collect(user_id: int, meta: Optional[Dict], error: Optional[BaseException]):
+        if error is not None:
+            logger.error(f"Relatório do usuário {user_id} falhou: {error}")
+            failed.append(user_id)
+            return
+        timings.append(meta["seconds"])
+        metrics.observe("batch.user_reports", meta["seconds"])
+
+    if workers <= 1 or len(pending) <= 1:
+        for uid in pending:
+            try:
+                collect(uid, render_user_reports(uid, date, reports_dir), None)
+            except Exception as e:
+                collect(uid, None, e)
+    else:
+        with _worker_environment(), ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT) as pool:
+            futures = {pool.submit(render_user_reports, uid, date, reports_dir): uid for uid in pending}
+            for future in as_completed(futures):
+                error = future.exception()
+                collect(futures[future], None if error else future.result(), error)
+
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    summary = {
+        "date": date,
+        "users": len(user_ids),
+        "rendered": len(timings),
+        "skipped": len(user_ids) - len(pending),
+        "failed": failed,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "users_per_second": round(len(timings) / elapsed, 1) if elapsed > 0 else 0.0,
+        "per_user_p50_s": _percentile(timings, 0.5),
+        "per_user_p95_s": _percentile(timings, 0.95),
+        "per_user_max_s": timings[-1] if timings else 0.0,
+    }
+    _write_atomic(os.path.join(reports_dir, date, RUN_FILE), json.dumps(summary, indent=2).encode("utf-8"))
+    return summary
+
+
+# =============================================================================
+# SERVING
+# =============================================================================
+
+def cached_report(user_id: int, kind: str, date: Optional[str] = None,
+                  reports_dir: str = REPORTS_DIR) -> Optional[io.BytesIO]:
+    """Stored report as a named buffer, or None if missing or older than the user's data"""
+    if kind not in REPORT_KINDS:
+        raise ValueError(f"Unknown report kind: {kind}")
+    date = date or datetime.now().strftime('%Y-%m-%d')
+    if not _is_current(reports_dir, date, user_id):
+        return None
+    try:
+        with open(_artifact_path(reports_dir, date, user_id, f"{kind}.html"), "rb") as f:
+            buffer = io.BytesIO(f.read())
+    except OSError:
+        return None
+    buffer.name = f"{kind}_report_{date}.html"
+    return buffer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute daily and weekly HTML reports for every user")
+    parser.add_argument("--date", help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--reports-dir", default=REPORTS_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    summary = run_batch(args.date, args.reports_dir, args.workers)
+    print(
+        f"{summary['rendered']} usuários em {summary['seconds']:.1f}s "
+        f"({summary['users_per_second']} usuários/s, {summary['skipped']} já atualizados, "
+        f"{len(summary['failed'])} falhas)"
+    )
+    print(
+        f"por usuário: p50 {summary['per_user_p50_s'] * 1000:.1f}ms "
+        f"p95 {summary['per_user_p95_s'] * 1000:.1f}ms max {summary['per_user_max_s'] * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""
+Microbenchmarks for the hot functions in carnivore_core, database,
+report_generator and the RAG retrieval index.
+
+    python benchmark.py                              # run, write bench_results.json
+    python benchmark.py --sizes 1000,100000,1000000  # include the 1M-row tier
+    python benchmark.py --compare baseline.json      # fail on regressions
+
+Results are machine-readable JSON: one entry per benchmark with the
+per-call median/min in seconds. `--compare` re-runs the suite and exits
+non-zero if any benchmark got slower than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from carnivore_core import (
+    CARNIVORE_STRICT_ALLOWED,
+    CARNIVORE_RELAXED_ALLOWED,
+    ALWAYS_FORBIDDEN,
+    validate_ingredients,
+)
+
+DEFAULT_SIZES = [1_000, 100_000]
+DEFAULT_OUTPUT = "bench_results.json"
+DEFAULT_THRESHOLD = 0.25
+
+BENCH_USERS = 100
+HISTORY_DAYS = 365
+TARGET_USER = 1
+
+
+# =============================================================================
+# SYNTHETIC DATA
+# =============================================================================
+
+def make_ingredient_mix(kind: str, n: int, rng: random.Random) -> List[str]:
+    """
+    known:   exact members of the food sets (fast dict hits)
+    unknown: strings matching nothing (worst case: every partial scan runs)
+    partial: known foods embedded in longer phrases (partial-match path)
+    """
+    known = sorted(CARNIVORE_STRICT_ALLOWED | CARNIVORE_RELAXED_ALLOWED | ALWAYS_FORBIDDEN)
+    if kind == "known":
+        return [rng.choice(known) for _ in range(n)]
+    if kind == "unknown":
+        return [f"xq{rng.randrange(10**6)}zz" for _ in range(n)]
+    if kind == "partial":
+        return [f"grilled {rng.choice(known)} special" for _ in range(n)]
+    raise ValueError(f"unknown ingredient mix: {kind}")
+
+
+def populate_meals(db_path: str, rows: int, seed: int = 7):
+    """Bulk-insert `rows` meal events spread over BENCH_USERS users and a year"""
+    import database
+
+    # one file: the benchmarks time the single-database paths, whatever DB_SHARDS says
+    database.DB_NAME = db_path
+    database.DB_SHARDS = 1
+    database.init_db()
+    rng = random.Random(seed)
+    now = datetime.now()
+    levels = ["strict"] * 8 + ["relaxed", "not_carnivore"]
+    foods = sorted(CARNIVORE_STRICT_ALLOWED)
+
+    conn = database.get_connection()
+    try:
+        conn.executemany(
+            "INSERT INTO users (user_id, username, first_seen, preferred_level) VALUES (?, ?, ?, 'strict')",
+            [(uid, f"bench{uid}", (now - timedelta(days=HISTORY_DAYS)).isoformat()) for uid in range(1, BENCH_USERS + 1)],
+        )
+        batch = []
+        for i in range(rows):
+            uid = 1 + i % BENCH_USERS
+            dt = now - timedelta(minutes=rng.randrange(HISTORY_DAYS * 24 * 60))
+            ingredients = json.dumps([rng.choice(foods), rng.choice(foods)])
+            batch.append((
+                uid, dt.isoformat(), ingredients, '["200g", "100g"]', rng.choice(levels), 1, "[]",
+                rng.uniform(200, 1200), rng.uniform(20, 90), rng.uniform(10, 90), 0.0,
+                "Bench meal", "text", "whole", 0,
+            ))
+            if len(batch) >= 50_000:
+                _insert_meals(conn, batch)
+                batch = []
+        if batch:
+            _insert_meals(conn, batch)
+
+        symptoms = ["dizziness", "weakness", "cramps", "headache", "high_energy", "low_energy"]
+        conn.executemany(
+            "INSERT INTO symptom_events (user_id, datetime, symptom_type, severity, notes) VALUES (?, ?, ?, ?, '')",
+            [(1 + i % BENCH_USERS, (now - timedelta(hours=rng.randrange(HISTORY_DAYS * 24))).isoformat(),
+              rng.choice(symptoms), rng.randint(1, 5)) for i in range(max(100, rows // 20))],
+        )
+        conn.executemany(
+            "INSERT INTO weight_events (user_id, datetime, weight_kg, notes) VALUES (?, ?, ?, '')",
+            [(1 + i % BENCH_USERS, (now - timedelta(days=i // BENCH_USERS)).isoformat(), 90 - i * 0.001)
+             for i in range(BENCH_USERS * 60)],
+        )
+        fasts = []
+        for i in range(BENCH_USERS * 30):
+            start = now - timedelta(days=i // BENCH_USERS, hours=rng.randrange(24))
+            fasts.append((1 + i % BENCH_USERS, start.isoformat(), (start + timedelta(hours=rng.uniform(12, 24))).isoformat()))
+        conn.executemany("INSERT INTO fasting_events (user_id, start_time, end_time) VALUES (?, ?, ?)", fasts)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _insert_meals(conn, batch):
+    conn.executemany(
+        '''INSERT INTO meal_events
+           (user_id, datetime, ingredients, quantities, carnivore_level, breaks_fast,
+            warnings, calories, protein_g, fat_g, carbs_g, summary, source,
+            processing_level, needs_confirmation)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        batch,
+    )
+
+
+def make_report_meals(n: int, rng: random.Random) -> List[Dict]:
+    meals = []
+    for i in range(n):
+        meals.append({
+            "time": f"{8 + i % 12:02d}:{i % 60:02d}",
+            "datetime": datetime.now().isoformat(),
+            "summary": f"Picanha {i}",
+            "calories": rng.randint(300, 1000),
+            "source": rng.choice(["text", "voice", "photo"]),
+            "macros": {"protein": rng.randint(20, 80), "fat": rng.randint(20, 80)},
+            "carnivore_level": "strict",
+        })
+    return meals
+
+
+# =============================================================================
+# TIMING
+# =============================================================================
+
+def measure(fn: Callable, min_time: float = 0.2, repeat: int = 5) -> Dict:
+    """Auto-calibrated timing loop; returns per-call seconds"""
+    fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or number >= 1_000_000:
+            break
+        number *= 10
+
+    runs = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - start) / number)
+
+    return {
+        "median_s": statistics.median(runs),
+        "min_s": min(runs),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+# =============================================================================
+# SUITE
+# =============================================================================
+
+def bench_carnivore_core(results: Dict, rng: random.Random):
+    for kind in ("known", "unknown", "partial"):
+        ingredients = make_ingredient_mix(kind, 10, rng)
+        results[f"core.validate_ingredients[{kind},n=10]"] = measure(lambda: validate_ingredients(ingredients))
+
+
+def bench_database(results: Dict, sizes: List[int], work_dir: str):
+    import database
+    import report_generator
+
+    today = datetime.now().strftime('%Y-%m-%d')
+    previous_db, previous_shards = database.DB_NAME, database.DB_SHARDS
+    try:
+        for rows in sizes:
+            db_path = os.path.join(work_dir, f"bench_{rows}.db")
+            populate_meals(db_path, rows)
+            database.DB_NAME = db_path
+            results[f"db.get_daily_stats[rows={rows}]"] = measure(lambda: database.get_daily_stats(TARGET_USER, today))
+            cache = database.get_daily_stats_cache()
+            results[f"db.get_daily_stats[rows={rows},uncached]"] = measure(
+                lambda: (cache.clear(), database.get_daily_stats(TARGET_USER, today)))
+            results[f"db.get_metabolic_stats[rows={rows}]"] = measure(lambda: database.get_metabolic_stats(TARGET_USER))
+            results[f"db.get_weekly_summary[rows={rows}]"] = measure(lambda: database.get_weekly_summary(TARGET_USER))
+            bench_analytics(results, rows)
+            bench_cohort(results, rows)
+            results[f"db.get_period_summary[yearly,rows={rows}]"] = measure(
+                lambda: database.get_period_summary(TARGET_USER, "yearly"))
+            yearly = database.get_period_summary(TARGET_USER, "yearly")
+            results[f"report.generate_period_report[yearly,rows={rows}]"] = measure(
+                lambda: report_generator.generate_period_report("bench", yearly))
+            bench_export_formats(results, rows, work_dir)
+            bench_meal_containers(results, rows)
+    finally:
+        database.DB_NAME, database.DB_SHARDS = previous_db, previous_shards
+
+
+def bench_analytics(results: Dict, rows: int):
+    """Vectorized summaries: load + compute, and compute alone on a loaded window"""
+    import analytics
+
+    results[f"analytics.get_metabolic_stats[rows={rows}]"] = measure(lambda: analytics.get_metabolic_stats(TARGET_USER))
+    results[f"analytics.get_weekly_summary[rows={rows}]"] = measure(lambda: analytics.get_weekly_summary(TARGET_USER))
+    window = analytics.load_window(TARGET_USER)
+    results[f"analytics.metabolic_stats[rows={rows},loaded]"] = measure(lambda: analytics.metabolic_stats(window))
+    results[f"analytics.weekly_summary[rows={rows},loaded]"] = measure(lambda: analytics.weekly_summary(window))
+
+
+def bench_cohort(results: Dict, rows: int):
+    """Every user's metabolic metrics: one streaming pass vs get_metabolic_stats per user"""
+    import cohort_analytics
+    import database
+
+    user_ids = database.get_all_user_ids()
+    results[f"cohort.run_cohort[rows={rows},users={len(user_ids)}]"] = measure(cohort_analytics.run_cohort, repeat=3)
+    results[f"cohort.per_user_metabolic_stats[rows={rows},users={len(user_ids)}]"] = measure(
+        lambda: [database.get_metabolic_stats(uid) for uid in user_ids], repeat=3)
+
+
+def bench_export_formats(results: Dict, rows: int, work_dir: str):
+    """Load time of the whole meal_events table: row CSV vs columnar .npz (sizes in `bytes`)"""
+    import csv
+    import columnar_export
+    import database
+
+    csv_path = os.path.join(work_dir, f"meals_{rows}.csv")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in columnar_export.TABLE_SCHEMAS["meal_events"]])
+        writer.writerows(database.iter_table_rows("meal_events"))
+    npz_path = os.path.join(work_dir, f"meals_{rows}.npz")
+    columnar_export.export_columnar(npz_path, tables=["meal_events"])
+
+    def read_csv():
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            return list(csv.reader(f))
+
+    results[f"export.read_csv[meal_events,rows={rows}]"] = dict(
+        measure(read_csv, repeat=3), bytes=os.path.getsize(csv_path))
+    results[f"export.read_columnar[meal_events,rows={rows}]"] = dict(
+        measure(lambda: columnar_export.read_table(npz_path, "meal_events"), repeat=3),
+        bytes=os.path.getsize(npz_path))
+
+
+def _retained_bytes(build: Callable) -> int:
+    container = None
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        container = build()
+        return tracemalloc.get_traced_memory()[0] - before
+    finally:
+        del container
+        tracemalloc.stop()
+
+
+def bench_meal_containers(results: Dict, rows: int):
+    """
+    The whole meal table as a list of dicts vs a MealEventBatch: build time
+    (with retained size in `bytes`), then totals + per-day buckets
+    """
+    import database
+    from models import MEAL_EVENT_COLUMNS, MealEventBatch
+
+    table = list(database.iter_table_rows("meal_events", ", ".join(MEAL_EVENT_COLUMNS)))
+
+    def build_dicts():
+        return [dict(zip(MEAL_EVENT_COLUMNS, row)) for row in table]
+
+    def aggregate_dicts(meals):
+        totals = [sum(m[name] for m in meals) for name in MealEventBatch.NUMERIC_COLUMNS]
+        days: Dict[str, List[float]] = {}
+        for m in meals:
+            bucket = days.setdefault(m["datetime"][:10], [0.0, 0.0, 0.0, 0])
+            bucket[0] += m["calories"]
+            bucket[1] += m["protein_g"]
+            bucket[2] += m["fat_g"]
+            bucket[3] += 1
+        return totals, days
+
+    def build_batch():
+        return MealEventBatch.from_rows(table)
+
+    dicts, batch = build_dicts(), build_batch()
+    results[f"models.build_dicts[rows={rows}]"] = dict(
+        measure(build_dicts, repeat=3), bytes=_retained_bytes(build_dicts))
+    results[f"models.build_batch[rows={rows}]"] = dict(
+        measure(build_batch, repeat=3), bytes=_retained_bytes(build_batch))
+    results[f"models.aggregate_dicts[rows={rows}]"] = measure(lambda: aggregate_dicts(dicts), repeat=3)
+    results[f"models.aggregate_batch[rows={rows}]"] = measure(
+        lambda: (batch.totals(), batch.daily_totals()), repeat=3)
+
+
+def bench_reports(results: Dict, rng: random.Random):
+    import report_generator
+
+    meals = make_report_meals(20, rng)
+    totals = {
+        "protein": sum(m["macros"]["protein"] for m in meals),
+        "fat": sum(m["macros"]["fat"] for m in meals),
+        "calories": sum(m["calories"] for m in meals),
+    }
+    weekly = {
+        "total_meals": 20, "avg_daily_calories": 2100, "compliance": 95.0, "weight_change": -0.8,
+        "avg_daily_protein": 150, "avg_daily_fat": 140, "fasts_completed": 4, "total_fasting_hours": 70,
+        "symptoms_logged": 3,
+        "daily_breakdown": {
+            (datetime.now() - timedelta(days=d)).strftime('%Y-%m-%d'): {"calories": rng.randint(1500, 2500)}
+            for d in range(7)
+        },
+    }
+
+    results["report.generate_daily_report[meals=20]"] = measure(
+        lambda: report_generator.generate_daily_report("bench", "2025-01-01", meals, totals))
+    results["report.generate_weekly_report"] = measure(
+        lambda: report_generator.generate_weekly_report("bench", weekly))
+    results["report.export_to_csv[meals=20]"] = measure(
+        lambda: report_generator.export_to_csv("bench", meals, "daily"))
+    results["report.export_to_json[meals=20]"] = measure(
+        lambda: report_generator.export_to_json("bench", {"meals": meals, "summary": totals}, "daily"))
+    big_day = make_report_meals(200, rng)
+    results["report.generate_daily_report[meals=200]"] = measure(
+        lambda: report_generator.generate_daily_report("bench", "2025-01-01", big_day, totals))
+    # nightly digest shape: many small reports back to back
+    results["report.bulk_daily_reports[reports=100,meals=5]"] = measure(
+        lambda: [report_generator.generate_daily_report(f"user{i}", "2025-01-01", meals[:5], totals)
+                 for i in range(100)], repeat=3)
+    many = make_report_meals(5000, rng)
+    results["report.export_to_csv[meals=5000,gzip]"] = measure(
+        lambda: report_generator.export_to_csv("bench", many, "all", compress=True))
+
+
+def make_rag_corpus(n: int, rng: random.Random, words_per_doc: int = 160) -> List[str]:
+    vocabulary = sorted(CARNIVORE_RELAXED_ALLOWED) + [
+        "fasting", "electrolytes", "sodium", "magnesium", "potassium", "adaptation",
+        "jejum", "cetose", "energia", "sono", "receita", "gordura", "proteina",
+    ]
+    return [" ".join(rng.choice(vocabulary) for _ in range(words_per_doc)) for _ in range(n)]
+
+
+def bench_rag(results: Dict, rng: random.Random, work_dir: str):
+    import numpy as np
+    import rag_dense
+    import rag_search
+
+    for n in (100, 5_000):
+        index_dir = os.path.join(work_dir, f"rag_{n}")
+        rag_search.build_bm25(make_rag_corpus(n, rng), index_dir)
+        index = rag_search.BM25Index(index_dir)
+        results[f"rag.bm25_load[docs={n}]"] = measure(lambda: rag_search.BM25Index(index_dir))
+        results[f"rag.bm25_search[docs={n},k=5]"] = measure(
+            lambda: index.search("ribeye sodium jejum electrolytes", k=5))
+
+    # 768 dims = nomic-embed-text; random vectors are enough for timing
+    vectors = np.random.default_rng(rng.randint(0, 2**31)).standard_normal((5_000, 768)).astype(np.float32)
+    query = vectors[0]
+    for dtype in ("int8", "float16"):
+        index_dir = os.path.join(work_dir, f"dense_{dtype}")
+        rag_dense.build_dense(range(len(vectors)), index_dir, lambda _: vectors, dtype=dtype)
+        dense = rag_dense.DenseIndex(index_dir)
+        results[f"rag.dense_search[docs=5000,dim=768,{dtype},k=5]"] = measure(
+            lambda: dense.search_vectors(query, k=5))
+
+
+def run_suite(sizes: List[int], seed: int = 42, only: Optional[str] = None) -> Dict[str, Dict]:
+    rng = random.Random(seed)
+    results: Dict[str, Dict] = {}
+    work_dir = tempfile.mkdtemp(prefix="carnivore_bench_")
+    try:
+        if only in (None, "core"):
+            bench_carnivore_core(results, rng)
+        if only in (None, "db"):
+            bench_database(results, sizes, work_dir)
+        if only in (None, "report"):
+            bench_reports(results, rng)
+        if only in (None, "rag"):
+            bench_rag(results, rng, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(baseline: Dict[str, Dict], current: Dict[str, Dict], threshold: float) -> List[str]:
+    """Return human-readable regression lines (empty list = no regressions)"""
+    regressions = []
+    for name, cur in sorted(current.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {base['median_s'] * 1e6:.1f}us -> {cur['median_s'] * 1e6:.1f}us ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def format_results(results: Dict[str, Dict]) -> str:
+    lines = [f"{'benchmark':<52} {'median':>12} {'min':>12}"]
+    for name, r in sorted(results.items()):
+        size = f" {r['bytes'] / 1e6:>8.2f}MB" if "bytes" in r else ""
+        lines.append(f"{name:<52} {r['median_s'] * 1e6:>10.1f}us {r['min_s'] * 1e6:>10.1f}us{size}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carnivore Tracker microbenchmarks")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated meal row counts for database benchmarks")
+    parser.add_argument("--only", choices=["core", "db", "report", "rag"])
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a previous results file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before --compare fails (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = run_suite(sizes, only=args.only)
+    print(format_results(results))
+
+    payload = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.compare} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
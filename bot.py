@@ -1,20 +1,27 @@
 from telegram.ext import Application, CommandHandler, MessageHandler, filters
 from telegram import Update, BotCommand, ReplyKeyboardMarkup, KeyboardButton
-import json
+import asyncio
+import io
 import os
 import logging
+import time
 from datetime import datetime
-from google import genai
-from PIL import Image
 from faster_whisper import WhisperModel
-import ollama
+import analytics
 import database
 import report_generator
+import batch_reports
+import columnar_export
 from dotenv import load_dotenv
 import prompts
+import prompt_builder
+import llm_parsing
+import llm_backends
+import llm_client
+import metrics
+import webhook_server
 from carnivore_core import (
     validate_ingredients,
-    validate_llm_meal_output,
     CarnivoreLevel,
     get_carnivore_level_emoji,
     get_carnivore_level_description,
@@ -32,12 +39,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-client = genai.Client(api_key=GEMINI_API_KEY)
-GEMINI_MODEL = "gemini-1.5-flash"
-
-OLLAMA_MODEL = "mistral"
+ADMIN_USER_IDS = {int(uid) for uid in os.getenv("ADMIN_USER_IDS", "").split(",") if uid.strip()}
+METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH")
+COMPRESSED_EXPORT_PERIODS = ("monthly", "yearly", "all")
+# HTML reports built from per-day SQL rollups (database.get_period_summary)
+HTML_PERIOD_REPORTS = ("monthly", "yearly")
+
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 
 logger.info("Carregando Faster-Whisper (modelo small)...")
 whisper_model = WhisperModel("small", device="cpu", compute_type="int8")
@@ -46,49 +59,41 @@ logger.info("Faster-Whisper carregado!")
 
 def transcribe_audio_whisper(audio_path: str) -> tuple[str, float]:
     logger.info(f"Iniciando transcrição de: {audio_path}")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     try:
         segments, info = whisper_model.transcribe(audio_path, language="pt", beam_size=5, vad_filter=True)
         transcription = " ".join([segment.text.strip() for segment in segments])
-        duration = datetime.now() - start_time
-        logger.info(f"Transcrição concluída em {duration.total_seconds():.2f}s. Texto: {transcription[:50]}...")
+        duration = time.perf_counter() - start_time
+        metrics.observe("meal.transcribe", duration)
+        logger.info(f"Transcrição concluída em {duration:.2f}s. Texto: {transcription[:50]}...")
         return transcription if transcription else "Não consegui transcrever o áudio", info.duration
     except Exception as e:
         logger.error(f"Erro na transcrição local: {str(e)}")
         return f"Erro na transcrição local: {str(e)}", 0
 
 
-def extract_meal_from_text(transcription: str) -> dict:
-    logger.info("Extraindo dados de refeição com Ollama...")
+@metrics.timed_fn("meal.llm_extract")
+async def extract_meal_from_text(transcription: str) -> dict:
+    logger.info(f"Extraindo dados de refeição ({llm_backends.TASKS['extract'].backend})...")
     try:
         prompt = prompts.get_meal_extraction_prompt(transcription)
-        response = ollama.chat(
-            model=OLLAMA_MODEL,
-            messages=[
-                {'role': 'system', 'content': prompts.SYSTEM_PROMPT},
-                {'role': 'user', 'content': prompt}
-            ]
-        )
-        text = response['message']['content'].strip()
-        
-        if "```" in text:
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
+        reply = await llm_backends.acomplete("extract", prompt, format=llm_parsing.OLLAMA_JSON_FORMAT)
+    except Exception as e:
+        logger.warning(f"LLM indisponível (Nutrição): {e}; usando parser determinístico")
+        return llm_parsing.fallback_meal_from_text(transcription)
+    try:
+        parsed, errors = llm_parsing.parse_meal_reply(reply)
         
-        parsed = json.loads(text)
+        if parsed is None:
+            return {"is_food": False, "parse_error": errors[0]}
         
-        is_valid, errors = validate_llm_meal_output(parsed)
-        if not is_valid:
+        if errors:
             logger.warning(f"LLM output validation errors: {errors}")
             return {"is_food": False, "errors": errors}
         
         return parsed
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parse error: {str(e)}")
-        return {"is_food": False, "parse_error": str(e)}
     except Exception as e:
-        logger.error(f"Erro no Ollama (Nutrição): {str(e)}")
+        logger.error(f"Erro ao interpretar resposta do LLM (Nutrição): {str(e)}")
         return {"is_food": False, "error": str(e)}
 
 
@@ -121,53 +126,34 @@ def validate_and_classify_meal(llm_output: dict, user_preferred_level: str = "st
     }
 
 
-def get_carnivore_suggestion(remaining_cal: int, remaining_prot: int, remaining_fat: int) -> str:
+async def get_carnivore_suggestion(remaining_cal: int, remaining_prot: int, remaining_fat: int) -> str:
     try:
-        prompt = prompts.get_suggestion_prompt(remaining_cal, remaining_prot, remaining_fat)
-        response = ollama.chat(
-            model=OLLAMA_MODEL,
-            messages=[
-                {'role': 'system', 'content': prompts.SYSTEM_PROMPT},
-                {'role': 'user', 'content': prompt}
-            ]
+        prompt = await prompt_builder.aaugment_prompt(
+            prompts.get_suggestion_prompt(remaining_cal, remaining_prot, remaining_fat),
+            query="carnivore meal protein fat refeição carnívora",
+            task="suggestion",
         )
-        return response['message']['content']
+        return await llm_backends.acomplete("suggest", prompt)
     except Exception:
         return "Picanha com manteiga e sal. Clássico carnívoro."
 
 
-def get_ai_analysis(text: str) -> str:
+async def get_ai_analysis(text: str) -> str:
     try:
-        prompt = prompts.get_guru_analysis_prompt(text)
-        response = ollama.chat(
-            model=OLLAMA_MODEL,
-            messages=[
-                {'role': 'system', 'content': prompts.SYSTEM_PROMPT},
-                {'role': 'user', 'content': prompt}
-            ]
-        )
-        return response['message']['content']
+        prompt = await prompt_builder.aaugment_prompt(prompts.get_guru_analysis_prompt(text), query=text, task="guru")
+        return await llm_backends.acomplete("guru", prompt)
     except Exception:
         return "Análise indisponível."
 
 
-def analyze_food_image(image_path: str) -> dict:
+@metrics.timed_fn("meal.vision")
+async def analyze_food_image(image_path: str) -> dict:
     try:
-        img = Image.open(image_path)
-        response = client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[prompts.IMAGE_ANALYSIS_PROMPT, img]
-        )
-        text = response.text.strip()
-        
-        if "```" in text:
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        
-        return json.loads(text)
-    except json.JSONDecodeError:
-        return {"error": "Failed to parse image analysis", "raw": response.text if 'response' in dir() else ""}
+        reply = await llm_backends.aanalyze_image("vision", prompts.IMAGE_ANALYSIS_PROMPT, image_path)
+        parsed = llm_parsing.parse_json_reply(reply, task="vision")
+        if parsed is None:
+            return {"error": "Failed to parse image analysis", "raw": reply}
+        return parsed
     except Exception as e:
         return {"error": f"Vision error: {str(e)}"}
 
@@ -194,8 +180,8 @@ async def setup_commands(app):
         BotCommand("symptom", "Registrar sintoma"),
         BotCommand("symptoms", "Sintomas de hoje"),
         BotCommand("weight", "Registrar peso"),
-        BotCommand("report", "Relatório (daily/weekly/html)"),
-        BotCommand("export", "Exportar (csv/json/html)"),
+        BotCommand("report", "Relatório (daily/weekly/html/monthly/yearly)"),
+        BotCommand("export", "Exportar (csv/json/html/npz)"),
         BotCommand("recipe", "Gerar receita carnívora"),
         BotCommand("suggest", "Sugestão"),
         BotCommand("plan_tomorrow", "Menu Amanhã"),
@@ -342,17 +328,10 @@ async def suggest_command(update: Update, context):
         rem_kcal = max(0, goals['calories'] - stats['total_calories'])
         rem_prot = max(0, goals['protein'] - stats['total_protein_g'])
         rem_fat = max(0, goals['fat'] - stats['total_fat_g'])
-        suggestion = get_carnivore_suggestion(int(rem_kcal), int(rem_prot), int(rem_fat))
+        suggestion = await get_carnivore_suggestion(int(rem_kcal), int(rem_prot), int(rem_fat))
     else:
         try:
-            response = ollama.chat(
-                model=OLLAMA_MODEL,
-                messages=[
-                    {'role': 'system', 'content': prompts.SYSTEM_PROMPT},
-                    {'role': 'user', 'content': "Sugira uma refeição carnívora clássica. Seja direto."}
-                ]
-            )
-            suggestion = response['message']['content']
+            suggestion = await llm_backends.acomplete("suggest", "Sugira uma refeição carnívora clássica. Seja direto.")
         except Exception:
             suggestion = "Ribeye com manteiga e sal. Sem erro."
 
@@ -641,7 +620,7 @@ async def metabolic_command(update: Update, context):
     
     await update.message.reply_text("🔬 Calculando status metabólico...")
     
-    stats = database.get_metabolic_stats(user.id)
+    stats = analytics.get_metabolic_stats(user.id)
     
     keto_bar = "🟢" * (stats['keto_adaptation_score'] // 10) + "⚪" * (10 - stats['keto_adaptation_score'] // 10)
     
@@ -682,6 +661,7 @@ async def metabolic_command(update: Update, context):
     await update.message.reply_text(msg, parse_mode="Markdown", reply_markup=get_menu_keyboard())
 
 
+@metrics.timed_fn("meal.total")
 async def process_meal_input(update: Update, context, text: str, source: str = "text"):
     user = update.effective_user
     if not user:
@@ -690,7 +670,7 @@ async def process_meal_input(update: Update, context, text: str, source: str = "
     database.add_user(user.id, user.username or "")
     await update.message.reply_text("🧠 Analisando...")
     
-    llm_output = extract_meal_from_text(text)
+    llm_output = await extract_meal_from_text(text)
     
     if not llm_output.get("is_food"):
         database.add_voice_note(user.id, text, False)
@@ -698,27 +678,28 @@ async def process_meal_input(update: Update, context, text: str, source: str = "
         return
     
     user_level = database.get_user_preferred_level(user.id)
-    validated = validate_and_classify_meal(llm_output, user_level)
-    
-    meal_id = database.add_meal_event(
-        user_id=user.id,
-        dt=datetime.now(),
-        ingredients=validated.get("ingredients", []),
-        quantities=validated.get("quantities", []),
-        carnivore_level=validated.get("carnivore_level", "strict"),
-        breaks_fast=validated.get("breaks_fast", True),
-        warnings=validated.get("warnings", []),
-        calories=validated.get("calories", 0),
-        protein_g=validated.get("protein_g", 0),
-        fat_g=validated.get("fat_g", 0),
-        carbs_g=validated.get("carbs_g", 0),
-        summary=validated.get("summary", "Refeição"),
-        source=source,
-        processing_level=validated.get("processing_level", "whole"),
-        needs_confirmation=validated.get("needs_confirmation", False),
-    )
-    
-    database.add_voice_note(user.id, text, True)
+    with metrics.timed("meal.validate"):
+        validated = validate_and_classify_meal(llm_output, user_level)
+    
+    with metrics.timed("meal.db_write"):
+        database.add_meal_event(
+            user_id=user.id,
+            dt=datetime.now(),
+            ingredients=validated.get("ingredients", []),
+            quantities=validated.get("quantities", []),
+            carnivore_level=validated.get("carnivore_level", "strict"),
+            breaks_fast=validated.get("breaks_fast", True),
+            warnings=validated.get("warnings", []),
+            calories=validated.get("calories", 0),
+            protein_g=validated.get("protein_g", 0),
+            fat_g=validated.get("fat_g", 0),
+            carbs_g=validated.get("carbs_g", 0),
+            summary=validated.get("summary", "Refeição"),
+            source=source,
+            processing_level=validated.get("processing_level", "whole"),
+            needs_confirmation=validated.get("needs_confirmation", False),
+        )
+        database.add_voice_note(user.id, text, True)
     
     level_emoji = get_carnivore_level_emoji(CarnivoreLevel(validated.get("carnivore_level", "strict")))
     level_desc = get_carnivore_level_description(CarnivoreLevel(validated.get("carnivore_level", "strict")))
@@ -741,7 +722,11 @@ async def process_meal_input(update: Update, context, text: str, source: str = "
         for w in validated['warnings'][:3]:
             msg += f"\n• {w}"
     
-    await update.message.reply_text(msg, parse_mode="Markdown", reply_markup=get_menu_keyboard())
+    if validated.get("fallback"):
+        msg += "\n\nℹ️ _IA indisponível: valores estimados pelo parser local._"
+    
+    with metrics.timed("meal.reply"):
+        await update.message.reply_text(msg, parse_mode="Markdown", reply_markup=get_menu_keyboard())
 
 
 async def handle_voice(update: Update, context):
@@ -749,12 +734,14 @@ async def handle_voice(update: Update, context):
     if not voice:
         return
     
-    file = await context.bot.get_file(voice.file_id)
-    path = f"/tmp/{voice.file_id}.oga"
-    await file.download_to_drive(path)
+    with metrics.timed("meal.download"):
+        file = await context.bot.get_file(voice.file_id)
+        path = f"/tmp/{voice.file_id}.oga"
+        await file.download_to_drive(path)
     
-    segments, _ = whisper_model.transcribe(path, language="pt")
-    text = " ".join([s.text for s in segments])
+    with metrics.timed("meal.transcribe"):
+        segments, _ = whisper_model.transcribe(path, language="pt")
+        text = " ".join([s.text for s in segments])
     os.remove(path)
     
     await process_meal_input(update, context, text, source="voice")
@@ -769,13 +756,14 @@ async def handle_photo(update: Update, context):
         return
     
     photo = update.message.photo[-1]
-    file = await context.bot.get_file(photo.file_id)
-    path = f"/tmp/{photo.file_id}.jpg"
-    await file.download_to_drive(path)
+    with metrics.timed("meal.download"):
+        file = await context.bot.get_file(photo.file_id)
+        path = f"/tmp/{photo.file_id}.jpg"
+        await file.download_to_drive(path)
     
     await update.message.reply_text("📸 Analisando imagem...")
     
-    analysis = analyze_food_image(path)
+    analysis = await analyze_food_image(path)
     os.remove(path)
     
     if "error" in analysis:
@@ -850,6 +838,8 @@ async def report_command(update: Update, context):
         await send_weekly_report(update, user.id)
     elif report_type == "html":
         await send_html_report(update, user)
+    elif report_type in HTML_PERIOD_REPORTS:
+        await send_period_report(update, user, report_type)
     else:
         await send_daily_report(update, user.id)
 
@@ -911,7 +901,7 @@ async def send_daily_report(update: Update, user_id: int):
 
 
 async def send_weekly_report(update: Update, user_id: int):
-    summary = database.get_weekly_summary(user_id)
+    summary = analytics.get_weekly_summary(user_id)
     
     msg = f"📈 *Relatório Semanal*\n_Últimos 7 dias_\n\n"
     
@@ -952,28 +942,44 @@ async def send_html_report(update: Update, user):
     username = user.username or "Carnivore"
     today = datetime.now().strftime('%Y-%m-%d')
     
-    meals = database.get_meals(user.id, today)
-    
-    if not meals:
-        await update.message.reply_text("Sem dados hoje para gerar relatório HTML! 🦁")
-        return
+    # precomputed by batch_reports.py, if nothing was logged since
+    report = await asyncio.to_thread(batch_reports.cached_report, user.id, "daily", today)
+    if report is None:
+        meals = database.get_meals(user.id, today)
+        
+        if not meals:
+            await update.message.reply_text("Sem dados hoje para gerar relatório HTML! 🦁")
+            return
 
-    await update.message.reply_text("📄 Gerando relatório HTML...")
-    
-    total_prot = sum(m['macros'].get('protein', 0) for m in meals)
-    total_fat = sum(m['macros'].get('fat', 0) for m in meals)
-    total_kcal = sum(m['calories'] for m in meals)
-    totals = {'protein': total_prot, 'fat': total_fat, 'calories': total_kcal}
-    
-    path = report_generator.generate_daily_report(username, today, meals, totals)
+        await update.message.reply_text("📄 Gerando relatório HTML...")
+        
+        total_prot = sum(m['macros'].get('protein', 0) for m in meals)
+        total_fat = sum(m['macros'].get('fat', 0) for m in meals)
+        total_kcal = sum(m['calories'] for m in meals)
+        totals = {'protein': total_prot, 'fat': total_fat, 'calories': total_kcal}
+        
+        report = report_generator.generate_daily_report(username, today, meals, totals)
     
     await update.message.reply_document(
-        document=open(path, 'rb'),
+        document=report,
         filename=f"Relatorio_Carnivoro_{today}.html",
         caption=f"🦁 Seu relatório de {today}"
     )
+
+
+async def send_period_report(update: Update, user, period: str):
+    username = user.username or "Carnivore"
+    summary = await asyncio.to_thread(database.get_period_summary, user.id, period)
+    if not summary['total_meals']:
+        await update.message.reply_text("Sem refeições nesse período para gerar relatório! 🦁")
+        return
     
-    os.remove(path)
+    report = report_generator.generate_period_report(username, summary)
+    await update.message.reply_document(
+        document=report,
+        filename=f"Relatorio_Carnivoro_{period}_{summary['end_date']}.html",
+        caption=f"🦁 Seu relatório {period} ({summary['start_date']} → {summary['end_date']})"
+    )
 
 
 async def export_command(update: Update, context):
@@ -989,10 +995,14 @@ async def export_command(update: Update, context):
             "*Formatos:*\n"
             "• `csv` - Planilha\n"
             "• `json` - Dados estruturados\n"
-            "• `html` - Relatório visual\n\n"
+            "• `html` - Relatório visual\n"
+            "• `npz` - Colunar (NumPy), todas as tabelas\n\n"
             "*Períodos:*\n"
             "• `daily` - Hoje (padrão)\n"
-            "• `weekly` - Últimos 7 dias\n\n"
+            "• `weekly` - Últimos 7 dias\n"
+            "• `monthly` - Últimos 30 dias\n"
+            "• `yearly` - Últimos 365 dias\n"
+            "• `all` - Todo o histórico\n\n"
             "Exemplo: `/export csv weekly`",
             parse_mode="Markdown"
         )
@@ -1002,50 +1012,74 @@ async def export_command(update: Update, context):
     period = args[1].lower() if len(args) > 1 else "daily"
     username = user.username or "Carnivore"
     
-    if format_type not in ['csv', 'json', 'html']:
-        await update.message.reply_text("❌ Formato inválido. Use: csv, json ou html")
+    if format_type not in ['csv', 'json', 'html', 'npz']:
+        await update.message.reply_text("❌ Formato inválido. Use: csv, json, html ou npz")
+        return
+    
+    if period not in database.EXPORT_PERIODS:
+        await update.message.reply_text(f"❌ Período inválido. Use: {', '.join(database.EXPORT_PERIODS)}")
+        return
+    
+    if format_type == "html" and period not in ("daily", "weekly") + HTML_PERIOD_REPORTS:
+        await update.message.reply_text(
+            f"❌ Relatório HTML disponível para: daily, weekly, {', '.join(HTML_PERIOD_REPORTS)}")
         return
     
     await update.message.reply_text(f"📤 Exportando {format_type.upper()}...")
     
+    today = datetime.now().strftime('%Y-%m-%d')
+    since = database.period_start(period)
     if period == "weekly":
-        summary = database.get_weekly_summary(user.id)
-        meals = database.get_meals_history(user.id, 7)
-    else:
-        today = datetime.now().strftime('%Y-%m-%d')
-        meals = database.get_meal_events(user.id, today)
+        summary = analytics.get_weekly_summary(user.id)
+    elif period == "daily":
         summary = database.get_daily_stats(user.id, today)
+    elif format_type == "html":
+        summary = await asyncio.to_thread(database.get_period_summary, user.id, period)
+    else:
+        summary = database.get_period_totals(user.id, since)
     
+    # long ranges go out gzipped
+    compress = period in COMPRESSED_EXPORT_PERIODS
+    suffix = ".gz" if compress else ""
     if format_type == "csv":
-        path = report_generator.export_to_csv(username, meals, period)
-        filename = f"carnivore_export_{period}.csv"
+        # rows stream from the cursor into the buffer in a worker thread
+        meals = database.iter_meal_events(user.id, since)
+        document = await asyncio.to_thread(report_generator.export_to_csv, username, meals, period, compress)
+        filename = f"carnivore_export_{period}.csv{suffix}"
     elif format_type == "json":
         export_data = {
-            "meals": meals,
+            "meals": database.iter_meal_events(user.id, since),
             "summary": summary,
         }
-        path = report_generator.export_to_json(username, export_data, period)
-        filename = f"carnivore_export_{period}.json"
+        document = await asyncio.to_thread(report_generator.export_to_json, username, export_data, period, compress)
+        filename = f"carnivore_export_{period}.json{suffix}"
+    elif format_type == "npz":
+        document = io.BytesIO()
+        await asyncio.to_thread(columnar_export.export_columnar, document, user.id, since)
+        document.seek(0)
+        filename = f"carnivore_export_{period}.npz"
     else:
         if period == "weekly":
-            path = report_generator.generate_weekly_report(username, summary)
+            document = await asyncio.to_thread(batch_reports.cached_report, user.id, "weekly", today)
+            if document is None:
+                document = report_generator.generate_weekly_report(username, summary)
+        elif period in HTML_PERIOD_REPORTS:
+            document = report_generator.generate_period_report(username, summary)
         else:
-            today = datetime.now().strftime('%Y-%m-%d')
+            meals = database.get_meal_events(user.id, today)
             totals = {
                 'protein': summary.get('total_protein_g', 0),
                 'fat': summary.get('total_fat_g', 0),
                 'calories': summary.get('total_calories', 0),
             }
-            path = report_generator.generate_daily_report(username, today, meals, totals)
+            document = report_generator.generate_daily_report(username, today, meals, totals)
         filename = f"carnivore_report_{period}.html"
     
     await update.message.reply_document(
-        document=open(path, 'rb'),
+        document=document,
         filename=filename,
         caption=f"🦁 Exportação {format_type.upper()} ({period})"
     )
-    
-    os.remove(path)
 
 
 async def recipe_command(update: Update, context):
@@ -1085,58 +1119,65 @@ Responda em JSON:
     }},
     "tips": "Dica opcional"
 }}"""
+    prompt = await prompt_builder.aaugment_prompt(prompt, query=f"carnivore recipe {preference}", task="recipe")
     
     try:
-        response = ollama.chat(
-            model=OLLAMA_MODEL,
-            messages=[
-                {'role': 'system', 'content': prompts.SYSTEM_PROMPT},
-                {'role': 'user', 'content': prompt}
-            ]
-        )
-        text = response['message']['content'].strip()
-        
-        if "```" in text:
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        
-        recipe = json.loads(text)
-        
-        msg = f"🍖 *{recipe.get('name', 'Receita Carnívora')}*\n\n"
-        
-        msg += "📋 *Ingredientes:*\n"
-        for ing in recipe.get('ingredients', []):
-            msg += f"• {ing}\n"
-        
-        msg += "\n👨‍🍳 *Preparo:*\n"
-        for i, step in enumerate(recipe.get('steps', []), 1):
-            msg += f"{i}. {step}\n"
+        reply = await llm_backends.acomplete("recipe", prompt, format=llm_parsing.OLLAMA_JSON_FORMAT)
+        recipe = llm_parsing.parse_json_reply(reply, task="recipe")
         
-        macros = recipe.get('estimated_macros', {})
-        msg += f"\n📊 *Macros estimados:*\n"
-        msg += f"🔥 {macros.get('calories', 0)} kcal\n"
-        msg += f"💪 {macros.get('protein_g', 0)}g proteína\n"
-        msg += f"🧈 {macros.get('fat_g', 0)}g gordura\n"
-        
-        if recipe.get('time_minutes'):
-            msg += f"\n⏱️ Tempo: ~{recipe['time_minutes']} min"
-        
-        if recipe.get('tips'):
-            msg += f"\n\n💡 *Dica:* {recipe['tips']}"
-        
-        level_emoji = "🥩" if recipe.get('carnivore_level') == 'strict' else "🧈"
-        msg += f"\n\n{level_emoji} Nível: {recipe.get('carnivore_level', 'strict').upper()}"
+        if recipe is None:
+            msg = f"🍖 *Receita Carnívora*\n\n{reply}"
+        else:
+            msg = f"🍖 *{recipe.get('name', 'Receita Carnívora')}*\n\n"
+            
+            msg += "📋 *Ingredientes:*\n"
+            for ing in recipe.get('ingredients', []):
+                msg += f"• {ing}\n"
+            
+            msg += "\n👨‍🍳 *Preparo:*\n"
+            for i, step in enumerate(recipe.get('steps', []), 1):
+                msg += f"{i}. {step}\n"
+            
+            macros = recipe.get('estimated_macros', {})
+            msg += f"\n📊 *Macros estimados:*\n"
+            msg += f"🔥 {macros.get('calories', 0)} kcal\n"
+            msg += f"💪 {macros.get('protein_g', 0)}g proteína\n"
+            msg += f"🧈 {macros.get('fat_g', 0)}g gordura\n"
+            
+            if recipe.get('time_minutes'):
+                msg += f"\n⏱️ Tempo: ~{recipe['time_minutes']} min"
+            
+            if recipe.get('tips'):
+                msg += f"\n\n💡 *Dica:* {recipe['tips']}"
+            
+            level_emoji = "🥩" if recipe.get('carnivore_level') == 'strict' else "🧈"
+            msg += f"\n\n{level_emoji} Nível: {recipe.get('carnivore_level', 'strict').upper()}"
         
-    except json.JSONDecodeError:
-        msg = f"🍖 *Receita Carnívora*\n\n{response['message']['content']}"
     except Exception as e:
         msg = f"❌ Erro ao gerar receita: {str(e)}\n\nTente novamente ou especifique uma preferência: `/recipe picanha`"
     
     await update.message.reply_text(msg, parse_mode="Markdown", reply_markup=get_menu_keyboard())
 
 
-def get_meal_plan(duration: str) -> str:
+# Served when the plan LLM is down: the last plan generated for that
+# duration, else a fixed one
+FALLBACK_PLANS = {
+    "day": (
+        "☕ *Café:* 3 ovos na manteiga + bacon (~650 kcal)\n"
+        "🥩 *Almoço:* 300g de picanha com sal (~800 kcal)\n"
+        "🍖 *Jantar:* 250g de costela bovina (~750 kcal)"
+    ),
+    "week": (
+        "*Seg/Qua/Sex:* ovos + bacon · picanha · costela\n"
+        "*Ter/Qui:* ovos na manteiga · contra-filé · salmão\n"
+        "*Sáb:* jejum até o almoço · ribeye 400g\n"
+        "*Dom:* ovos · cupim/costela assada · caldo de osso"
+    ),
+}
+_last_plans: dict = {}
+
+
+async def get_meal_plan(duration: str) -> str:
     topic = "UM DIA (Amanhã)" if duration == "day" else "UMA SEMANA (7 dias)"
     prompt = f"""Crie um plano de refeições carnívoro estrito para {topic}.
 
@@ -1149,27 +1190,26 @@ REGRAS:
 - Formato Markdown limpo"""
     
     try:
-        response = ollama.chat(
-            model=OLLAMA_MODEL,
-            messages=[
-                {'role': 'system', 'content': prompts.SYSTEM_PROMPT},
-                {'role': 'user', 'content': prompt}
-            ]
+        prompt = await prompt_builder.aaugment_prompt(
+            prompt, query="carnivore meal plan recipes fasting", task="meal_plan"
         )
-        return response['message']['content']
+        plan = await llm_backends.acomplete("plan", prompt)
     except Exception as e:
-        return f"Erro ao gerar plano: {str(e)}"
+        logger.warning(f"Plano ({duration}) indisponível: {e}; usando plano em cache")
+        return _last_plans.get(duration, FALLBACK_PLANS[duration])
+    _last_plans[duration] = plan
+    return plan
 
 
 async def plan_tomorrow_command(update: Update, context):
     await update.message.reply_text("👨‍🍳 Criando menu carnívoro para amanhã...")
-    plan = get_meal_plan("day")
+    plan = await get_meal_plan("day")
     await update.message.reply_text(f"📅 *Menu para Amanhã:*\n\n{plan}", parse_mode="Markdown")
 
 
 async def plan_week_command(update: Update, context):
     await update.message.reply_text("👨‍🍳 Elaborando estratégia semanal...")
-    plan = get_meal_plan("week")
+    plan = await get_meal_plan("week")
     await update.message.reply_text(f"🗓️ *Plano Semanal:*\n\n{plan}", parse_mode="Markdown")
 
 
@@ -1198,11 +1238,36 @@ async def handle_text(update: Update, context):
         await process_meal_input(update, context, txt, source="text")
 
 
+async def metrics_command(update: Update, context):
+    user = update.effective_user
+    if not user or user.id not in ADMIN_USER_IDS:
+        return
+    
+    if context.args and context.args[0].lower() == "prom":
+        await update.message.reply_document(
+            document=metrics.render_prometheus().encode("utf-8"),
+            filename="metrics.prom",
+        )
+        return
+    
+    if METRICS_DUMP_PATH:
+        metrics.dump(METRICS_DUMP_PATH)
+    
+    breakers = "\n".join(
+        f"breaker {name}: {b['state']} (falhas={b['failures']}, rejeitadas={b['rejected']})"
+        for name, b in llm_backends.breaker_states().items()
+    )
+    text = metrics.render_text() + (f"\n\n{breakers}" if breakers else "")
+    await update.message.reply_text(f"```\n{text}\n```", parse_mode="Markdown")
+
+
 async def post_init(app):
     await setup_commands(app)
+    if llm_backends.TASKS["extract"].backend == "ollama":
+        asyncio.get_running_loop().run_in_executor(None, llm_client.warmup, llm_backends.TASKS["extract"].model)
 
 
-if __name__ == '__main__':
+def build_application() -> Application:
     app = Application.builder().token(TELEGRAM_TOKEN).post_init(post_init).build()
     
     app.add_handler(CommandHandler("start", start))
@@ -1223,9 +1288,55 @@ if __name__ == '__main__':
     app.add_handler(CommandHandler("symptom", symptom_command))
     app.add_handler(CommandHandler("symptoms", symptoms_today_command))
     app.add_handler(CommandHandler("weight", weight_command))
+    app.add_handler(CommandHandler("metrics", metrics_command))
     app.add_handler(MessageHandler(filters.VOICE, handle_voice))
     app.add_handler(MessageHandler(filters.PHOTO, handle_photo))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
     
-    print("🦁 Carnivore Tracker Bot Rodando!")
-    app.run_polling()
+    return app
+
+
+async def register_webhook(app: Application):
+    if WEBHOOK_URL:
+        await app.bot.set_webhook(
+            url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        )
+
+
+async def run_webhook(app: Application):
+    """Serve updates through the embedded webhook server instead of long polling"""
+    async def enqueue(payload: dict):
+        await app.update_queue.put(Update.de_json(payload, app.bot))
+    
+    server = webhook_server.WebhookServer(
+        enqueue,
+        host=WEBHOOK_HOST,
+        port=WEBHOOK_PORT,
+        path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+    )
+    
+    async with app:
+        await post_init(app)
+        await register_webhook(app)
+        await app.start()
+        try:
+            await server.serve_forever()
+        finally:
+            await server.stop()
+            await app.stop()
+
+
+if __name__ == '__main__':
+    app = build_application()
+    
+    if METRICS_DUMP_PATH:
+        metrics.start_periodic_dump(METRICS_DUMP_PATH)
+    
+    print(f"🦁 Carnivore Tracker Bot Rodando! (modo: {BOT_MODE})")
+    if BOT_MODE == "webhook":
+        asyncio.run(run_webhook(app))
+    else:
+        app.run_polling()
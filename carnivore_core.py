@@ -9,6 +9,7 @@ from enum import Enum
 from typing import List, Dict, Optional, Set
 from dataclasses import dataclass
 import re
+import unicodedata
 
 # =============================================================================
 # CARNIVORE LEVEL CLASSIFICATION
@@ -155,6 +156,12 @@ def normalize_ingredient(ingredient: str) -> str:
     return ingredient.lower().strip()
 
 
+def fold_accents(text: str) -> str:
+    """Normalize and strip diacritics (salmão -> salmao) for free-text matching"""
+    decomposed = unicodedata.normalize("NFKD", normalize_ingredient(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
 def find_matching_category(ingredient: str) -> tuple[Optional[str], Optional[Set[str]]]:
     """Find which category an ingredient belongs to"""
     normalized = normalize_ingredient(ingredient)
@@ -249,6 +256,30 @@ def validate_ingredients(ingredients: List[str], target_level: CarnivoreLevel =
     )
 
 
+# Folded spelling -> vocabulary spelling, longest terms first so that
+# "ground beef" wins over "beef" and "couve-flor" over "couve"
+_KNOWN_FOODS: Dict[str, str] = {
+    fold_accents(term): term
+    for term in (CARNIVORE_RELAXED_ALLOWED | CARNIVORE_RELAXED_WARNING | ALWAYS_FORBIDDEN | DIRTY_CARNIVORE_ALLOWED)
+}
+_KNOWN_FOODS_RE = re.compile(
+    r"(?<!\w)(" + "|".join(re.escape(t) for t in sorted(_KNOWN_FOODS, key=len, reverse=True)) + r")(?!\w)"
+)
+
+
+def extract_known_foods(text: str) -> List[str]:
+    """
+    Find the vocabulary foods mentioned in free text (recipes, documents),
+    in order of first appearance, ready for validate_ingredients().
+    """
+    found = []
+    for match in _KNOWN_FOODS_RE.finditer(fold_accents(text)):
+        term = _KNOWN_FOODS[match.group(1)]
+        if term not in found:
+            found.append(term)
+    return found
+
+
 def check_breaks_fast(calories: float) -> bool:
     """Determine if food intake breaks a fast"""
     return calories > 0
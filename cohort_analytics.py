@@ -0,0 +1,258 @@
+"""
+Cohort analytics job (operator dashboards).
+
+Computes every user's keto adaptation score, carnivore compliance,
+electrolyte risk and weight trend - the values `/metabolic` shows - and
+stores them in the `cohort_metrics` table, one row per user:
+
+    python cohort_analytics.py                # every shard
+    python cohort_analytics.py --show 20      # and print the 20 lowest scores
+
+Instead of calling get_metabolic_stats per user (five queries and a
+Python loop each), every shard is read with one query per table, walking
+the (user_id, datetime) indexes by user. The five streams are
+merged user by user and each user's rows are folded as they pass, so the
+job does one pass over the rows and holds only the current user's window
+in memory. The results equal database.get_metabolic_stats for the same
+moment.
+"""
+
+import argparse
+import logging
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import database
+import metrics
+
+logger = logging.getLogger(__name__)
+
+WINDOW_DAYS = 30
+WEEK_DAYS = 7
+WEIGHT_LIMIT = 30
+BATCH_SIZE = 5000
+
+ELECTROLYTE_SYMPTOMS = ('dizziness', 'weakness', 'cramps', 'headache')
+
+COLUMNS = (
+    "user_id", "computed_at", "days_on_protocol", "keto_adaptation_score", "keto_adaptation_label",
+    "carnivore_compliance", "electrolyte_risk", "weight_trend", "avg_fat_protein_ratio",
+    "avg_fasting_duration", "meals_30d",
+)
+
+# Same windows and row order as the get_*_history functions, for all users at
+# once. Users go in descending id order too, so each query is a plain backwards
+# walk of its (user_id, datetime) index with no sort step.
+USERS_QUERY = "SELECT user_id, first_seen FROM users ORDER BY user_id DESC"
+MEALS_QUERY = '''SELECT user_id, datetime, carnivore_level, protein_g, fat_g FROM meal_events
+                 WHERE datetime >= ? ORDER BY user_id DESC, datetime DESC'''
+SYMPTOMS_QUERY = '''SELECT user_id, symptom_type, severity FROM symptom_events
+                    WHERE datetime >= ? ORDER BY user_id DESC, datetime DESC'''
+FASTS_QUERY = '''SELECT user_id, start_time, end_time FROM fasting_events
+                 WHERE end_time IS NOT NULL AND start_time >= ? ORDER BY user_id DESC, start_time DESC'''
+WEIGHTS_QUERY = "SELECT user_id, weight_kg FROM weight_events ORDER BY user_id DESC, datetime DESC"
+
+
+# =============================================================================
+# STREAMS
+# =============================================================================
+
+def _stream(conn: sqlite3.Connection, query: str, params: Tuple = ()) -> Iterator[Tuple]:
+    c = conn.execute(query, params)
+    while True:
+        rows = c.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+
+
+class _UserGroups:
+    """Rows of a stream ordered by user_id DESC, handed out one user at a time"""
+
+    def __init__(self, rows: Iterator[Tuple]):
+        self._groups = groupby(rows, key=itemgetter(0))
+        self.rows = 0
+        self._advance()
+
+    def _advance(self):
+        self._current = next(self._groups, None)
+
+    def take(self, user_id: int) -> List[Tuple]:
+        # rows of users missing from `users` are skipped, as the per-user path never asks for them
+        while self._current is not None and self._current[0] > user_id:
+            self.rows += sum(1 for _ in self._current[1])
+            self._advance()
+        if self._current is None or self._current[0] != user_id:
+            return []
+        rows = list(self._current[1])
+        self.rows += len(rows)
+        self._advance()
+        return rows
+
+    def drain(self):
+        """Read past any trailing rows so the cursor is finished before writing"""
+        while self._current is not None:
+            self.rows += sum(1 for _ in self._current[1])
+            self._advance()
+
+
+# =============================================================================
+# PER USER
+# =============================================================================
+
+def user_metrics(first_seen: Optional[str], meals: List[Tuple], symptoms: List[Tuple], fasts: List[Tuple],
+                 weights: List[Tuple], now: datetime) -> Dict:
+    """
+    Fold one user's rows (newest first, as the queries above return them)
+    into the cohort_metrics values, with get_metabolic_stats' arithmetic.
+    """
+    days_on_protocol = database._days_on_protocol(first_seen, now)
+
+    recent_cutoff = (now - timedelta(days=WEEK_DAYS)).isoformat()
+    daily_protein: Dict[str, float] = {}
+    daily_fat: Dict[str, float] = {}
+    strict_meals = 0
+    for _, dt, level, protein, fat in meals:
+        if level == 'strict':
+            strict_meals += 1
+        if dt >= recent_cutoff:
+            day = dt.split('T')[0]
+            daily_protein[day] = daily_protein.get(day, 0) + protein
+            daily_fat[day] = daily_fat.get(day, 0) + fat
+
+    if daily_protein:
+        days_with_data = len(daily_protein)
+        avg_daily_protein = round(sum(daily_protein.values()) / days_with_data, 1)
+        avg_daily_fat = round(sum(daily_fat.values()) / days_with_data, 1)
+        avg_fat_protein_ratio = round(avg_daily_fat / avg_daily_protein, 2) if avg_daily_protein > 0 else 0
+    else:
+        avg_fat_protein_ratio = 0
+    carnivore_compliance = round((strict_meals / len(meals)) * 100, 1) if meals else 100.0
+
+    if fasts:
+        durations = [
+            round((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds() / 3600, 1)
+            for _, start, end in fasts
+        ]
+        avg_fasting_duration = round(sum(durations) / len(durations), 1)
+    else:
+        avg_fasting_duration = 0
+
+    electrolyte_risk = database._electrolyte_risk(
+        sum(severity for _, stype, severity in symptoms if stype in ELECTROLYTE_SYMPTOMS))
+
+    if len(weights) >= 2:
+        weight_trend = database._weight_trend(round(weights[0][1] - weights[-1][1], 1))
+    else:
+        weight_trend = "insufficient data"
+
+    score = database._keto_adaptation_score(
+        days_on_protocol, carnivore_compliance, avg_fat_protein_ratio, electrolyte_risk, avg_fasting_duration)
+    return {
+        "days_on_protocol": days_on_protocol,
+        "keto_adaptation_score": score,
+        "keto_adaptation_label": database._get_keto_label(score),
+        "carnivore_compliance": carnivore_compliance,
+        "electrolyte_risk": electrolyte_risk,
+        "weight_trend": weight_trend,
+        "avg_fat_protein_ratio": avg_fat_protein_ratio,
+        "avg_fasting_duration": avg_fasting_duration,
+        "meals_30d": len(meals),
+    }
+
+
+# =============================================================================
+# JOB
+# =============================================================================
+
+def _run_shard(path: str, now: datetime) -> Tuple[int, int]:
+    """Recompute one shard's cohort_metrics; returns (users, rows read)"""
+    cutoff = (now - timedelta(days=WINDOW_DAYS)).isoformat()
+    computed_at = now.isoformat()
+    conn = sqlite3.connect(path, timeout=database.SQLITE_TIMEOUT_SECONDS)
+    try:
+        streams = [
+            _UserGroups(_stream(conn, MEALS_QUERY, (cutoff,))),
+            _UserGroups(_stream(conn, SYMPTOMS_QUERY, (cutoff,))),
+            _UserGroups(_stream(conn, FASTS_QUERY, (cutoff,))),
+        ]
+        weights = _UserGroups(_stream(conn, WEIGHTS_QUERY))
+        results = []
+        for user_id, first_seen in _stream(conn, USERS_QUERY):
+            meals, symptoms, fasts = (stream.take(user_id) for stream in streams)
+            values = user_metrics(first_seen, meals, symptoms, fasts, weights.take(user_id)[:WEIGHT_LIMIT], now)
+            results.append((user_id, computed_at, *(values[column] for column in COLUMNS[2:])))
+
+        for stream in (*streams, weights):
+            stream.drain()
+
+        # a full snapshot: users that disappeared lose their row too
+        with conn:
+            conn.execute("DELETE FROM cohort_metrics")
+            conn.executemany(
+                f"INSERT INTO cohort_metrics ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                results,
+            )
+        return len(results), len(results) + sum(stream.rows for stream in streams) + weights.rows
+    finally:
+        conn.close()
+
+
+@metrics.timed_fn("cohort.run")
+def run_cohort(now: Optional[datetime] = None) -> Dict:
+    """Recompute cohort_metrics on every shard; returns the run summary"""
+    now = now or datetime.now()
+    start = time.perf_counter()
+    users = rows = 0
+    for path in database.iter_shard_paths():
+        shard_users, shard_rows = _run_shard(path, now)
+        users += shard_users
+        rows += shard_rows
+    elapsed = time.perf_counter() - start
+    logger.info(f"Métricas de coorte: {users} usuários, {rows} linhas em {elapsed:.2f}s")
+    return {
+        "computed_at": now.isoformat(),
+        "users": users,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "users_per_second": round(users / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def load_cohort_metrics() -> List[Dict]:
+    """Every stored row as a dict, across shards, by user_id within each shard"""
+    return [dict(zip(COLUMNS, row)) for row in database.iter_table_rows(
+        "cohort_metrics", ", ".join(COLUMNS), order_by="user_id")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute per-user metabolic metrics for the operator dashboards")
+    parser.add_argument("--show", type=int, default=0, help="print the N users with the lowest keto score")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    summary = run_cohort()
+    print(
+        f"{summary['users']} usuários, {summary['rows']} linhas em {summary['seconds']:.1f}s "
+        f"({summary['users_per_second']} usuários/s)"
+    )
+    if args.show:
+        rows = load_cohort_metrics()
+        risks: Dict[str, int] = {}
+        for row in rows:
+            risks[row["electrolyte_risk"]] = risks.get(row["electrolyte_risk"], 0) + 1
+        print("risco de eletrólitos: " + ", ".join(f"{risk} {count}" for risk, count in sorted(risks.items())))
+        for row in sorted(rows, key=itemgetter("keto_adaptation_score"))[:args.show]:
+            print(
+                f"{row['user_id']:>12}  keto {row['keto_adaptation_score']:>3}  "
+                f"aderência {row['carnivore_compliance']:5.1f}%  eletrólitos {row['electrolyte_risk']:<6}  "
+                f"peso {row['weight_trend']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
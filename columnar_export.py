@@ -0,0 +1,275 @@
+"""
+Columnar export of the event tables for analysis notebooks.
+
+One compressed .npz (zip) archive holds every table as typed column
+chunks of up to CHUNK_ROWS rows, written while the rows stream out of
+SQLite, so memory stays bounded for multi-million-row exports:
+
+    meal_events/00000/calories.npy      float64
+    meal_events/00000/datetime.npy      datetime64[us]
+    meal_events/00000/notes.offsets.npy + notes.data.npy
+                                        Arrow-style strings: int64 offsets
+                                        into one utf-8 byte buffer
+    meal_events/00000/source.codes.npy + source.dict.offsets.npy + ...
+                                        dictionary-encoded strings, used when
+                                        a chunk has few distinct values
+    <column>.valid.npy                  only when the chunk has NULLs
+
+Only numpy is needed to write or read it:
+
+    python columnar_export.py export.npz              # whole database
+    python columnar_export.py export.npz --user 42    # one user
+
+    meals = columnar_export.read_table("export.npz", "meal_events", ["datetime", "calories"])
+    meals["calories"].mean()
+
+With DB_SHARDS > 1 a whole-database export concatenates the shards and
+`id` is each shard's own AUTOINCREMENT, so the same id can appear in
+several rows of one table. A user lives in exactly one shard: key rows
+by (user_id, id).
+"""
+
+import argparse
+import json
+import zipfile
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+import database
+
+CHUNK_ROWS = 65_536
+SCHEMA_ENTRY = "_schema.json"
+FORMAT_VERSION = 1
+
+# table -> ((column, kind), ...); kind is one of int, float, bool, datetime, string
+TABLE_SCHEMAS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "meal_events": (
+        ("id", "int"), ("user_id", "int"), ("datetime", "datetime"), ("ingredients", "string"),
+        ("quantities", "string"), ("carnivore_level", "string"), ("breaks_fast", "bool"),
+        ("warnings", "string"), ("calories", "float"), ("protein_g", "float"), ("fat_g", "float"),
+        ("carbs_g", "float"), ("summary", "string"), ("source", "string"),
+        ("processing_level", "string"), ("needs_confirmation", "bool"),
+    ),
+    "symptom_events": (
+        ("id", "int"), ("user_id", "int"), ("datetime", "datetime"), ("symptom_type", "string"),
+        ("severity", "int"), ("notes", "string"),
+    ),
+    "fasting_events": (
+        ("id", "int"), ("user_id", "int"), ("start_time", "datetime"), ("end_time", "datetime"),
+    ),
+    "weight_events": (
+        ("id", "int"), ("user_id", "int"), ("datetime", "datetime"), ("weight_kg", "float"),
+        ("notes", "string"),
+    ),
+}
+
+# column the `since` filter applies to
+TIME_COLUMNS = {
+    "meal_events": "datetime",
+    "symptom_events": "datetime",
+    "fasting_events": "start_time",
+    "weight_events": "datetime",
+}
+
+_NUMPY_TYPES = {"int": np.int64, "float": np.float64, "bool": np.bool_}
+# Dictionary-encode a string chunk when distinct values <= this fraction of rows
+DICTIONARY_MAX_RATIO = 0.5
+
+
+# =============================================================================
+# ENCODING
+# =============================================================================
+
+def encode_strings(values: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Arrow-style layout: offsets (n+1, int64) into one utf-8 buffer (uint8)"""
+    encoded = [(v or "").encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def decode_strings(offsets: np.ndarray, data: np.ndarray) -> List[str]:
+    raw = data.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def encode_column(values: Sequence, kind: str) -> Dict[str, np.ndarray]:
+    """Arrays for one column chunk, keyed by file suffix ("" for the values)"""
+    valid = np.fromiter((v is not None for v in values), dtype=np.bool_, count=len(values))
+    arrays: Dict[str, np.ndarray] = {}
+    if kind == "string":
+        dictionary: Dict[Optional[str], int] = {}
+        codes = np.fromiter((dictionary.setdefault(v, len(dictionary)) for v in values),
+                            dtype=np.int32, count=len(values))
+        if len(dictionary) <= DICTIONARY_MAX_RATIO * len(values):
+            arrays["codes"] = codes
+            arrays["dict.offsets"], arrays["dict.data"] = encode_strings(list(dictionary))
+        else:
+            arrays["offsets"], arrays["data"] = encode_strings(values)
+    elif kind == "datetime":
+        arrays[""] = np.array([v if v is not None else "NaT" for v in values], dtype="datetime64[us]")
+    else:
+        fill = 0 if kind != "float" else np.nan
+        arrays[""] = np.array([v if v is not None else fill for v in values], dtype=_NUMPY_TYPES[kind])
+    if not valid.all():
+        arrays["valid"] = valid
+    return arrays
+
+
+# =============================================================================
+# WRITER
+# =============================================================================
+
+def _write_array(archive: zipfile.ZipFile, name: str, array: np.ndarray):
+    with archive.open(name + ".npy", "w", force_zip64=True) as f:
+        np.lib.format.write_array(f, np.ascontiguousarray(array), allow_pickle=False)
+
+
+def _iter_chunks(rows: Iterable[Tuple], chunk_rows: int) -> Iterator[List[Tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iter_user_rows(table: str, columns: str, user_id: int, since: Optional[str],
+                    batch_size: int) -> Iterator[Tuple]:
+    conn = database.get_connection(user_id)
+    try:
+        c = conn.execute(
+            f"SELECT {columns} FROM {table} WHERE user_id = ? AND {TIME_COLUMNS[table]} >= ? ORDER BY id",
+            (user_id, since or ""),
+        )
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def _iter_rows(table: str, user_id: Optional[int], since: Optional[str], batch_size: int) -> Iterator[Tuple]:
+    columns = ", ".join(name for name, _ in TABLE_SCHEMAS[table])
+    if user_id is not None:
+        return _iter_user_rows(table, columns, user_id, since, batch_size)
+    rows = database.iter_table_rows(table, columns, order_by="id", batch_size=batch_size)
+    if since:
+        position = [name for name, _ in TABLE_SCHEMAS[table]].index(TIME_COLUMNS[table])
+        rows = (row for row in rows if (row[position] or "") >= since)
+    return rows
+
+
+def write_table(archive: zipfile.ZipFile, table: str, rows: Iterable[Tuple],
+                chunk_rows: int = CHUNK_ROWS) -> Dict:
+    schema = TABLE_SCHEMAS[table]
+    total = chunks = 0
+    for chunk in _iter_chunks(rows, chunk_rows):
+        columns = list(zip(*chunk))
+        for (name, kind), values in zip(schema, columns):
+            for suffix, array in encode_column(values, kind).items():
+                _write_array(archive, f"{table}/{chunks:05d}/{name}" + (f".{suffix}" if suffix else ""), array)
+        total += len(chunk)
+        chunks += 1
+    return {"rows": total, "chunks": chunks}
+
+
+def export_columnar(path: Union[str, BinaryIO], user_id: Optional[int] = None, since: Optional[str] = None,
+                    tables: Sequence[str] = tuple(TABLE_SCHEMAS), chunk_rows: int = CHUNK_ROWS) -> Dict:
+    """
+    Write `tables` (one user, or every shard of the database) to a columnar
+    .npz archive at `path` (a filename or a seekable binary buffer).
+    Returns the per-table row/chunk counts.
+    """
+    stats = {}
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for table in tables:
+            stats[table] = write_table(archive, table, _iter_rows(table, user_id, since, chunk_rows), chunk_rows)
+        schema = {
+            "format_version": FORMAT_VERSION,
+            "user_id": user_id,
+            "since": since,
+            "tables": {
+                table: {"columns": [list(column) for column in TABLE_SCHEMAS[table]], **stats[table]}
+                for table in tables
+            },
+        }
+        archive.writestr(SCHEMA_ENTRY, json.dumps(schema, indent=2))
+    return stats
+
+
+# =============================================================================
+# READER
+# =============================================================================
+
+def read_schema(path: str) -> Dict:
+    with zipfile.ZipFile(path) as archive:
+        return json.loads(archive.read(SCHEMA_ENTRY))
+
+
+def _empty(kind: str) -> np.ndarray:
+    if kind == "string":
+        return np.zeros(0, dtype=object)
+    return np.zeros(0, dtype=_NUMPY_TYPES.get(kind, "datetime64[us]"))
+
+
+def _read_strings(npz, prefix: str, names: set) -> np.ndarray:
+    if prefix + ".codes" in names:
+        dictionary = np.array(decode_strings(npz[prefix + ".dict.offsets"], npz[prefix + ".dict.data"]), dtype=object)
+        return dictionary[npz[prefix + ".codes"]]
+    return np.array(decode_strings(npz[prefix + ".offsets"], npz[prefix + ".data"]), dtype=object)
+
+
+def read_table(path: str, table: str, columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Concatenate a table's chunks into one array per column (all columns, or
+    just `columns`). Strings come back as object arrays; NULLs are None /
+    NaN / NaT, plus a `<column>.valid` mask for int and bool columns that
+    had NULLs.
+    """
+    info = read_schema(path)["tables"][table]
+    result: Dict[str, np.ndarray] = {}
+    with np.load(path, allow_pickle=False) as npz:
+        names = set(npz.files)
+        for name, kind in info["columns"]:
+            if columns is not None and name not in columns:
+                continue
+            parts, masks = [], []
+            for chunk in range(info["chunks"]):
+                prefix = f"{table}/{chunk:05d}/{name}"
+                values = _read_strings(npz, prefix, names) if kind == "string" else npz[prefix]
+                valid = npz[prefix + ".valid"] if prefix + ".valid" in names else np.ones(len(values), dtype=np.bool_)
+                if kind == "string":
+                    values[~valid] = None
+                parts.append(values)
+                masks.append(valid)
+            result[name] = np.concatenate(parts) if parts else _empty(kind)
+            if kind in ("int", "bool") and not all(mask.all() for mask in masks):
+                result[name + ".valid"] = np.concatenate(masks)
+    return result
+
+
+def read_columnar(path: str, tables: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, np.ndarray]]:
+    tables = tables or list(read_schema(path)["tables"])
+    return {table: read_table(path, table) for table in tables}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the event tables as a columnar .npz archive")
+    parser.add_argument("output")
+    parser.add_argument("--user", type=int, help="only this user (default: whole database, every shard)")
+    parser.add_argument("--since", help="ISO date/datetime lower bound")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    for table, stats in export_columnar(args.output, args.user, args.since, chunk_rows=args.chunk_rows).items():
+        print(f"{table}: {stats['rows']} linhas em {stats['chunks']} bloco(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,71 @@
+import os
 import sqlite3
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 
-DB_NAME = "carnivore_tracker.db"
+import metrics
+from models import MEAL_EVENT_COLUMNS, MealEvent, MealEventBatch
+from sharding import shard_for_user
 
+DB_NAME = os.getenv("DB_NAME", "carnivore_tracker.db")
 
-def get_connection():
-    return sqlite3.connect(DB_NAME)
+# Several bot worker processes may share the file (see supervisor.py):
+# wait for the write lock instead of failing with "database is locked"
+SQLITE_TIMEOUT_SECONDS = 30.0
+
+
+# Optional per-user sharding: with DB_SHARDS > 1 every user lives in one of
+# K files (carnivore_tracker.shard<k>.db) picked by hashing user_id, so
+# writes from different users stop contending on a single lock
+DB_SHARDS = int(os.getenv("DB_SHARDS", "1"))
+
+TABLES = ("users", "meal_events", "fasting_events", "symptom_events", "weight_events", "goals", "voice_notes",
+          "cohort_metrics")
+
+
+def shard_path(shard: int) -> str:
+    base, ext = os.path.splitext(DB_NAME)
+    return f"{base}.shard{shard}{ext or '.db'}"
+
+
+def get_db_path(user_id: Optional[int] = None) -> str:
+    if DB_SHARDS <= 1:
+        return DB_NAME
+    if user_id is None:
+        raise ValueError("user_id is required when DB_SHARDS > 1 (use iter_shard_paths for admin scans)")
+    return shard_path(shard_for_user(user_id, DB_SHARDS))
+
+
+def get_connection(user_id: Optional[int] = None):
+    return sqlite3.connect(get_db_path(user_id), timeout=SQLITE_TIMEOUT_SECONDS)
+
+
+def iter_shard_paths() -> Iterator[str]:
+    if DB_SHARDS <= 1:
+        yield DB_NAME
+    else:
+        for shard in range(DB_SHARDS):
+            yield shard_path(shard)
 
 
 def init_db():
-    conn = get_connection()
+    for path in iter_shard_paths():
+        _init_db_file(path)
+    # files may have been recreated underneath the cache
+    _daily_stats_cache.clear()
+
+
+def _init_db_file(path: str):
+    conn = sqlite3.connect(path, timeout=SQLITE_TIMEOUT_SECONDS)
     c = conn.cursor()
     
+    # WAL lets readers in other processes proceed while one process writes
+    c.execute("PRAGMA journal_mode=WAL")
+    
     c.execute('''CREATE TABLE IF NOT EXISTS users (
                     user_id INTEGER PRIMARY KEY,
                     username TEXT,
@@ -86,12 +138,34 @@ def init_db():
                     FOREIGN KEY(user_id) REFERENCES users(user_id)
                 )''')
     
+    # One row per user, rewritten by cohort_analytics.py
+    c.execute('''CREATE TABLE IF NOT EXISTS cohort_metrics (
+                    user_id INTEGER PRIMARY KEY,
+                    computed_at TEXT,
+                    days_on_protocol INTEGER,
+                    keto_adaptation_score INTEGER,
+                    keto_adaptation_label TEXT,
+                    carnivore_compliance REAL,
+                    electrolyte_risk TEXT,
+                    weight_trend TEXT,
+                    avg_fat_protein_ratio REAL,
+                    avg_fasting_duration REAL,
+                    meals_30d INTEGER,
+                    FOREIGN KEY(user_id) REFERENCES users(user_id)
+                )''')
+    
+    # Range scans (exports, reports) read one user's meals in datetime order
+    c.execute("CREATE INDEX IF NOT EXISTS idx_meal_events_user_datetime ON meal_events(user_id, datetime)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_weight_events_user_datetime ON weight_events(user_id, datetime)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_symptom_events_user_datetime ON symptom_events(user_id, datetime)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_fasting_events_user_start ON fasting_events(user_id, start_time)")
+    
     conn.commit()
     conn.close()
 
 
 def add_user(user_id: int, username: str = None, preferred_level: str = "strict"):
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute(
@@ -103,8 +177,37 @@ def add_user(user_id: int, username: str = None, preferred_level: str = "strict"
         conn.close()
 
 
+def get_username(user_id: int) -> Optional[str]:
+    conn = get_connection(user_id)
+    try:
+        row = conn.execute("SELECT username FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def get_user_data_version(user_id: int) -> List[int]:
+    """
+    Changes whenever the user logs a meal, weight, symptom or fast (or ends
+    one): used to tell whether a precomputed report is still current
+    """
+    conn = get_connection(user_id)
+    try:
+        row = conn.execute(
+            '''SELECT (SELECT COALESCE(MAX(id), 0) FROM meal_events WHERE user_id = ?),
+                      (SELECT COALESCE(MAX(id), 0) FROM weight_events WHERE user_id = ?),
+                      (SELECT COALESCE(MAX(id), 0) FROM symptom_events WHERE user_id = ?),
+                      (SELECT COALESCE(MAX(id), 0) FROM fasting_events WHERE user_id = ?),
+                      (SELECT COUNT(end_time) FROM fasting_events WHERE user_id = ?)''',
+            (user_id,) * 5,
+        ).fetchone()
+        return list(row)
+    finally:
+        conn.close()
+
+
 def get_user_preferred_level(user_id: int) -> str:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute("SELECT preferred_level FROM users WHERE user_id = ?", (user_id,))
@@ -115,7 +218,7 @@ def get_user_preferred_level(user_id: int) -> str:
 
 
 def set_user_preferred_level(user_id: int, level: str):
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute("UPDATE users SET preferred_level = ? WHERE user_id = ?", (level, user_id))
@@ -125,7 +228,7 @@ def set_user_preferred_level(user_id: int, level: str):
 
 
 def set_goals(user_id: int, calories: int, protein: int, fat: int):
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute(
@@ -138,7 +241,7 @@ def set_goals(user_id: int, calories: int, protein: int, fat: int):
 
 
 def get_goals(user_id: int) -> Optional[Dict]:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute("SELECT calories, protein, fat FROM goals WHERE user_id = ?", (user_id,))
@@ -152,6 +255,7 @@ def get_goals(user_id: int) -> Optional[Dict]:
 # MEAL EVENTS
 # =============================================================================
 
+@metrics.timed_fn("db.add_meal_event")
 def add_meal_event(
     user_id: int,
     dt: datetime,
@@ -169,7 +273,7 @@ def add_meal_event(
     processing_level: str = "whole",
     needs_confirmation: bool = False
 ) -> int:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute('''INSERT INTO meal_events 
@@ -181,88 +285,318 @@ def add_meal_event(
                    carnivore_level, breaks_fast, json.dumps(warnings), calories, protein_g,
                    fat_g, carbs_g, summary, source, processing_level, needs_confirmation))
         conn.commit()
-        return c.lastrowid
+        meal_id = c.lastrowid
     finally:
         conn.close()
+    
+    iso = dt.isoformat()
+    # REAL columns: cache the values as SQLite would return them
+    _daily_stats_cache.record_meal(
+        (get_db_path(user_id), user_id, iso[:10]), meal_id,
+        iso.split("T")[1][:5] if "T" in iso else iso, ingredients, carnivore_level,
+        float(calories), float(protein_g), float(fat_g),
+    )
+    return meal_id
 
 
+_MEAL_COLUMNS = '''id, datetime, ingredients, quantities, carnivore_level, breaks_fast,
+                   warnings, calories, protein_g, fat_g, carbs_g, summary, source,
+                   processing_level, needs_confirmation'''
+
+
+def _meal_from_row(row: Tuple) -> Dict:
+    return {
+        "id": row[0],
+        "datetime": row[1],
+        "time": row[1].split("T")[1][:5] if "T" in row[1] else row[1],
+        "ingredients": json.loads(row[2]) if row[2] else [],
+        "quantities": json.loads(row[3]) if row[3] else [],
+        "carnivore_level": row[4],
+        "breaks_fast": row[5],
+        "warnings": json.loads(row[6]) if row[6] else [],
+        "calories": row[7],
+        "protein_g": row[8],
+        "fat_g": row[9],
+        "carbs_g": row[10],
+        "summary": row[11],
+        "source": row[12],
+        "processing_level": row[13],
+        "needs_confirmation": row[14],
+    }
+
+
+@metrics.timed_fn("db.get_meal_events")
 def get_meal_events(user_id: int, date: str) -> List[Dict]:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
-        c.execute('''SELECT id, datetime, ingredients, quantities, carnivore_level, breaks_fast,
-                            warnings, calories, protein_g, fat_g, carbs_g, summary, source,
-                            processing_level, needs_confirmation
+        c.execute(f'''SELECT {_MEAL_COLUMNS}
                      FROM meal_events 
                      WHERE user_id = ? AND datetime LIKE ?
                      ORDER BY datetime''', (user_id, f"{date}%"))
-        meals = []
-        for row in c.fetchall():
-            meals.append({
-                "id": row[0],
-                "datetime": row[1],
-                "time": row[1].split("T")[1][:5] if "T" in row[1] else row[1],
-                "ingredients": json.loads(row[2]) if row[2] else [],
-                "quantities": json.loads(row[3]) if row[3] else [],
-                "carnivore_level": row[4],
-                "breaks_fast": row[5],
-                "warnings": json.loads(row[6]) if row[6] else [],
-                "calories": row[7],
-                "protein_g": row[8],
-                "fat_g": row[9],
-                "carbs_g": row[10],
-                "summary": row[11],
-                "source": row[12],
-                "processing_level": row[13],
-                "needs_confirmation": row[14],
-            })
-        return meals
+        return [_meal_from_row(row) for row in c.fetchall()]
     finally:
         conn.close()
 
 
-def get_daily_stats(user_id: int, date: str) -> Dict:
-    meals = get_meal_events(user_id, date)
-    
-    if not meals:
+# Export/report periods: None = whole history
+EXPORT_PERIODS = ("daily", "weekly", "monthly", "yearly", "all")
+_PERIOD_DAYS = {"weekly": 7, "monthly": 30, "yearly": 365}
+
+
+def period_start(period: str, now: Optional[datetime] = None) -> Optional[str]:
+    """Lower datetime bound (ISO string) of an export period"""
+    now = now or datetime.now()
+    if period == "daily":
+        return now.strftime('%Y-%m-%d')
+    if period == "all":
+        return None
+    if period not in _PERIOD_DAYS:
+        raise ValueError(f"Unknown period: {period}")
+    return (now - timedelta(days=_PERIOD_DAYS[period])).isoformat()
+
+
+def iter_meal_events(user_id: int, since: Optional[str] = None, batch_size: int = 1000) -> Iterator[Dict]:
+    """
+    Stream a user's meals (get_meal_events dicts) in datetime order, holding
+    at most `batch_size` rows in memory. The connection stays open until
+    the generator is exhausted or closed.
+    """
+    conn = get_connection(user_id)
+    try:
+        c = conn.execute(
+            f'''SELECT {_MEAL_COLUMNS} FROM meal_events
+                WHERE user_id = ? AND datetime >= ? ORDER BY datetime''',
+            (user_id, since or ""),
+        )
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield _meal_from_row(row)
+    finally:
+        conn.close()
+
+
+def _iter_meal_rows(user_id: int, since: Optional[str], batch_size: int) -> Iterator[Tuple]:
+    conn = get_connection(user_id)
+    try:
+        c = conn.execute(
+            f'''SELECT {", ".join(MEAL_EVENT_COLUMNS)} FROM meal_events
+                WHERE user_id = ? AND datetime >= ? ORDER BY datetime''',
+            (user_id, since or ""),
+        )
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def iter_meal_models(user_id: int, since: Optional[str] = None, batch_size: int = 1000) -> Iterator[MealEvent]:
+    """Stream a user's meals as slotted models.MealEvent, in datetime order"""
+    return map(MealEvent.from_row, _iter_meal_rows(user_id, since, batch_size))
+
+
+@metrics.timed_fn("db.load_meal_batch")
+def load_meal_batch(user_id: int, since: Optional[str] = None, batch_size: int = 1000) -> MealEventBatch:
+    """A user's meals since `since` as a columnar models.MealEventBatch"""
+    return MealEventBatch.from_rows(_iter_meal_rows(user_id, since, batch_size))
+
+
+@metrics.timed_fn("db.get_period_totals")
+def get_period_totals(user_id: int, since: Optional[str] = None) -> Dict:
+    """Meal totals since `since`, aggregated in SQL (constant memory for any range)"""
+    conn = get_connection(user_id)
+    try:
+        row = conn.execute(
+            '''SELECT COUNT(*), COALESCE(SUM(calories), 0), COALESCE(SUM(protein_g), 0),
+                      COALESCE(SUM(fat_g), 0), COALESCE(SUM(carbs_g), 0),
+                      SUM(carnivore_level = 'strict'), MIN(datetime), MAX(datetime)
+               FROM meal_events WHERE user_id = ? AND datetime >= ?''',
+            (user_id, since or ""),
+        ).fetchone()
+    finally:
+        conn.close()
+    count, calories, protein, fat, carbs, strict, first, last = row
+    return {
+        "meal_count": count,
+        "total_calories": calories,
+        "total_protein_g": protein,
+        "total_fat_g": fat,
+        "total_carbs_g": carbs,
+        "carnivore_compliance": (strict / count) * 100 if count else 100.0,
+        "first_meal": first,
+        "last_meal": last,
+    }
+
+
+# Per-(db file, user, date) aggregates behind get_daily_stats. A miss loads
+# the day once; add_meal_event then folds each new meal into the cached
+# entry instead of dropping it, so reads skip loading and parsing the rows.
+# Entries live in one process, but other processes (webhook workers behind a
+# proxy) write to the same files: a hit older than DAILY_STATS_RECHECK_SECONDS
+# is checked against the day's COUNT(*)/MAX(id) in SQLite, a covering index
+# lookup, and reloaded if it differs (0 checks on every hit).
+DAILY_STATS_CACHE_SIZE = int(os.getenv("DAILY_STATS_CACHE_SIZE", "4096"))
+DAILY_STATS_RECHECK_SECONDS = float(os.getenv("DAILY_STATS_RECHECK_SECONDS", "2"))
+
+
+class DayAggregate:
+    """Running totals of one user's meals on one day"""
+
+    __slots__ = ("protein", "fat", "calories", "count", "strict", "ingredients", "first", "last", "ids", "checked")
+
+    def __init__(self):
+        self.protein = self.fat = self.calories = 0
+        self.count = self.strict = 0
+        self.ingredients = set()
+        self.first = self.last = None
+        self.ids = set()
+        self.checked = 0.0
+
+    def add(self, meal_id: int, time: Optional[str], ingredients: List[str], carnivore_level: str,
+            calories: float, protein_g: float, fat_g: float):
+        # a load that ran after the INSERT committed already counted this meal
+        if meal_id in self.ids:
+            return
+        self.ids.add(meal_id)
+        self.protein += protein_g
+        self.fat += fat_g
+        self.calories += calories
+        self.count += 1
+        if carnivore_level == "strict":
+            self.strict += 1
+        self.ingredients.update(ingredients)
+        if time:
+            if self.first is None or time < self.first:
+                self.first = time
+            if self.last is None or time > self.last:
+                self.last = time
+
+    def version(self) -> Tuple[int, int]:
+        """(COUNT(*), MAX(id)) of the meals folded in, as _day_version reads them"""
+        return self.count, max(self.ids, default=0)
+
+    def to_stats(self) -> Dict:
         return {
-            "total_protein_g": 0,
-            "total_fat_g": 0,
-            "total_calories": 0,
-            "meal_count": 0,
-            "unique_ingredients": [],
-            "first_meal_time": None,
-            "last_meal_time": None,
-            "carnivore_compliance": 100.0,
+            "total_protein_g": self.protein,
+            "total_fat_g": self.fat,
+            "total_calories": self.calories,
+            "meal_count": self.count,
+            "unique_ingredients": list(self.ingredients),
+            "first_meal_time": self.first,
+            "last_meal_time": self.last,
+            "carnivore_compliance": (self.strict / self.count) * 100 if self.count else 100.0,
+            "fat_protein_ratio": round(self.fat / self.protein, 2) if self.protein > 0 else None,
         }
+
+
+class DailyStatsCache:
+    """LRU of DayAggregate, updated in place by writes"""
+
+    def __init__(self, maxsize: int = DAILY_STATS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple, DayAggregate]" = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped by every write: a load that raced with a write is not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def needs_check(self, key: Tuple) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and time.monotonic() - entry.checked >= DAILY_STATS_RECHECK_SECONDS
+
+    def get(self, key: Tuple, version: Optional[Tuple[int, int]] = None) -> Optional[Dict]:
+        """Cached stats, unless `version` (the day in SQLite) shows writes from elsewhere"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and version is not None:
+                if entry.version() != version:
+                    del self._data[key]
+                    self.stale += 1
+                    entry = None
+                else:
+                    entry.checked = time.monotonic()
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.to_stats()
+
+    def put(self, key: Tuple, entry: DayAggregate, generation: int):
+        with self._lock:
+            if generation != self.generation:
+                return
+            entry.checked = time.monotonic()
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def record_meal(self, key: Tuple, meal_id: int, *meal):
+        with self._lock:
+            self.generation += 1
+            entry = self._data.get(key)
+            if entry is not None:
+                entry.add(meal_id, *meal)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+            self.hits = self.misses = self.stale = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+_daily_stats_cache = DailyStatsCache()
+
+
+def get_daily_stats_cache() -> DailyStatsCache:
+    return _daily_stats_cache
+
+
+def _day_version(user_id: int, date: str) -> Tuple[int, int]:
+    """(COUNT(*), MAX(id)) of the user's meals on `date`, from the (user_id, datetime) index"""
+    next_day = (datetime.strptime(date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    conn = get_connection(user_id)
+    try:
+        count, max_id = conn.execute(
+            '''SELECT COUNT(*), COALESCE(MAX(id), 0) FROM meal_events
+               WHERE user_id = ? AND datetime >= ? AND datetime < ?''',
+            (user_id, date, next_day)
+        ).fetchone()
+        return count, max_id
+    finally:
+        conn.close()
+
+
+@metrics.timed_fn("db.get_daily_stats")
+def get_daily_stats(user_id: int, date: str) -> Dict:
+    # only whole days are cached: get_meal_events also accepts prefixes ("2025-01")
+    key = (get_db_path(user_id), user_id, date) if len(date) == 10 else None
+    if key is not None:
+        version = _day_version(user_id, date) if _daily_stats_cache.needs_check(key) else None
+        cached = _daily_stats_cache.get(key, version)
+        if cached is not None:
+            return cached
     
-    total_protein = sum(m["protein_g"] for m in meals)
-    total_fat = sum(m["fat_g"] for m in meals)
-    total_calories = sum(m["calories"] for m in meals)
-    
-    all_ingredients = []
-    for m in meals:
-        all_ingredients.extend(m["ingredients"])
-    unique_ingredients = list(set(all_ingredients))
-    
-    strict_count = sum(1 for m in meals if m["carnivore_level"] == "strict")
-    compliance = (strict_count / len(meals)) * 100 if meals else 100.0
-    
-    times = [m["time"] for m in meals if m["time"]]
-    first_time = min(times) if times else None
-    last_time = max(times) if times else None
-    
-    return {
-        "total_protein_g": total_protein,
-        "total_fat_g": total_fat,
-        "total_calories": total_calories,
-        "meal_count": len(meals),
-        "unique_ingredients": unique_ingredients,
-        "first_meal_time": first_time,
-        "last_meal_time": last_time,
-        "carnivore_compliance": compliance,
-        "fat_protein_ratio": round(total_fat / total_protein, 2) if total_protein > 0 else None,
-    }
+    generation = _daily_stats_cache.generation
+    entry = DayAggregate()
+    for m in get_meal_events(user_id, date):
+        entry.add(m["id"], m["time"], m["ingredients"], m["carnivore_level"], m["calories"], m["protein_g"], m["fat_g"])
+    if key is not None:
+        _daily_stats_cache.put(key, entry, generation)
+    return entry.to_stats()
 
 
 # =============================================================================
@@ -270,7 +604,7 @@ def get_daily_stats(user_id: int, date: str) -> Dict:
 # =============================================================================
 
 def start_fast(user_id: int, start_time: datetime) -> int:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute(
@@ -284,7 +618,7 @@ def start_fast(user_id: int, start_time: datetime) -> int:
 
 
 def end_fast(user_id: int, end_time: datetime) -> bool:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute(
@@ -307,7 +641,7 @@ def end_fast(user_id: int, end_time: datetime) -> bool:
 
 
 def get_active_fast(user_id: int) -> Optional[Dict]:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute(
@@ -329,7 +663,7 @@ def get_active_fast(user_id: int) -> Optional[Dict]:
 # =============================================================================
 
 def add_symptom(user_id: int, dt: datetime, symptom_type: str, severity: int, notes: str = "") -> int:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute(
@@ -343,7 +677,7 @@ def add_symptom(user_id: int, dt: datetime, symptom_type: str, severity: int, no
 
 
 def get_symptoms(user_id: int, date: str) -> List[Dict]:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute(
@@ -364,7 +698,7 @@ def get_symptoms(user_id: int, date: str) -> List[Dict]:
 # =============================================================================
 
 def add_weight(user_id: int, dt: datetime, weight_kg: float, notes: str = "") -> int:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute(
@@ -378,7 +712,7 @@ def add_weight(user_id: int, dt: datetime, weight_kg: float, notes: str = "") ->
 
 
 def get_weight_history(user_id: int, limit: int = 30) -> List[Dict]:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute(
@@ -396,7 +730,7 @@ def get_weight_history(user_id: int, limit: int = 30) -> List[Dict]:
 # =============================================================================
 
 def get_fasting_history(user_id: int, days: int = 30) -> List[Dict]:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         cutoff = (datetime.now() - timedelta(days=days)).isoformat()
@@ -423,7 +757,7 @@ def get_fasting_history(user_id: int, days: int = 30) -> List[Dict]:
 
 
 def get_symptoms_history(user_id: int, days: int = 30) -> List[Dict]:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         cutoff = (datetime.now() - timedelta(days=days)).isoformat()
@@ -442,7 +776,7 @@ def get_symptoms_history(user_id: int, days: int = 30) -> List[Dict]:
 
 
 def get_meals_history(user_id: int, days: int = 30) -> List[Dict]:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         cutoff = (datetime.now() - timedelta(days=days)).isoformat()
@@ -470,7 +804,7 @@ def get_meals_history(user_id: int, days: int = 30) -> List[Dict]:
 
 
 def get_user_start_date(user_id: int) -> Optional[str]:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute("SELECT first_seen FROM users WHERE user_id = ?", (user_id,))
@@ -480,6 +814,7 @@ def get_user_start_date(user_id: int) -> Optional[str]:
         conn.close()
 
 
+@metrics.timed_fn("db.get_metabolic_stats")
 def get_metabolic_stats(user_id: int) -> Dict:
     meals = get_meals_history(user_id, 30)
     symptoms = get_symptoms_history(user_id, 30)
@@ -487,13 +822,7 @@ def get_metabolic_stats(user_id: int) -> Dict:
     weights = get_weight_history(user_id, 30)
     start_date = get_user_start_date(user_id)
     
-    days_on_protocol = 0
-    if start_date:
-        try:
-            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00').split('+')[0])
-            days_on_protocol = (datetime.now() - start_dt).days
-        except (ValueError, TypeError):
-            days_on_protocol = 0
+    days_on_protocol = _days_on_protocol(start_date, datetime.now())
     
     recent_meals = [m for m in meals if m['datetime'] >= (datetime.now() - timedelta(days=7)).isoformat()]
     
@@ -562,23 +891,9 @@ def get_metabolic_stats(user_id: int) -> Dict:
         common_symptoms = sorted(symptom_counts.items(), key=lambda x: x[1], reverse=True)[:3]
         common_symptoms = [s[0] for s in common_symptoms]
         
-        if electrolyte_symptom_count > 15:
-            electrolyte_risk = "high"
-        elif electrolyte_symptom_count > 5:
-            electrolyte_risk = "medium"
-        else:
-            electrolyte_risk = "low"
-        
-        if recent_energy_scores:
-            avg_energy = sum(recent_energy_scores) / len(recent_energy_scores)
-            if avg_energy > 1:
-                energy_trend = "improving"
-            elif avg_energy < -1:
-                energy_trend = "declining"
-            else:
-                energy_trend = "stable"
-        else:
-            energy_trend = "unknown"
+        electrolyte_risk = _electrolyte_risk(electrolyte_symptom_count)
+        energy_trend = _energy_trend(
+            sum(recent_energy_scores) / len(recent_energy_scores) if recent_energy_scores else None)
     else:
         symptom_frequency = 0
         common_symptoms = []
@@ -586,19 +901,72 @@ def get_metabolic_stats(user_id: int) -> Dict:
         energy_trend = "unknown"
     
     if len(weights) >= 2:
-        recent_weight = weights[0]['weight_kg']
-        oldest_weight = weights[-1]['weight_kg']
-        weight_change = round(recent_weight - oldest_weight, 1)
-        
-        if weight_change < -0.5:
-            weight_trend = f"losing ({weight_change:+.1f} kg)"
-        elif weight_change > 0.5:
-            weight_trend = f"gaining ({weight_change:+.1f} kg)"
-        else:
-            weight_trend = "stable"
+        weight_trend = _weight_trend(round(weights[0]['weight_kg'] - weights[-1]['weight_kg'], 1))
     else:
         weight_trend = "insufficient data"
     
+    keto_adaptation_score = _keto_adaptation_score(
+        days_on_protocol, carnivore_compliance, avg_fat_protein_ratio, electrolyte_risk, avg_fasting_duration)
+    
+    return {
+        "keto_adaptation_score": keto_adaptation_score,
+        "keto_adaptation_label": _get_keto_label(keto_adaptation_score),
+        "electrolyte_risk": electrolyte_risk,
+        "energy_trend": energy_trend,
+        "days_on_protocol": days_on_protocol,
+        "avg_daily_protein": avg_daily_protein,
+        "avg_daily_fat": avg_daily_fat,
+        "avg_daily_calories": avg_daily_calories,
+        "avg_fat_protein_ratio": avg_fat_protein_ratio,
+        "fasting_frequency": fasting_frequency,
+        "avg_fasting_duration": avg_fasting_duration,
+        "symptom_frequency": symptom_frequency,
+        "common_symptoms": common_symptoms,
+        "weight_trend": weight_trend,
+        "carnivore_compliance": carnivore_compliance,
+    }
+
+
+# Scoring pieces shared with analytics.py (vectorized) and cohort jobs
+
+def _days_on_protocol(start_date: Optional[str], now: datetime) -> int:
+    if not start_date:
+        return 0
+    try:
+        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00').split('+')[0])
+        return (now - start_dt).days
+    except (ValueError, TypeError):
+        return 0
+
+
+def _electrolyte_risk(severity_total: int) -> str:
+    if severity_total > 15:
+        return "high"
+    if severity_total > 5:
+        return "medium"
+    return "low"
+
+
+def _energy_trend(avg_energy: Optional[float]) -> str:
+    if avg_energy is None:
+        return "unknown"
+    if avg_energy > 1:
+        return "improving"
+    if avg_energy < -1:
+        return "declining"
+    return "stable"
+
+
+def _weight_trend(weight_change: float) -> str:
+    if weight_change < -0.5:
+        return f"losing ({weight_change:+.1f} kg)"
+    if weight_change > 0.5:
+        return f"gaining ({weight_change:+.1f} kg)"
+    return "stable"
+
+
+def _keto_adaptation_score(days_on_protocol: int, carnivore_compliance: float, avg_fat_protein_ratio: float,
+                           electrolyte_risk: str, avg_fasting_duration: float) -> int:
     keto_score = 0
     
     if days_on_protocol >= 30:
@@ -627,25 +995,7 @@ def get_metabolic_stats(user_id: int) -> Dict:
     elif avg_fasting_duration >= 12:
         keto_score += 5
     
-    keto_adaptation_score = min(100, keto_score)
-    
-    return {
-        "keto_adaptation_score": keto_adaptation_score,
-        "keto_adaptation_label": _get_keto_label(keto_adaptation_score),
-        "electrolyte_risk": electrolyte_risk,
-        "energy_trend": energy_trend,
-        "days_on_protocol": days_on_protocol,
-        "avg_daily_protein": avg_daily_protein,
-        "avg_daily_fat": avg_daily_fat,
-        "avg_daily_calories": avg_daily_calories,
-        "avg_fat_protein_ratio": avg_fat_protein_ratio,
-        "fasting_frequency": fasting_frequency,
-        "avg_fasting_duration": avg_fasting_duration,
-        "symptom_frequency": symptom_frequency,
-        "common_symptoms": common_symptoms,
-        "weight_trend": weight_trend,
-        "carnivore_compliance": carnivore_compliance,
-    }
+    return min(100, keto_score)
 
 
 def _get_keto_label(score: int) -> str:
@@ -661,6 +1011,7 @@ def _get_keto_label(score: int) -> str:
         return "Not Yet Adapted"
 
 
+@metrics.timed_fn("db.get_weekly_summary")
 def get_weekly_summary(user_id: int) -> Dict:
     meals = get_meals_history(user_id, 7)
     symptoms = get_symptoms_history(user_id, 7)
@@ -716,12 +1067,111 @@ def get_weekly_summary(user_id: int) -> Dict:
     }
 
 
+# =============================================================================
+# PERIOD ROLLUPS (monthly / yearly reports)
+# =============================================================================
+# Long-range reports work from one row per day, aggregated by SQLite, so the
+# Python side is bounded by the number of days in the range, not by meals.
+
+@metrics.timed_fn("db.get_daily_rollups")
+def get_daily_rollups(user_id: int, since: Optional[str] = None) -> List[Dict]:
+    """Per-day meal totals since `since`, oldest first"""
+    conn = get_connection(user_id)
+    try:
+        rows = conn.execute(
+            '''SELECT substr(datetime, 1, 10) AS day, COUNT(*), COALESCE(SUM(calories), 0),
+                      COALESCE(SUM(protein_g), 0), COALESCE(SUM(fat_g), 0), COALESCE(SUM(carbs_g), 0),
+                      SUM(carnivore_level = 'strict')
+               FROM meal_events WHERE user_id = ? AND datetime >= ?
+               GROUP BY day ORDER BY day''',
+            (user_id, since or ""),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [
+        {"date": r[0], "meals": r[1], "calories": r[2], "protein": r[3], "fat": r[4], "carbs": r[5], "strict": r[6]}
+        for r in rows
+    ]
+
+
+def get_daily_weights(user_id: int, since: Optional[str] = None) -> List[Dict]:
+    """Mean weight per day since `since`, oldest first"""
+    conn = get_connection(user_id)
+    try:
+        rows = conn.execute(
+            '''SELECT substr(datetime, 1, 10) AS day, AVG(weight_kg) FROM weight_events
+               WHERE user_id = ? AND datetime >= ? GROUP BY day ORDER BY day''',
+            (user_id, since or ""),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{"date": r[0], "weight_kg": r[1]} for r in rows]
+
+
+@metrics.timed_fn("db.get_period_summary")
+def get_period_summary(user_id: int, period: str, now: Optional[datetime] = None) -> Dict:
+    """
+    Summary of a monthly/yearly/all period (get_weekly_summary keys, plus the
+    per-day rollups and weights) built from SQL aggregates only
+    """
+    now = now or datetime.now()
+    since = period_start(period, now)
+    days = get_daily_rollups(user_id, since)
+    weights = get_daily_weights(user_id, since)
+    
+    conn = get_connection(user_id)
+    try:
+        fasts_completed, fasting_hours = conn.execute(
+            '''SELECT COUNT(*), COALESCE(SUM((julianday(end_time) - julianday(start_time)) * 24), 0)
+               FROM fasting_events WHERE user_id = ? AND end_time IS NOT NULL AND start_time >= ?''',
+            (user_id, since or ""),
+        ).fetchone()
+        symptom_counts = conn.execute(
+            '''SELECT symptom_type, COUNT(*) FROM symptom_events
+               WHERE user_id = ? AND datetime >= ? GROUP BY symptom_type
+               ORDER BY COUNT(*) DESC, symptom_type''',
+            (user_id, since or ""),
+        ).fetchall()
+    finally:
+        conn.close()
+    
+    days_tracked = len(days)
+    total_meals = sum(d["meals"] for d in days)
+    total_strict = sum(d["strict"] for d in days)
+    total_calories = sum(d["calories"] for d in days)
+    total_protein = sum(d["protein"] for d in days)
+    total_fat = sum(d["fat"] for d in days)
+    weight_change = weights[-1]["weight_kg"] - weights[0]["weight_kg"] if len(weights) >= 2 else 0.0
+    
+    return {
+        "period": period,
+        "start_date": since[:10] if since else (days[0]["date"] if days else now.strftime('%Y-%m-%d')),
+        "end_date": now.strftime('%Y-%m-%d'),
+        "days_tracked": days_tracked,
+        "total_meals": total_meals,
+        "total_calories": round(total_calories, 0),
+        "total_protein": round(total_protein, 0),
+        "total_fat": round(total_fat, 0),
+        "avg_daily_calories": round(total_calories / days_tracked, 0) if days_tracked else 0,
+        "avg_daily_protein": round(total_protein / days_tracked, 0) if days_tracked else 0,
+        "avg_daily_fat": round(total_fat / days_tracked, 0) if days_tracked else 0,
+        "compliance": round((total_strict / total_meals) * 100, 1) if total_meals else 100.0,
+        "fasts_completed": fasts_completed,
+        "total_fasting_hours": round(fasting_hours, 1),
+        "symptoms_logged": sum(count for _, count in symptom_counts),
+        "top_symptoms": [tuple(row) for row in symptom_counts[:3]],
+        "weight_change": round(weight_change, 1),
+        "daily_rollups": days,
+        "daily_weights": weights,
+    }
+
+
 # =============================================================================
 # VOICE NOTES (legacy compatibility)
 # =============================================================================
 
 def add_voice_note(user_id: int, transcription: str, food_detected: bool):
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     now = datetime.now()
     date_str = now.strftime('%Y-%m-%d')
@@ -737,7 +1187,7 @@ def add_voice_note(user_id: int, transcription: str, food_detected: bool):
 
 
 def get_voice_notes(user_id: int, date: str) -> List[Dict]:
-    conn = get_connection()
+    conn = get_connection(user_id)
     c = conn.cursor()
     try:
         c.execute(
@@ -790,4 +1240,37 @@ def get_meals(user_id: int, date: str) -> List[Dict]:
     ]
 
 
+# =============================================================================
+# CROSS-SHARD ADMIN ITERATORS (exports, backfills, batch jobs)
+# =============================================================================
+
+def iter_table_rows(table: str, columns: str = "*", order_by: Optional[str] = None,
+                    batch_size: int = 1000) -> Iterator[Tuple]:
+    """
+    Stream every row of `table` from every shard. Rows are yielded shard by
+    shard; `order_by` applies within each shard.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    query = f"SELECT {columns} FROM {table}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    
+    for path in iter_shard_paths():
+        conn = sqlite3.connect(path, timeout=SQLITE_TIMEOUT_SECONDS)
+        try:
+            c = conn.execute(query)
+            while True:
+                rows = c.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+
+def get_all_user_ids() -> List[int]:
+    return sorted(row[0] for row in iter_table_rows("users", "user_id"))
+
+
 init_db()
@@ -0,0 +1,366 @@
+"""
+Pluggable LLM backends.
+
+Every LLM call in bot.py names a task (extract, suggest, guru, recipe,
+plan, vision). Each task picks its backend, model and timeout
+independently, so cheap tasks can go to a smaller/faster model:
+
+    LLM_BACKEND=fake                  # route every task to one backend
+                                      # (models default to OLLAMA_MODEL / GEMINI_MODEL)
+    LLM_EXTRACT_MODEL=qwen2.5:3b      # per-task model
+    LLM_PLAN_TIMEOUT=180              # per-task timeout (seconds)
+    LLM_VISION_BACKEND=ollama LLM_VISION_MODEL=llava   # per-task backend
+
+Backends: OllamaBackend (llm_client), GeminiBackend (google-genai) and
+FakeBackend, an in-process deterministic stand-in with configurable
+latency and failure rate for tests, load tests and offline benchmarks.
+
+Each backend sits behind a CircuitBreaker: after LLM_BREAKER_FAILURES
+consecutive failures or slow calls (over LLM_SLOW_FRACTION of the task
+timeout) it opens and calls fail fast with CircuitOpenError for
+LLM_BREAKER_RESET seconds, then a single probe call decides whether it
+closes again. `acomplete` / `aanalyze_image` run the call in a worker
+thread under the task timeout, so a hung model never blocks the event
+loop; callers use their own fallbacks on any exception.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import llm_client
+import llm_parsing
+
+logger = logging.getLogger(__name__)
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET", "30"))
+# A call slower than this fraction of its task timeout counts as a failure
+SLOW_CALL_FRACTION = float(os.getenv("LLM_SLOW_FRACTION", "0.8"))
+
+
+class LLMBackend:
+    name = "base"
+
+    def chat(self, task: str, prompt: str, model: str, timeout: Optional[float],
+             format: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def vision(self, task: str, prompt: str, image_path: str, model: str, timeout: Optional[float]) -> str:
+        raise NotImplementedError(f"{self.name} não suporta imagens")
+
+
+class OllamaBackend(LLMBackend):
+    name = "ollama"
+
+    def chat(self, task, prompt, model, timeout, format=None):
+        return llm_client.chat(task, prompt, format=format, model=model, timeout=timeout)
+
+    def vision(self, task, prompt, image_path, model, timeout):
+        return llm_client.chat(task, prompt, format=llm_parsing.OLLAMA_JSON_FORMAT, model=model,
+                               timeout=timeout, images=[image_path])
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = GEMINI_API_KEY):
+        self.api_key = api_key
+        self._clients: Dict[Optional[float], object] = {}
+
+    def _client(self, timeout: Optional[float]):
+        if timeout not in self._clients:
+            from google import genai
+
+            http_options = {"timeout": int(timeout * 1000)} if timeout else None
+            self._clients[timeout] = genai.Client(api_key=self.api_key, http_options=http_options)
+        return self._clients[timeout]
+
+    def chat(self, task, prompt, model, timeout, format=None):
+        config = llm_parsing.GEMINI_JSON_CONFIG if format == llm_parsing.OLLAMA_JSON_FORMAT else None
+        response = self._client(timeout).models.generate_content(model=model, contents=[prompt], config=config)
+        return response.text
+
+    def vision(self, task, prompt, image_path, model, timeout):
+        from PIL import Image
+
+        img = Image.open(image_path)
+        response = self._client(timeout).models.generate_content(
+            model=model,
+            contents=[prompt, img],
+            config=llm_parsing.GEMINI_JSON_CONFIG,
+        )
+        return response.text
+
+
+class FakeBackend(LLMBackend):
+    """Deterministic canned replies with configurable latency and failure rate"""
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, vision_latency: Optional[float] = None,
+                 failure_rate: float = 0.0, seed: int = 42):
+        self.latency = latency
+        self.vision_latency = latency if vision_latency is None else vision_latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls: Dict[str, int] = {}
+
+    def _wait(self, task: str, latency: float, timeout: Optional[float]):
+        self.calls[task] = self.calls.get(task, 0) + 1
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"fake {task} timed out after {timeout}s")
+        time.sleep(latency)
+        if self.random.random() < self.failure_rate:
+            raise ConnectionError(f"fake {task} failure")
+
+    def chat(self, task, prompt, model, timeout, format=None):
+        self._wait(task, self.latency, timeout)
+        if task == "extract":
+            return _fake_meal_reply(prompt)
+        if task == "recipe":
+            return json.dumps({
+                "name": "Picanha na manteiga",
+                "ingredients": ["300g picanha", "20g manteiga", "sal"],
+                "steps": ["Tempere com sal", "Sele 4 min de cada lado", "Finalize com manteiga"],
+                "time_minutes": 15,
+                "carnivore_level": "relaxed",
+                "estimated_macros": {"calories": 750, "protein_g": 60, "fat_g": 55},
+            })
+        return "Picanha com manteiga e sal."
+
+    def vision(self, task, prompt, image_path, model, timeout):
+        self._wait(task, self.vision_latency, timeout)
+        return json.dumps({
+            "identified_foods": ["steak"],
+            "animal_based": ["steak"],
+            "plant_based": [],
+            "carnivore_level": "strict",
+            "estimated_macros": {"calories": 600, "protein_g": 50, "fat_g": 40},
+            "warnings": [],
+        })
+
+
+def _fake_meal_reply(prompt: str) -> str:
+    food = "picanha" if "picanha" in prompt else "beef"
+    return json.dumps({
+        "is_food": True,
+        "summary": f"Refeição de {food}",
+        "ingredients": [food, "salt"],
+        "quantities": ["300g", "a gosto"],
+        "forbidden_ingredients": [],
+        "calories": 650,
+        "protein_g": 50,
+        "fat_g": 48,
+        "carbs_g": 0,
+        "confidence": "high",
+    })
+
+
+# =============================================================================
+# TASK ROUTING
+# =============================================================================
+
+@dataclass
+class TaskConfig:
+    backend: str
+    model: str
+    timeout: float
+
+
+# a task's model defaults to its resolved backend's model, so LLM_BACKEND alone is enough
+_DEFAULT_MODELS = {"ollama": llm_client.OLLAMA_MODEL, "gemini": GEMINI_MODEL}
+
+
+def _task_config(task: str, backend: str, timeout: float) -> TaskConfig:
+    prefix = f"LLM_{task.upper()}_"
+    backend = os.getenv(prefix + "BACKEND", os.getenv("LLM_BACKEND", backend))
+    return TaskConfig(
+        backend=backend,
+        model=os.getenv(prefix + "MODEL", _DEFAULT_MODELS.get(backend, llm_client.OLLAMA_MODEL)),
+        timeout=float(os.getenv(prefix + "TIMEOUT", timeout)),
+    )
+
+
+def _build_tasks() -> Dict[str, TaskConfig]:
+    return {
+        "extract": _task_config("extract", "ollama", 30),
+        "suggest": _task_config("suggest", "ollama", 45),
+        "guru": _task_config("guru", "ollama", 45),
+        "recipe": _task_config("recipe", "ollama", 60),
+        "plan": _task_config("plan", "ollama", 120),
+        "vision": _task_config("vision", "gemini", 30),
+    }
+
+
+TASKS: Dict[str, TaskConfig] = _build_tasks()
+
+_FACTORIES = {"ollama": OllamaBackend, "gemini": GeminiBackend, "fake": FakeBackend}
+_backends: Dict[str, LLMBackend] = {}
+
+
+def get_backend(name: str) -> LLMBackend:
+    if name not in _backends:
+        if name not in _FACTORIES:
+            raise ValueError(f"unknown LLM backend: {name}")
+        _backends[name] = _FACTORIES[name]()
+    return _backends[name]
+
+
+def register_backend(name: str, backend: LLMBackend):
+    """Install (or replace) the instance used for `name`"""
+    _backends[name] = backend
+
+
+def route_all(name: str):
+    """Point every task at one backend (load tests, offline benchmarks)"""
+    for config in TASKS.values():
+        config.backend = name
+
+
+# =============================================================================
+# CIRCUIT BREAKER
+# =============================================================================
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half_open once `reset_timeout` has elapsed (one probe call);
+    half_open -> closed on success, back to open on failure.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES,
+                 reset_timeout: float = BREAKER_RESET_SECONDS, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit breaker '{self.name}' fechado")
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                logger.warning(
+                    f"Circuit breaker '{self.name}' aberto após {self.failures} falha(s); "
+                    f"nova tentativa em {self.reset_timeout:.0f}s"
+                )
+                self.state = "open"
+                self.opened_at = self.clock()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def breaker_states() -> Dict[str, Dict]:
+    with _breakers_lock:
+        items = list(_breakers.items())
+    return {name: breaker.snapshot() for name, breaker in sorted(items)}
+
+
+def _guarded(task: str, call):
+    """Run `call(backend, config)` through the task backend's breaker"""
+    config = TASKS[task]
+    breaker = get_breaker(config.backend)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{config.backend} indisponível (circuito aberto), tarefa {task}")
+    start = time.perf_counter()
+    try:
+        result = call(get_backend(config.backend), config)
+    except Exception:
+        breaker.record_failure()
+        raise
+    elapsed = time.perf_counter() - start
+    if elapsed > config.timeout * SLOW_CALL_FRACTION:
+        logger.warning(f"LLM[{task}] lento: {elapsed:.1f}s (timeout {config.timeout:.0f}s)")
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return result
+
+
+async def _with_deadline(task: str, fn, *args):
+    """Run a blocking call in a worker thread, giving up after the task timeout"""
+    config = TASKS[task]
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(fn, *args), timeout=config.timeout)
+    except asyncio.TimeoutError:
+        # the worker thread keeps running; the breaker makes sure few pile up
+        get_breaker(config.backend).record_failure()
+        raise TimeoutError(f"LLM[{task}] sem resposta em {config.timeout:.0f}s")
+
+
+def complete(task: str, prompt: str, format: Optional[str] = None) -> str:
+    return _guarded(task, lambda backend, config: backend.chat(
+        task, prompt, config.model, config.timeout, format=format))
+
+
+def analyze_image(task: str, prompt: str, image_path: str) -> str:
+    return _guarded(task, lambda backend, config: backend.vision(
+        task, prompt, image_path, config.model, config.timeout))
+
+
+async def acomplete(task: str, prompt: str, format: Optional[str] = None) -> str:
+    return await _with_deadline(task, complete, task, prompt, format)
+
+
+async def aanalyze_image(task: str, prompt: str, image_path: str) -> str:
+    return await _with_deadline(task, analyze_image, task, prompt, image_path)
@@ -0,0 +1,115 @@
+"""
+Ollama chat wrapper.
+
+Ollama reuses the KV cache of the previous request when the new prompt
+starts with the same tokens and the model is still loaded with the same
+runner options. So every call here:
+
+- sends the byte-identical system message first (RAG context and user
+  text come after it, in the user message);
+- uses one fixed options dict per task, all sharing the same `num_ctx`
+  (a different context size forces a model reload);
+- pins the model in memory with `keep_alive`.
+
+`warmup()` loads the model and evaluates the system prefix at startup.
+Ollama's prompt-eval / eval / load durations from each response go to
+metrics as `llm.<task>.prompt_eval`, `llm.<task>.eval` and `llm.<task>.load`.
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+
+import ollama
+
+import metrics
+import prompts
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+
+SYSTEM_MESSAGE = {"role": "system", "content": prompts.SYSTEM_PROMPT}
+
+_BASE_OPTIONS = {"num_ctx": NUM_CTX, "seed": 42}
+
+TASK_OPTIONS: Dict[str, Dict] = {
+    "extract": {**_BASE_OPTIONS, "temperature": 0.0},
+    "recipe": {**_BASE_OPTIONS, "temperature": 0.3},
+    "guru": {**_BASE_OPTIONS, "temperature": 0.3},
+    "suggest": {**_BASE_OPTIONS, "temperature": 0.7},
+    "plan": {**_BASE_OPTIONS, "temperature": 0.7},
+    "vision": {**_BASE_OPTIONS, "temperature": 0.0},
+}
+
+_NS = 1e9
+
+
+_clients: Dict[float, "ollama.Client"] = {}
+
+
+def _client(timeout: Optional[float]):
+    """Module-level default client, or a cached client with an HTTP timeout"""
+    if timeout is None:
+        return ollama
+    if timeout not in _clients:
+        _clients[timeout] = ollama.Client(timeout=timeout)
+    return _clients[timeout]
+
+
+def chat(task: str, prompt: str, format: Optional[str] = None, model: Optional[str] = None,
+         timeout: Optional[float] = None, images: Optional[List[str]] = None) -> str:
+    """Send one user prompt after the shared system prefix and return the reply text"""
+    kwargs = {}
+    if format is not None:
+        kwargs["format"] = format
+    user_message = {"role": "user", "content": prompt}
+    if images:
+        user_message["images"] = images
+    response = _client(timeout).chat(
+        model=model or OLLAMA_MODEL,
+        messages=[SYSTEM_MESSAGE, user_message],
+        options=TASK_OPTIONS[task],
+        keep_alive=KEEP_ALIVE,
+        **kwargs,
+    )
+    record_durations(task, response)
+    return response["message"]["content"]
+
+
+def record_durations(task: str, response) -> Dict[str, float]:
+    """Feed Ollama's timing fields (nanoseconds) into metrics; missing fields are skipped"""
+    durations = {}
+    for field, stage in (("prompt_eval_duration", "prompt_eval"), ("eval_duration", "eval"),
+                         ("load_duration", "load")):
+        value = response.get(field)
+        if value is not None:
+            durations[stage] = value / _NS
+            metrics.observe(f"llm.{task}.{stage}", durations[stage])
+    if durations:
+        logger.info(
+            f"LLM[{task}] prompt_eval={durations.get('prompt_eval', 0):.2f}s "
+            f"({response.get('prompt_eval_count') or 0} tok) "
+            f"eval={durations.get('eval', 0):.2f}s ({response.get('eval_count') or 0} tok) "
+            f"load={durations.get('load', 0):.2f}s"
+        )
+    return durations
+
+
+def warmup(model: Optional[str] = None) -> bool:
+    """Load the model and cache the system prefix; False if Ollama is unreachable"""
+    try:
+        response = ollama.chat(
+            model=model or OLLAMA_MODEL,
+            messages=[SYSTEM_MESSAGE, {"role": "user", "content": "ok"}],
+            options={**TASK_OPTIONS["extract"], "num_predict": 1},
+            keep_alive=KEEP_ALIVE,
+        )
+        record_durations("warmup", response)
+        logger.info(f"Modelo {model or OLLAMA_MODEL} aquecido (keep_alive={KEEP_ALIVE})")
+        return True
+    except Exception as e:
+        logger.warning(f"Warmup do Ollama falhou: {e}")
+        return False
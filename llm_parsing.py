@@ -0,0 +1,330 @@
+"""
+LLM Response Parsing
+
+Shared parsing for every LLM reply that is supposed to carry JSON.
+Models often wrap the object in prose or markdown fences; instead of
+`split("```")` + `json.loads` we scan for the first balanced {...} object
+and decode only that, then validate it against the expected schema.
+"""
+
+import json
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from carnivore_core import MEAL_SCHEMA, extract_known_foods, find_matching_category, fold_accents
+
+logger = logging.getLogger(__name__)
+
+# Ollama's constrained decoding: the model can only emit valid JSON
+OLLAMA_JSON_FORMAT = "json"
+
+# Gemini equivalent, passed as `config=` to generate_content
+GEMINI_JSON_CONFIG = {"response_mime_type": "application/json"}
+
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+# Deterministic fallback (LLM unavailable): rough (protein g, fat g) per 100 g
+FALLBACK_PORTION_G = 200
+FALLBACK_FAT_PORTION_G = 10
+FALLBACK_EGG_G = 50
+FALLBACK_EGGS = 2
+_EGGS = {"egg", "eggs", "ovo", "ovos", "egg yolk", "egg white"}
+_COOKING_FATS = {"butter", "manteiga", "ghee", "clarified butter", "tallow", "lard", "banha", "beef fat",
+                 "pork fat", "duck fat", "chicken fat", "animal fat", "gordura animal", "schmaltz"}
+_FALLBACK_MACROS = [
+    (_EGGS, 13, 10),
+    (_COOKING_FATS, 1, 81),
+    ({"bacon", "pork belly", "pancetta"}, 37, 42),
+    ({"fish", "salmon", "salmao", "tuna", "atum", "sardine", "sardinha", "mackerel", "cod",
+      "bacalhau", "halibut", "trout", "tilapia", "sea bass", "shrimp", "camarao"}, 22, 8),
+    ({"chicken", "chicken thigh", "chicken breast", "frango", "turkey", "peru"}, 27, 10),
+    ({"cheese", "queijo", "hard cheese", "parmesan", "cheddar", "gruyere", "gouda", "pecorino"}, 25, 33),
+]
+_FALLBACK_MEAT = (26, 18)
+_FALLBACK_MACROS_TERMS = set().union(*(terms for terms, _, _ in _FALLBACK_MACROS))
+ZERO_CALORIE_FOODS = {"salt", "sea salt", "sal", "water", "agua", "bone broth", "caldo de osso"}
+_NEGATED_RE = re.compile(r"(?<!\w)(sem|without)\s+\w+")
+_UNIT = r"(kg|g|gramas?)(?!\w)"
+_QUANTITY_BEFORE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:" + _UNIT + r")?\s*(?:de\s+|of\s+)?$")
+_QUANTITY_AFTER_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*" + _UNIT)
+
+_stats_lock = threading.Lock()
+_parse_stats: Dict[str, Dict[str, int]] = {}
+
+
+# =============================================================================
+# INCREMENTAL EXTRACTOR
+# =============================================================================
+
+def iter_balanced_objects(text: str):
+    """
+    Yield every top-level balanced {...} substring of `text`, left to right.
+
+    Braces inside JSON strings (and escaped quotes inside those strings)
+    are ignored, so `{"summary": "bife {grande}"}` is a single object.
+    """
+    depth = 0
+    start = -1
+    in_string = False
+    escaped = False
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            if depth > 0:
+                in_string = True
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                yield text[start:i + 1]
+
+
+def _loads_tolerant(candidate: str) -> Optional[Any]:
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+    repaired = _TRAILING_COMMA_RE.sub(r"\1", candidate)
+    if repaired != candidate:
+        try:
+            return json.loads(repaired)
+        except json.JSONDecodeError:
+            pass
+    return None
+
+
+def find_json_object(text: str) -> Optional[Dict]:
+    """Return the first balanced JSON object in `text` that decodes, or None"""
+    if not text:
+        return None
+
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        parsed = _loads_tolerant(stripped)
+        if isinstance(parsed, dict):
+            return parsed
+
+    for candidate in iter_balanced_objects(text):
+        parsed = _loads_tolerant(candidate)
+        if isinstance(parsed, dict):
+            return parsed
+    return None
+
+
+# =============================================================================
+# SCHEMA VALIDATION
+# =============================================================================
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+}
+
+
+def validate_against_schema(value: Any, schema: Dict, path: str = "") -> List[str]:
+    """
+    Validate `value` against the subset of JSON Schema used in this repo
+    (type, required, properties, items, minimum). Returns a list of errors.
+    """
+    errors: List[str] = []
+    label = path or "output"
+
+    expected = schema.get("type")
+    if expected:
+        py_type = _JSON_TYPES[expected]
+        is_bool = isinstance(value, bool)
+        if not isinstance(value, py_type) or (is_bool and expected in ("number", "integer")):
+            return [f"'{label}' must be of type {expected}"]
+
+    if "minimum" in schema and value < schema["minimum"]:
+        errors.append(f"'{label}' must be >= {schema['minimum']}")
+
+    if expected == "object":
+        for field in schema.get("required", []):
+            if field not in value:
+                errors.append(f"Missing required field: {path + '.' if path else ''}{field}")
+        for name, sub_schema in schema.get("properties", {}).items():
+            if name in value and value[name] is not None:
+                sub_path = f"{path}.{name}" if path else name
+                errors.extend(validate_against_schema(value[name], sub_schema, sub_path))
+
+    if expected == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(validate_against_schema(item, schema["items"], f"{label}[{i}]"))
+
+    return errors
+
+
+def normalize_meal_output(parsed: Dict) -> Dict:
+    """
+    Map the flat macro fields used by MEAL_EXTRACTION_PROMPT
+    (protein_g/fat_g/carbs_g) onto the nested `macros` object of MEAL_SCHEMA.
+    """
+    if "macros" in parsed:
+        return parsed
+    return {
+        **parsed,
+        "macros": {
+            "protein": parsed.get("protein_g", 0),
+            "fat": parsed.get("fat_g", 0),
+            "carbs": parsed.get("carbs_g", 0),
+        },
+    }
+
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+def _record(task: str, ok: bool):
+    with _stats_lock:
+        stats = _parse_stats.setdefault(task, {"attempts": 0, "failures": 0})
+        stats["attempts"] += 1
+        if not ok:
+            stats["failures"] += 1
+
+
+def get_parse_stats() -> Dict[str, Dict[str, int]]:
+    """Snapshot of parse attempts/failures per task"""
+    with _stats_lock:
+        return {task: dict(stats) for task, stats in _parse_stats.items()}
+
+
+def get_parse_failure_rate(task: Optional[str] = None) -> float:
+    stats = get_parse_stats()
+    if task is not None:
+        stats = {task: stats.get(task, {"attempts": 0, "failures": 0})}
+    attempts = sum(s["attempts"] for s in stats.values())
+    failures = sum(s["failures"] for s in stats.values())
+    return failures / attempts if attempts else 0.0
+
+
+def reset_parse_stats():
+    with _stats_lock:
+        _parse_stats.clear()
+
+
+# =============================================================================
+# PUBLIC PARSERS
+# =============================================================================
+
+def parse_json_reply(text: str, task: str = "generic") -> Optional[Dict]:
+    """Extract the first JSON object from an LLM reply, recording the outcome"""
+    parsed = find_json_object(text)
+    _record(task, parsed is not None)
+    if parsed is None:
+        logger.warning(
+            f"LLM reply for '{task}' has no decodable JSON object "
+            f"(failure rate {get_parse_failure_rate(task):.1%}): {text[:80]!r}"
+        )
+    return parsed
+
+
+def parse_meal_reply(text: str) -> Tuple[Optional[Dict], List[str]]:
+    """
+    Parse a MEAL_EXTRACTION_PROMPT reply.
+
+    Returns (parsed, errors). `parsed` is None when no JSON object was found.
+    Non-food replies ({"is_food": false}) are returned as-is without schema
+    validation.
+    """
+    parsed = parse_json_reply(text, task="extract")
+    if parsed is None:
+        return None, ["No JSON object found in LLM reply"]
+
+    if not parsed.get("is_food", True):
+        return parsed, []
+
+    parsed = normalize_meal_output(parsed)
+    return parsed, validate_against_schema(parsed, MEAL_SCHEMA)
+
+
+# =============================================================================
+# FALLBACK PARSER
+# =============================================================================
+
+def _fallback_macros(term: str) -> Tuple[int, int]:
+    for terms, protein, fat in _FALLBACK_MACROS:
+        if term in terms:
+            return protein, fat
+    return _FALLBACK_MEAT
+
+
+def _fallback_grams(food: str, before: str, after: str) -> Tuple[float, str]:
+    """Portion for `food` from the text around it: "300g de picanha", "ribeye 400g", "3 ovos" """
+    match = _QUANTITY_AFTER_RE.search(after) or _QUANTITY_BEFORE_RE.search(before)
+    number = float(match.group(1).replace(",", ".")) if match else None
+    if match and match.group(2):
+        grams = number * (1000 if match.group(2) == "kg" else 1)
+        return grams, f"{grams:.0f}g"
+    if food in _EGGS:
+        count = number or FALLBACK_EGGS
+        return count * FALLBACK_EGG_G, f"{count:g} un"
+    if food in _COOKING_FATS:
+        return FALLBACK_FAT_PORTION_G, f"~{FALLBACK_FAT_PORTION_G}g"
+    return FALLBACK_PORTION_G, f"~{FALLBACK_PORTION_G}g"
+
+
+def fallback_meal_from_text(text: str) -> Dict:
+    """
+    Meal dict in the parse_meal_reply() shape built without the LLM: known
+    foods from carnivore_core, portions written next to them (or a default
+    portion) and rough macros per 100 g. Forbidden foods are listed without
+    macros; seasonings and drinks count as zero. Marked confidence="low" and
+    fallback=True so the reply can say the numbers are estimates.
+    """
+    folded = _NEGATED_RE.sub(" ", fold_accents(text))
+    ingredients, quantities, forbidden = [], [], []
+    protein = fat = 0.0
+    for food in extract_known_foods(folded):
+        category, _ = find_matching_category(food)
+        if category == "forbidden":
+            forbidden.append(food)
+            continue
+        ingredients.append(food)
+        # seasonings, coffee, cream: no reliable portion, counted as zero
+        if food in ZERO_CALORIE_FOODS or (category in ("warning", "relaxed_allowed")
+                                          and food not in _FALLBACK_MACROS_TERMS):
+            quantities.append("a gosto")
+            continue
+        match = re.search(r"(?<!\w)" + re.escape(fold_accents(food)) + r"(?!\w)", folded)
+        grams, label = _fallback_grams(food, folded[max(0, match.start() - 20):match.start()],
+                                       folded[match.end():match.end() + 12])
+        quantities.append(label)
+        food_protein, food_fat = _fallback_macros(food)
+        protein += food_protein * grams / 100
+        fat += food_fat * grams / 100
+
+    if not ingredients and not forbidden:
+        return {"is_food": False, "fallback": True}
+    return {
+        "is_food": True,
+        "summary": text.strip()[:60] or "Refeição",
+        "ingredients": ingredients,
+        "quantities": quantities,
+        "forbidden_ingredients": forbidden,
+        "calories": round(protein * 4 + fat * 9),
+        "protein_g": round(protein),
+        "fat_g": round(fat),
+        "carbs_g": 0,
+        "confidence": "low",
+        "fallback": True,
+    }
@@ -0,0 +1,345 @@
+"""
+Offline load test for bot.py.
+
+Builds synthetic Telegram `Update` objects and drives the real handlers
+(process_meal_input, stats_command, metabolic_command, export_command)
+against a temporary SQLite database. Every LLM task is routed to
+llm_backends.FakeBackend and Whisper is replaced by an in-process stub,
+both with configurable latency, so runs need no network, no tokens and
+no GPU. The stubs are only installed for the duration of a run.
+
+    python loadtest.py --users 500 --llm-latency 0.2
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import types
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MEAL_TEXTS = [
+    "comi 300g de picanha com sal",
+    "3 ovos fritos na manteiga e bacon",
+    "ribeye 400g e café preto",
+    "salmão grelhado com manteiga",
+    "costela de porco e ovos",
+    "hambúrguer de carne moída sem pão",
+]
+
+
+@dataclass
+class StubConfig:
+    llm_latency: float = 0.05
+    vision_latency: float = 0.2
+    whisper_latency: float = 0.3
+    llm_failure_rate: float = 0.0
+    seed: int = 42
+
+
+# =============================================================================
+# STUB BACKENDS
+# =============================================================================
+
+class _StubState:
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+
+
+def _make_whisper_stub(state: _StubState) -> types.ModuleType:
+    module = types.ModuleType("faster_whisper")
+
+    class WhisperModel:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def transcribe(self, path, **kwargs):
+            time.sleep(state.config.whisper_latency)
+            segments = [types.SimpleNamespace(text=state.random.choice(MEAL_TEXTS))]
+            return iter(segments), types.SimpleNamespace(duration=3.0)
+
+    module.WhisperModel = WhisperModel
+    return module
+
+
+_MISSING = object()
+
+
+@contextlib.contextmanager
+def stub_backends(config: StubConfig) -> Iterator[types.ModuleType]:
+    """
+    Route every LLM task to a FakeBackend, stub Whisper and import (or
+    re-patch) bot.py; yields the bot module. On exit the real
+    `faster_whisper` entry in sys.modules and bot.whisper_model are put
+    back, so the stub does not leak into whatever imports them later.
+    """
+    import llm_backends
+
+    state = _StubState(config)
+    whisper_stub = _make_whisper_stub(state)
+    previous_module = sys.modules.get("faster_whisper", _MISSING)
+    sys.modules["faster_whisper"] = whisper_stub
+
+    llm_backends.register_backend("fake", llm_backends.FakeBackend(
+        latency=config.llm_latency,
+        vision_latency=config.vision_latency,
+        failure_rate=config.llm_failure_rate,
+        seed=config.seed,
+    ))
+    llm_backends.route_all("fake")
+    llm_backends.reset_breakers()
+
+    bot = None
+    previous_model = _MISSING
+    try:
+        os.environ.setdefault("TELEGRAM_TOKEN", "0:loadtest")
+        bot = importlib.import_module("bot")
+        previous_model = bot.whisper_model
+        bot.whisper_model = whisper_stub.WhisperModel()
+        yield bot
+    finally:
+        if previous_module is _MISSING:
+            sys.modules.pop("faster_whisper", None)
+        else:
+            sys.modules["faster_whisper"] = previous_module
+        if bot is not None and previous_model is not _MISSING:
+            bot.whisper_model = previous_model
+
+
+# =============================================================================
+# FAKE TELEGRAM
+# =============================================================================
+
+class FakeBot:
+    """Accepts whatever the handlers send and just counts it"""
+
+    defaults = None
+
+    def __init__(self):
+        self.sent_messages = 0
+        self.sent_documents = 0
+        self.document_bytes = 0
+
+    async def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent_messages += 1
+        return None
+
+    async def send_document(self, chat_id=None, document=None, **kwargs):
+        self.sent_documents += 1
+        if hasattr(document, "read"):
+            self.document_bytes += len(document.read())
+            document.close()
+        elif isinstance(document, (bytes, bytearray)):
+            self.document_bytes += len(document)
+        return None
+
+
+class FakeUpdateSource:
+    """Builds `telegram.Update` objects the way the Bot API would send them"""
+
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
+        self._update_id = 0
+
+    def make_update(self, user_id: int, text: str):
+        from telegram import Update
+
+        self._update_id += 1
+        message = {
+            "message_id": self._update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load", "username": f"load{user_id}"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return Update.de_json({"update_id": self._update_id, "message": message}, self.bot)
+
+    def make_context(self, text: str):
+        args = text.split()[1:] if text.startswith("/") else []
+        return types.SimpleNamespace(args=args, bot=self.bot)
+
+
+# =============================================================================
+# RUNNER
+# =============================================================================
+
+@dataclass
+class LoadTestResult:
+    users: int
+    updates: int
+    errors: int
+    wall_seconds: float
+    handlers: Dict[str, Dict] = field(default_factory=dict)
+    stages: Dict[str, Dict] = field(default_factory=dict)
+    # first failure per handler: "ExceptionType: message"
+    error_samples: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        return self.updates / self.wall_seconds if self.wall_seconds else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "users": self.users,
+            "updates": self.updates,
+            "errors": self.errors,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "throughput_per_s": round(self.throughput, 2),
+            "handlers": self.handlers,
+            "stages": self.stages,
+            "error_samples": self.error_samples,
+        }
+
+    def format(self) -> str:
+        lines = [
+            f"users={self.users} updates={self.updates} errors={self.errors} "
+            f"wall={self.wall_seconds:.2f}s throughput={self.throughput:.1f} updates/s",
+            f"{'handler':<20} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9}",
+        ]
+        for name, s in self.handlers.items():
+            lines.append(
+                f"{name:<20} {s['count']:>6} {s['p50'] * 1000:>7.1f}ms "
+                f"{s['p95'] * 1000:>7.1f}ms {s['p99'] * 1000:>7.1f}ms"
+            )
+        for name, sample in self.error_samples.items():
+            lines.append(f"erro em {name}: {sample}")
+        return "\n".join(lines)
+
+
+def _user_script(rng: random.Random, meals_per_user: int) -> List[tuple]:
+    script = []
+    for _ in range(meals_per_user):
+        script.append(("process_meal_input", rng.choice(MEAL_TEXTS)))
+    script.append(("stats_command", "/stats"))
+    script.append(("metabolic_command", "/metabolic"))
+    script.append(("export_command", rng.choice(["/export csv daily", "/export json weekly"])))
+    return script
+
+
+async def run_load_test(
+    users: int = 50,
+    meals_per_user: int = 2,
+    concurrency: Optional[int] = None,
+    stub_config: Optional[StubConfig] = None,
+    db_dir: Optional[str] = None,
+) -> LoadTestResult:
+    stub_config = stub_config or StubConfig()
+    with stub_backends(stub_config) as bot_module:
+        return await _run(bot_module, users, meals_per_user, concurrency, stub_config, db_dir)
+
+
+async def _run(bot_module, users: int, meals_per_user: int, concurrency: Optional[int],
+               stub_config: StubConfig, db_dir: Optional[str]) -> LoadTestResult:
+    import database
+
+    tmp_dir = db_dir or tempfile.mkdtemp(prefix="carnivore_loadtest_")
+    previous_db = database.DB_NAME
+    database.DB_NAME = os.path.join(tmp_dir, "loadtest.db")
+    database.init_db()
+    metrics.reset()
+
+    fake_bot = FakeBot()
+    source = FakeUpdateSource(fake_bot)
+    rng = random.Random(stub_config.seed)
+    semaphore = asyncio.Semaphore(concurrency or users)
+    handler_hists: Dict[str, metrics.Histogram] = {}
+    errors = 0
+    error_samples: Dict[str, str] = {}
+    updates = 0
+
+    async def run_user(user_id: int):
+        nonlocal errors, updates
+        for handler_name, text in _user_script(rng, meals_per_user):
+            update = source.make_update(user_id, text)
+            context = source.make_context(text)
+            handler = getattr(bot_module, handler_name)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    if handler_name == "process_meal_input":
+                        await handler(update, context, text, source="text")
+                    else:
+                        await handler(update, context)
+                except Exception as e:
+                    errors += 1
+                    # one traceback per handler is enough to debug; the rest are only counted
+                    if handler_name not in error_samples:
+                        error_samples[handler_name] = "".join(traceback.format_exception_only(type(e), e)).strip()
+                        logger.exception(f"Handler {handler_name} falhou (usuário {user_id})")
+                elapsed = time.perf_counter() - start
+            hist = handler_hists.setdefault(handler_name, metrics.Histogram(handler_name, max_samples=1_000_000))
+            hist.observe(elapsed)
+            updates += 1
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_user(10_000 + i) for i in range(users)))
+        wall = time.perf_counter() - start
+    finally:
+        database.DB_NAME = previous_db
+        if db_dir is None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return LoadTestResult(
+        users=users,
+        updates=updates,
+        errors=errors,
+        wall_seconds=wall,
+        handlers={name: h.snapshot() for name, h in sorted(handler_hists.items())},
+        stages=metrics.snapshot(),
+        error_samples=error_samples,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the Carnivore Tracker bot")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--meals-per-user", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=None, help="max in-flight updates (default: users)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per stub Ollama call")
+    parser.add_argument("--vision-latency", type=float, default=0.2)
+    parser.add_argument("--whisper-latency", type=float, default=0.3)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="also write results as JSON to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    config = StubConfig(
+        llm_latency=args.llm_latency,
+        vision_latency=args.vision_latency,
+        whisper_latency=args.whisper_latency,
+        llm_failure_rate=args.llm_failure_rate,
+        seed=args.seed,
+    )
+    result = asyncio.run(run_load_test(args.users, args.meals_per_user, args.concurrency, config))
+    print(result.format())
+    print()
+    print(metrics.render_text())
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"run_at": datetime.now().isoformat(), **result.to_dict()}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+In-process latency instrumentation.
+
+Every stage of the hot path (download, transcribe, LLM extract, validate,
+DB write, reply) records its duration into a named histogram. Histograms
+keep a bounded window of recent samples, so percentiles reflect current
+behaviour and memory stays constant.
+"""
+
+import asyncio
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+MAX_SAMPLES = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+PROMETHEUS_PREFIX = "carnivore"
+
+_registry_lock = threading.Lock()
+_histograms: Dict[str, "Histogram"] = {}
+
+
+class Histogram:
+    """Sliding-window latency histogram (seconds)"""
+
+    def __init__(self, name: str, max_samples: int = MAX_SAMPLES):
+        self.name = name
+        self._samples: deque = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        return _nearest_rank(samples, q)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total, max_ = self.count, self.total, self.max
+        return {
+            "count": count,
+            "sum": total,
+            "max": max_,
+            "p50": _nearest_rank(samples, 0.5),
+            "p95": _nearest_rank(samples, 0.95),
+            "p99": _nearest_rank(samples, 0.99),
+        }
+
+
+def _nearest_rank(sorted_samples: List[float], q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    rank = math.ceil(q * len(sorted_samples))
+    return sorted_samples[max(0, rank - 1)]
+
+
+# =============================================================================
+# RECORDING
+# =============================================================================
+
+def get_histogram(stage: str) -> Histogram:
+    hist = _histograms.get(stage)
+    if hist is None:
+        with _registry_lock:
+            hist = _histograms.setdefault(stage, Histogram(stage))
+    return hist
+
+
+def observe(stage: str, seconds: float):
+    get_histogram(stage).observe(seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """`with metrics.timed("meal.db_write"): ...`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def timed_fn(stage: str):
+    """Decorator version of `timed`, works for sync and async functions"""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot() -> Dict[str, Dict]:
+    with _registry_lock:
+        items = list(_histograms.items())
+    return {name: hist.snapshot() for name, hist in sorted(items)}
+
+
+def reset():
+    with _registry_lock:
+        _histograms.clear()
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def render_text() -> str:
+    """Human-readable table for the /metrics admin command"""
+    snap = snapshot()
+    if not snap:
+        return "Nenhuma métrica registrada ainda."
+
+    lines = [f"{'stage':<24} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8}"]
+    for name, s in snap.items():
+        lines.append(
+            f"{name:<24} {s['count']:>6} {s['p50'] * 1000:>6.0f}ms "
+            f"{s['p95'] * 1000:>6.0f}ms {s['p99'] * 1000:>6.0f}ms"
+        )
+
+    from llm_parsing import get_parse_failure_rate, get_parse_stats
+    if get_parse_stats():
+        lines.append(f"\nllm parse failure rate: {get_parse_failure_rate():.1%}")
+    return "\n".join(lines)
+
+
+def render_prometheus() -> str:
+    """Prometheus text exposition format (summaries + parse counters)"""
+    metric = f"{PROMETHEUS_PREFIX}_stage_seconds"
+    lines = [
+        f"# HELP {metric} Latency of bot pipeline stages in seconds.",
+        f"# TYPE {metric} summary",
+    ]
+    for name, s in snapshot().items():
+        for q in QUANTILES:
+            value = s[f"p{int(q * 100)}"]
+            lines.append(f'{metric}{{stage="{name}",quantile="{q}"}} {value:.6f}')
+        lines.append(f'{metric}_sum{{stage="{name}"}} {s["sum"]:.6f}')
+        lines.append(f'{metric}_count{{stage="{name}"}} {s["count"]}')
+
+    from llm_parsing import get_parse_stats
+    parse_stats = get_parse_stats()
+    for field in ("attempts", "failures"):
+        counter = f"{PROMETHEUS_PREFIX}_llm_parse_{field}_total"
+        lines.append(f"# TYPE {counter} counter")
+        for task, stats in sorted(parse_stats.items()):
+            lines.append(f'{counter}{{task="{task}"}} {stats[field]}')
+
+    return "\n".join(lines) + "\n"
+
+
+def dump(path: str):
+    """Atomically write the Prometheus dump (textfile-collector friendly)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+def start_periodic_dump(path: str, interval_seconds: float = 60.0) -> threading.Thread:
+    def loop():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                dump(path)
+            except OSError as e:
+                logger.error(f"Failed to dump metrics to {path}: {e}")
+
+    thread = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+    thread.start()
+    return thread
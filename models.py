@@ -1,9 +1,28 @@
+import json
+from array import array
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import List, Dict, Optional
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
 from enum import Enum
+
+import numpy as np
+
 from carnivore_core import CarnivoreLevel
 
+# Column order of each table (SELECT * order), as read by the from_row constructors
+MEAL_EVENT_COLUMNS = (
+    "id", "user_id", "datetime", "ingredients", "quantities", "carnivore_level", "breaks_fast",
+    "warnings", "calories", "protein_g", "fat_g", "carbs_g", "summary", "source",
+    "processing_level", "needs_confirmation",
+)
+FASTING_EVENT_COLUMNS = ("id", "user_id", "start_time", "end_time")
+SYMPTOM_EVENT_COLUMNS = ("id", "user_id", "datetime", "symptom_type", "severity", "notes")
+WEIGHT_EVENT_COLUMNS = ("id", "user_id", "datetime", "weight_kg", "notes")
+
+
+def _json_list(value: Optional[str]) -> List:
+    return json.loads(value) if value else []
+
 
 class SymptomType(Enum):
     DIZZINESS = "dizziness"
@@ -25,7 +44,7 @@ class EventSource(Enum):
     MANUAL = "manual"
 
 
-@dataclass
+@dataclass(slots=True)
 class MealEvent:
     user_id: int
     datetime: datetime
@@ -90,9 +109,19 @@ class MealEvent:
             processing_level=data.get("processing_level", "whole"),
             needs_confirmation=data.get("needs_confirmation", False),
         )
+    
+    @classmethod
+    def from_row(cls, row: Sequence) -> "MealEvent":
+        """Build from a meal_events row in MEAL_EVENT_COLUMNS order"""
+        return cls(
+            row[1], datetime.fromisoformat(row[2]), _json_list(row[3]), _json_list(row[4]),
+            CarnivoreLevel(row[5]), bool(row[6]), _json_list(row[7]),
+            row[8] or 0, row[9] or 0, row[10] or 0, row[11] or 0, row[12] or "",
+            EventSource(row[13] or "text"), row[14] or "whole", bool(row[15]), row[0],
+        )
 
 
-@dataclass
+@dataclass(slots=True)
 class FastingEvent:
     user_id: int
     start_time: datetime
@@ -118,9 +147,15 @@ class FastingEvent:
             "end_time": self.end_time.isoformat() if self.end_time else None,
             "duration_hours": self.duration_hours,
         }
+    
+    @classmethod
+    def from_row(cls, row: Sequence) -> "FastingEvent":
+        """Build from a fasting_events row in FASTING_EVENT_COLUMNS order"""
+        return cls(row[1], datetime.fromisoformat(row[2]),
+                   datetime.fromisoformat(row[3]) if row[3] else None, row[0])
 
 
-@dataclass
+@dataclass(slots=True)
 class SymptomEvent:
     user_id: int
     datetime: datetime
@@ -142,9 +177,14 @@ class SymptomEvent:
             "severity": self.severity,
             "notes": self.notes,
         }
+    
+    @classmethod
+    def from_row(cls, row: Sequence) -> "SymptomEvent":
+        """Build from a symptom_events row in SYMPTOM_EVENT_COLUMNS order"""
+        return cls(row[1], datetime.fromisoformat(row[2]), SymptomType(row[3]), row[4], row[5] or "", row[0])
 
 
-@dataclass
+@dataclass(slots=True)
 class WeightEvent:
     user_id: int
     datetime: datetime
@@ -160,9 +200,14 @@ class WeightEvent:
             "weight_kg": self.weight_kg,
             "notes": self.notes,
         }
+    
+    @classmethod
+    def from_row(cls, row: Sequence) -> "WeightEvent":
+        """Build from a weight_events row in WEIGHT_EVENT_COLUMNS order"""
+        return cls(row[1], datetime.fromisoformat(row[2]), row[3], row[4] or "", row[0])
 
 
-@dataclass
+@dataclass(slots=True)
 class DailyStats:
     date: str
     total_protein_g: float = 0
@@ -184,3 +229,118 @@ class DailyStats:
     @property
     def processing_score(self) -> str:
         return "whole"
+
+
+class MealEventBatch:
+    """
+    Columnar container for long meal histories: one typed array per numeric
+    field instead of one object or dict per meal (8 bytes per value, no
+    per-row overhead). Timestamps are epoch seconds of the stored naive
+    datetimes read as UTC, so `// 86400` is the calendar day as stored.
+    Aggregates run on zero-copy NumPy views of the arrays.
+    """
+
+    __slots__ = ("ids", "timestamps", "calories", "protein_g", "fat_g", "carbs_g", "strict")
+
+    NUMERIC_COLUMNS = ("calories", "protein_g", "fat_g", "carbs_g")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.timestamps = array("q")
+        self.calories = array("d")
+        self.protein_g = array("d")
+        self.fat_g = array("d")
+        self.carbs_g = array("d")
+        self.strict = array("b")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append_row(self, row: Sequence):
+        """Add a meal_events row in MEAL_EVENT_COLUMNS order"""
+        self.ids.append(row[0])
+        self.timestamps.append(_epoch(row[2]))
+        self.calories.append(row[8] or 0.0)
+        self.protein_g.append(row[9] or 0.0)
+        self.fat_g.append(row[10] or 0.0)
+        self.carbs_g.append(row[11] or 0.0)
+        self.strict.append(row[5] == "strict")
+
+    def append(self, meal: MealEvent):
+        self.ids.append(meal.id or 0)
+        self.timestamps.append(_epoch(meal.datetime))
+        self.calories.append(meal.calories)
+        self.protein_g.append(meal.protein_g)
+        self.fat_g.append(meal.fat_g)
+        self.carbs_g.append(meal.carbs_g)
+        self.strict.append(meal.carnivore_level == CarnivoreLevel.STRICT)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence]) -> "MealEventBatch":
+        batch = cls()
+        # bound methods hoisted out of the loop: this runs once per meal
+        # timestamps are parsed in bulk at the end, so datetimes are collected first
+        stamps = []
+        ids, stamp = batch.ids.append, stamps.append
+        calories, protein, fat, carbs = (batch.calories.append, batch.protein_g.append,
+                                         batch.fat_g.append, batch.carbs_g.append)
+        strict = batch.strict.append
+        for row in rows:
+            ids(row[0])
+            stamp(row[2])
+            calories(row[8] or 0.0)
+            protein(row[9] or 0.0)
+            fat(row[10] or 0.0)
+            carbs(row[11] or 0.0)
+            strict(row[5] == "strict")
+        batch.timestamps.frombytes(_epochs(stamps).tobytes())
+        return batch
+
+    def totals(self) -> Dict:
+        count = len(self)
+        columns = self.to_numpy()
+        return {
+            "meal_count": count,
+            "total_calories": float(columns["calories"].sum()),
+            "total_protein_g": float(columns["protein_g"].sum()),
+            "total_fat_g": float(columns["fat_g"].sum()),
+            "total_carbs_g": float(columns["carbs_g"].sum()),
+            "carnivore_compliance": int(columns["strict"].sum()) / count * 100 if count else 100.0,
+        }
+
+    def daily_totals(self) -> Dict[str, Dict]:
+        """{"YYYY-MM-DD": {"calories", "protein", "fat", "meals", "strict"}} in day order"""
+        columns = self.to_numpy()
+        days, index = np.unique(columns["datetime"].astype("datetime64[D]"), return_inverse=True)
+        sums = [np.bincount(index, weights=columns[name], minlength=len(days)).tolist()
+                for name in ("calories", "protein_g", "fat_g")]
+        meals = np.bincount(index, minlength=len(days)).tolist()
+        strict = np.bincount(index, weights=columns["strict"], minlength=len(days)).astype(np.int64).tolist()
+        return {
+            day: {"calories": sums[0][i], "protein": sums[1][i], "fat": sums[2][i],
+                  "meals": meals[i], "strict": strict[i]}
+            for i, day in enumerate(days.astype(str).tolist())
+        }
+
+    def to_numpy(self) -> Dict:
+        """Zero-copy NumPy views of the columns (timestamps as datetime64[s])"""
+        columns = {name: np.frombuffer(getattr(self, name), dtype=np.float64) for name in self.NUMERIC_COLUMNS}
+        columns["id"] = np.frombuffer(self.ids, dtype=np.int64)
+        columns["datetime"] = np.frombuffer(self.timestamps, dtype=np.int64).view("datetime64[s]")
+        columns["strict"] = np.frombuffer(self.strict, dtype=np.int8).view(np.bool_)
+        return columns
+
+
+def _epochs(values: List) -> np.ndarray:
+    """Bulk _epoch: NumPy parses naive ISO strings in C; anything else goes one by one"""
+    try:
+        return np.array(values, dtype="datetime64[s]").astype(np.int64)
+    except (ValueError, TypeError):
+        return np.array([_epoch(v) for v in values], dtype=np.int64)
+
+
+def _epoch(value) -> int:
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
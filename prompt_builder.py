@@ -0,0 +1,187 @@
+"""
+Retrieval-augmented prompt assembly.
+
+Prepends the top RAG chunks (rag_search BM25, fused with rag_dense when
+embeddings exist) to a prompt, under a token budget so grounding never
+blows up Ollama's prompt-eval time. Retrieval results are cached per
+(query, k, corpus version): the corpus version changes whenever
+rag_ingest.py re-indexes, which invalidates the cache for free.
+
+Token counts are estimated (~4 characters per token) - close enough for
+budgeting without loading a tokenizer.
+
+Handlers call `aaugment_prompt`, which bounds retrieval by
+RAG_RETRIEVAL_TIMEOUT: if it runs over (a hanging embeddings call), the
+plain prompt goes to the LLM and the dense path is tripped, so the next
+queries run BM25-only until rag_dense's cool-off ends.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import rag_dense
+import rag_ingest
+import rag_search
+
+logger = logging.getLogger(__name__)
+
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", rag_ingest.DEFAULT_INDEX_DIR)
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "512"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+RETRIEVAL_CACHE_SIZE = 256
+RAG_RETRIEVAL_TIMEOUT = float(os.getenv("RAG_RETRIEVAL_TIMEOUT", "2"))
+
+CHARS_PER_TOKEN = 4
+# Reciprocal rank fusion constant (standard value from the RRF paper)
+RRF_K = 60
+
+CONTEXT_HEADER = "Contexto de referência (use só se for relevante; as regras carnívoras acima prevalecem):"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+# =============================================================================
+# RETRIEVAL CACHE
+# =============================================================================
+
+class RetrievalCache:
+    """Small LRU of retrieval results, shared by the to_thread workers of aaugment_prompt"""
+
+    def __init__(self, maxsize: int = RETRIEVAL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[List[Dict]]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple, value: List[Dict]):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+_cache = RetrievalCache()
+_versions: Dict[str, Tuple[float, Optional[str]]] = {}
+
+
+def get_cache() -> RetrievalCache:
+    return _cache
+
+
+def corpus_version(index_dir: str = RAG_INDEX_DIR) -> Optional[str]:
+    """Current corpus_version of an index (None if it was never built)"""
+    path = os.path.join(index_dir, rag_ingest.META_FILE)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _versions.get(index_dir)
+    if cached is None or cached[0] != mtime:
+        meta = rag_ingest.load_meta(index_dir) or {}
+        cached = (mtime, meta.get("corpus_version"))
+        _versions[index_dir] = cached
+    return cached[1]
+
+
+def retrieve(query: str, k: int = RAG_TOP_K, index_dir: str = RAG_INDEX_DIR) -> List[Dict]:
+    """Top-k chunks for `query`: BM25, fused with dense results when available"""
+    version = corpus_version(index_dir)
+    if version is None or not query.strip():
+        return []
+    key = (" ".join(query.lower().split()), k, index_dir, version)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    ranked_lists = [rag_search.search(query, k * 2, index_dir), rag_dense.search(query, k * 2, index_dir)]
+    fused: Dict[str, float] = {}
+    records: Dict[str, Dict] = {}
+    for ranked in ranked_lists:
+        for rank, hit in enumerate(ranked):
+            fused[hit["id"]] = fused.get(hit["id"], 0.0) + 1.0 / (RRF_K + rank + 1)
+            records.setdefault(hit["id"], hit)
+    result = [records[chunk_id] for chunk_id in sorted(fused, key=fused.get, reverse=True)[:k]]
+    # a BM25-only result while embeddings are down is not cached over the fused one
+    if rag_dense.embed_breaker.state == "closed":
+        _cache.put(key, result)
+    return result
+
+
+# =============================================================================
+# PROMPT ASSEMBLY
+# =============================================================================
+
+def build_context(chunks: List[Dict], budget_tokens: int = RAG_CONTEXT_TOKENS) -> str:
+    """Numbered context block with as many whole chunks as fit in the budget"""
+    if not chunks or budget_tokens <= 0:
+        return ""
+    lines = [CONTEXT_HEADER]
+    used = estimate_tokens(CONTEXT_HEADER)
+    for chunk in chunks:
+        line = f"[{len(lines)}] ({os.path.basename(chunk['source'])}) {chunk['text']}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget_tokens:
+            if len(lines) == 1:
+                # first chunk alone is too long: keep its head rather than nothing
+                line = line[:max(0, (budget_tokens - used - 1) * CHARS_PER_TOKEN)]
+                if line:
+                    lines.append(line)
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines) if len(lines) > 1 else ""
+
+
+def augment_prompt(prompt: str, query: str, task: str, budget_tokens: int = RAG_CONTEXT_TOKENS,
+                   k: int = RAG_TOP_K, index_dir: str = RAG_INDEX_DIR) -> str:
+    """Prompt with retrieved context prepended; logs the estimated prompt size"""
+    try:
+        context = build_context(retrieve(query, k, index_dir), budget_tokens)
+    except Exception as e:
+        logger.warning(f"RAG indisponível ({task}): {e}")
+        context = ""
+    final = f"{context}\n\n{prompt}" if context else prompt
+    logger.info(
+        f"prompt[{task}]: ~{estimate_tokens(final)} tokens "
+        f"({estimate_tokens(context)} de contexto RAG)"
+    )
+    return final
+
+
+async def aaugment_prompt(prompt: str, query: str, task: str, timeout: float = RAG_RETRIEVAL_TIMEOUT,
+                          **kwargs) -> str:
+    """augment_prompt off the event loop, falling back to the plain prompt after `timeout` seconds"""
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(augment_prompt, prompt, query, task, **kwargs), timeout)
+    except asyncio.TimeoutError:
+        # the worker thread keeps running; tripping the dense breaker keeps new ones from stalling
+        rag_dense.embed_breaker.record_failure()
+        logger.warning(f"RAG sem resposta em {timeout:.1f}s ({task}); prompt sem contexto")
+        return prompt
@@ -0,0 +1,303 @@
+"""
+Dense-vector retrieval over the RAG chunks.
+
+Embeddings are computed offline (rag_ingest.py) through the local Ollama
+embeddings endpoint and stored quantized next to the chunks:
+
+    dense_vectors.npy   N x D, int8 (per-row scale in dense_scales.npy) or float16
+    dense_meta.json     embedder spec, dimension, dtype
+
+Vectors are L2-normalized before quantization, so cosine similarity is a
+plain dot product. Search is brute force: the memory-mapped matrix is
+scanned in row blocks (matrix x query batch) and the top-k picked with
+argpartition - a few milliseconds on CPU for thousands of chunks, no
+vector database needed.
+
+`HashingEmbedder` is a deterministic, dependency-free stand-in for tests
+and offline runs.
+
+Query embeddings go over the network on every retrieval cache miss, so
+they are bounded twice: each Ollama request has an HTTP timeout
+(RAG_EMBED_TIMEOUT), and a failed or timed-out query opens a circuit
+breaker that skips the dense path (BM25 only) for RAG_EMBED_COOLOFF
+seconds instead of paying the stall again on the next query.
+"""
+
+import json
+import logging
+import os
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+import rag_ingest
+from llm_backends import CircuitBreaker
+from rag_search import analyze
+
+logger = logging.getLogger(__name__)
+
+EMBED_MODEL = os.getenv("RAG_EMBED_MODEL", "nomic-embed-text")
+EMBED_BATCH = 32
+# per HTTP request: short for a query at chat time, generous for offline ingest batches
+EMBED_TIMEOUT = float(os.getenv("RAG_EMBED_TIMEOUT", "5"))
+INGEST_EMBED_TIMEOUT = float(os.getenv("RAG_INGEST_EMBED_TIMEOUT", "120"))
+EMBED_COOLOFF_SECONDS = float(os.getenv("RAG_EMBED_COOLOFF", "60"))
+SEARCH_BLOCK_ROWS = 4096
+
+VECTORS_FILE = "dense_vectors.npy"
+SCALES_FILE = "dense_scales.npy"
+DENSE_META_FILE = "dense_meta.json"
+
+
+# =============================================================================
+# EMBEDDERS
+# =============================================================================
+
+class HashingEmbedder:
+    """Signed feature hashing of analyzer tokens: deterministic, no model needed"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.spec = f"hashing:{dim}"
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in analyze(text):
+                h = zlib.crc32(token.encode("utf-8"))
+                matrix[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        return matrix
+
+
+class OllamaEmbedder:
+    """Local Ollama embeddings endpoint (`ollama pull nomic-embed-text`)"""
+
+    def __init__(self, model: str = EMBED_MODEL, timeout: float = EMBED_TIMEOUT):
+        self.model = model
+        self.timeout = timeout
+        self.spec = f"ollama:{model}"
+        self._client = None
+
+    @property
+    def client(self):
+        # the module-level ollama client has no timeout
+        if self._client is None:
+            import ollama
+            self._client = ollama.Client(timeout=self.timeout)
+        return self._client
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        rows = []
+        for start in range(0, len(texts), EMBED_BATCH):
+            response = self.client.embed(model=self.model, input=list(texts[start:start + EMBED_BATCH]))
+            rows.extend(response["embeddings"])
+        return np.asarray(rows, dtype=np.float32)
+
+
+def get_embedder(spec: str, timeout: float = EMBED_TIMEOUT) -> Callable[[Sequence[str]], np.ndarray]:
+    """'hashing[:dim]' or 'ollama[:model]' -> embedder"""
+    kind, _, arg = spec.partition(":")
+    if kind == "hashing":
+        return HashingEmbedder(int(arg) if arg else 256)
+    if kind == "ollama":
+        return OllamaEmbedder(arg or EMBED_MODEL, timeout)
+    raise ValueError(f"unknown embedder: {spec}")
+
+
+# =============================================================================
+# QUANTIZATION
+# =============================================================================
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: matrix ~= q * scales[:, None]"""
+    scales = np.abs(matrix).max(axis=1, initial=0.0) / 127.0
+    scales[scales == 0] = 1.0
+    q = np.round(matrix / scales[:, None]).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def embed_quantized(texts: Sequence[str], embedder: Callable, dtype: str = "int8") -> Tuple[np.ndarray, np.ndarray]:
+    """Embed, normalize and quantize `texts` -> (vectors, per-row scales)"""
+    if dtype not in ("int8", "float16"):
+        raise ValueError("dtype must be 'int8' or 'float16'")
+    matrix = l2_normalize(embedder(list(texts))) if len(texts) else np.zeros((0, 0), dtype=np.float32)
+    if dtype == "int8":
+        return quantize_int8(matrix)
+    return matrix.astype(np.float16), np.ones(len(matrix), dtype=np.float32)
+
+
+def write_dense(index_dir: str, vectors: np.ndarray, scales: np.ndarray, spec: str, dtype: str) -> Dict:
+    os.makedirs(index_dir, exist_ok=True)
+    for name, array in ((VECTORS_FILE, vectors), (SCALES_FILE, scales)):
+        path = os.path.join(index_dir, name)
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(path + ".tmp", path)
+    meta = {
+        "embedder": spec,
+        "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "dtype": dtype,
+        "documents": len(vectors),
+    }
+    meta_path = os.path.join(index_dir, DENSE_META_FILE)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+    return meta
+
+
+def build_dense(texts: Sequence[str], index_dir: str, embedder: Callable, dtype: str = "int8") -> Dict:
+    """Embed `texts` (doc id = position) and write the quantized matrix into index_dir"""
+    vectors, scales = embed_quantized(texts, embedder, dtype)
+    return write_dense(index_dir, vectors, scales, getattr(embedder, "spec", "custom"), dtype)
+
+
+def update_dense(index_dir: str, texts: Sequence[str], dead: Set[int], embedder: Callable,
+                 keep: Optional[Sequence[int]] = None, dtype: str = "int8") -> Dict:
+    """
+    Incremental variant of build_dense for an append-only chunk list: rows
+    already embedded with the same embedder are reused, only new positions
+    are embedded, tombstoned (`dead`) rows get scale 0 so search skips them,
+    and `keep` (compaction) selects the surviving rows.
+    """
+    spec = getattr(embedder, "spec", "custom")
+    vectors = scales = None
+    previous = _read_meta(index_dir)
+    if previous and previous["embedder"] == spec and previous["dtype"] == dtype \
+            and 0 < previous["documents"] <= len(texts):
+        vectors = np.load(os.path.join(index_dir, VECTORS_FILE))
+        scales = np.load(os.path.join(index_dir, SCALES_FILE))
+    start = 0 if vectors is None else len(vectors)
+    new_ids = [i for i in range(start, len(texts)) if i not in dead]
+    new_vectors, new_scales = embed_quantized([texts[i] for i in new_ids], embedder, dtype)
+
+    if vectors is None:
+        dim = new_vectors.shape[1] if len(new_vectors) else 0
+        vectors, scales = np.zeros((0, dim), dtype=new_vectors.dtype), np.zeros(0, dtype=np.float32)
+    grown = np.zeros((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+    grown_scales = np.zeros(len(texts), dtype=np.float32)
+    grown[:len(vectors)] = vectors
+    grown_scales[:len(scales)] = scales
+    if new_ids:
+        grown[new_ids] = new_vectors
+        grown_scales[new_ids] = new_scales
+    if dead:
+        dead_ids = sorted(dead)
+        grown[dead_ids] = 0
+        grown_scales[dead_ids] = 0.0
+    if keep is not None:
+        grown, grown_scales = grown[list(keep)], grown_scales[list(keep)]
+    return write_dense(index_dir, grown, grown_scales, spec, dtype)
+
+
+def _read_meta(index_dir: str) -> Optional[Dict]:
+    path = os.path.join(index_dir, DENSE_META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def remove_dense(index_dir: str):
+    """Drop dense files so a stale matrix is never paired with new chunks"""
+    for name in (DENSE_META_FILE, VECTORS_FILE, SCALES_FILE):
+        path = os.path.join(index_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# =============================================================================
+# QUERY
+# =============================================================================
+
+class DenseIndex:
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.meta = _read_meta(index_dir)
+        self.vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r")
+        self.scales = np.load(os.path.join(index_dir, SCALES_FILE), mmap_mode="r")
+        self._embedder = None
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = get_embedder(self.meta["embedder"])
+        return self._embedder
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Cosine scores, shape (N, len(queries)); queries are normalized here.
+        Tombstoned rows (scale 0) score -inf.
+        """
+        queries = l2_normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        out = np.empty((len(self.vectors), len(queries)), dtype=np.float32)
+        for start in range(0, len(self.vectors), SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            out[start:start + len(block)] = block @ queries.T
+        scales = np.asarray(self.scales)
+        out *= scales[:, None]
+        out[scales == 0] = -np.inf
+        return out
+
+    def search_vectors(self, queries: np.ndarray, k: int = 5) -> List[List[Tuple[int, float]]]:
+        """Top-k (doc id, score) pairs per query vector, best first"""
+        if len(self.vectors) == 0 or k <= 0:
+            return [[] for _ in np.atleast_2d(queries)]
+        all_scores = self.scores(queries)
+        k = min(k, len(all_scores))
+        results = []
+        for column in all_scores.T:
+            top = np.argpartition(-column, k - 1)[:k]
+            top = top[np.argsort(-column[top], kind="stable")]
+            results.append([(int(d), float(column[d])) for d in top if np.isfinite(column[d])])
+        return results
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        return self.search_vectors(self.embedder([query]), k)[0]
+
+
+_INDEXES: Dict[str, Tuple[float, DenseIndex, List[Dict]]] = {}
+
+# one failure is enough: each one may have cost a full EMBED_TIMEOUT
+embed_breaker = CircuitBreaker("rag_embed", failure_threshold=1, reset_timeout=EMBED_COOLOFF_SECONDS)
+
+
+def load_index(index_dir: str) -> Optional[Tuple[DenseIndex, List[Dict]]]:
+    """Dense index + chunk records, cached per directory until the index is rebuilt"""
+    meta_path = os.path.join(index_dir, DENSE_META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    mtime = os.path.getmtime(meta_path)
+    cached = _INDEXES.get(index_dir)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, DenseIndex(index_dir), rag_ingest.load_chunks(index_dir))
+        _INDEXES[index_dir] = cached
+    return cached[1], cached[2]
+
+
+def search(query: str, k: int = 5, index_dir: Optional[str] = None) -> List[Dict]:
+    """Top-k chunk records (with a "score" key) by embedding similarity"""
+    loaded = load_index(index_dir or rag_ingest.DEFAULT_INDEX_DIR)
+    if loaded is None:
+        return []
+    index, chunks = loaded
+    if not embed_breaker.allow():
+        return []
+    try:
+        hits = index.search(query, k)
+    except Exception as e:
+        embed_breaker.record_failure()
+        logger.warning(f"Busca densa indisponível: {e}")
+        return []
+    embed_breaker.record_success()
+    return [dict(chunks[doc_id], score=score) for doc_id, score in hits]
@@ -0,0 +1,316 @@
+"""
+RAG corpus ingestion.
+
+Reads rag_manifest.json, extracts the text of every markdown file and PDF,
+splits it into overlapping word windows and writes them to an index
+directory, so the prompt paths can retrieve context without rereading the
+PDF. Sources flagged `requires_filtering` go through the carnivore rules
+engine (carnivore_core) and chunks that mention forbidden foods are dropped.
+
+    python rag_ingest.py                          # rag_manifest.json -> rag_index/
+    python rag_ingest.py --manifest other.json --out /tmp/rag_index
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from carnivore_core import extract_known_foods, validate_ingredients
+
+try:
+    import pypdf
+except ImportError:  # optional: PDFs are skipped without it
+    pypdf = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST = "rag_manifest.json"
+DEFAULT_INDEX_DIR = "rag_index"
+CHUNKS_FILE = "chunks.jsonl"
+META_FILE = "meta.json"
+
+CHUNK_WORDS = 160
+CHUNK_OVERLAP = 32
+
+_HEADING_RE = re.compile(r"^#{1,3}\s", re.MULTILINE)
+
+
+# =============================================================================
+# TEXT EXTRACTION
+# =============================================================================
+
+def extract_pdf_text(path: str) -> str:
+    if pypdf is None:
+        raise RuntimeError("pypdf não instalado (pip install pypdf)")
+    reader = pypdf.PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_text(path: str) -> str:
+    if path.lower().endswith(".pdf"):
+        return extract_pdf_text(path)
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def split_sections(text: str, markdown: bool) -> List[str]:
+    """Markdown is split at headings (each section keeps its title); other text stays whole"""
+    if not markdown:
+        return [text]
+    starts = [m.start() for m in _HEADING_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+
+def chunk_text(text: str, chunk_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Overlapping windows of `chunk_words` words; consecutive chunks share `overlap` words"""
+    if overlap >= chunk_words:
+        raise ValueError("overlap must be smaller than chunk_words")
+    words = text.split()
+    if not words:
+        return []
+    step = chunk_words - overlap
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def is_carnivore_chunk(text: str) -> bool:
+    """True unless the chunk mentions a food the rules engine forbids"""
+    foods = extract_known_foods(text)
+    return not foods or validate_ingredients(foods).is_valid
+
+
+# =============================================================================
+# INGESTION
+# =============================================================================
+
+def load_manifest(path: str = DEFAULT_MANIFEST) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_source_chunks(entry: Dict, base_dir: str, chunk_words: int = CHUNK_WORDS,
+                       overlap: int = CHUNK_OVERLAP) -> Iterator[Tuple[str, bool]]:
+    """Yield (chunk text, kept) for one manifest entry"""
+    path = os.path.join(base_dir, entry["path"])
+    text = extract_text(path)
+    markdown = path.lower().endswith(".md")
+    requires_filtering = bool(entry.get("requires_filtering"))
+    for section in split_sections(text, markdown):
+        for chunk in chunk_text(section, chunk_words, overlap):
+            yield chunk, (not requires_filtering or is_carnivore_chunk(chunk))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def ingest(manifest_path: str = DEFAULT_MANIFEST, index_dir: str = DEFAULT_INDEX_DIR,
+           chunk_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP,
+           embedder: Optional[str] = None, full: bool = False) -> Dict:
+    """
+    Build or refresh the index directory (chunks + BM25, plus dense vectors
+    when an `embedder` spec such as "ollama" is given) and return its metadata.
+
+    Incremental by default: meta.json records each source's content hash and
+    chunk ids, so only added or changed files are re-extracted (and
+    re-embedded). Chunks of changed or removed files are tombstoned in place
+    (`"deleted": true`) and dropped by a compaction once they outnumber the
+    live ones. A file that cannot be read keeps its previous chunks and is
+    reported under "failed". `full=True` rebuilds from scratch.
+    """
+    import rag_dense
+    import rag_search
+
+    manifest = load_manifest(manifest_path)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    os.makedirs(index_dir, exist_ok=True)
+
+    previous = None if full else load_meta(index_dir)
+    if previous and (previous.get("chunk_words"), previous.get("overlap")) != (chunk_words, overlap):
+        previous = None
+    records = load_chunks(index_dir) if previous else []
+    indexed = len(records)
+    old_sources = previous.get("sources", {}) if previous else {}
+    positions: Dict[str, List[int]] = {}
+    for position, record in enumerate(records):
+        if not record.get("deleted"):
+            positions.setdefault(record["source"], []).append(position)
+
+    def tombstone(source: str):
+        for position in positions.pop(source, []):
+            records[position] = {"id": records[position]["id"], "source": source, "deleted": True}
+
+    sources = {}
+    changes = {"added": [], "changed": [], "removed": [], "unchanged": [], "failed": []}
+
+    def failed(source: str, error: Exception):
+        # a transient read error must not drop an indexed document: keep its chunks
+        logger.warning(f"Fonte ignorada {source}: {error}")
+        if source in old_sources:
+            sources[source] = old_sources[source]
+        changes["failed"].append(source)
+
+    for entry in manifest.get("files", []):
+        source = entry["path"]
+        try:
+            digest = file_sha256(os.path.join(base_dir, source))
+        except OSError as e:
+            failed(source, e)
+            continue
+        prev = old_sources.get(source)
+        if prev and prev.get("sha256") == digest and prev.get("entry") == entry:
+            sources[source] = prev
+            changes["unchanged"].append(source)
+            continue
+        try:
+            results = list(iter_source_chunks(entry, base_dir, chunk_words, overlap))
+        except (OSError, RuntimeError) as e:
+            failed(source, e)
+            continue
+        tombstone(source)
+        chunk_ids = []
+        for chunk, keep in results:
+            if not keep:
+                continue
+            chunk_ids.append(f"{source}@{digest[:8]}#{len(chunk_ids)}")
+            records.append({
+                "id": chunk_ids[-1],
+                "source": source,
+                "type": entry.get("type"),
+                "topic": entry.get("topic", []),
+                "strictness": entry.get("strictness"),
+                "text": chunk,
+            })
+        sources[source] = {
+            "sha256": digest,
+            "entry": entry,
+            "chunk_ids": chunk_ids,
+            "chunks": len(chunk_ids),
+            "dropped": len(results) - len(chunk_ids),
+        }
+        changes["changed" if prev else "added"].append(source)
+        logger.info(f"{source}: {len(chunk_ids)} chunks ({len(results) - len(chunk_ids)} descartados)")
+    for source in old_sources:
+        if source not in sources:
+            tombstone(source)
+            changes["removed"].append(source)
+
+    previous_dense = (previous or {}).get("dense") or {}
+    wanted_spec = rag_dense.get_embedder(embedder).spec if embedder else None
+    if previous and not (changes["added"] or changes["changed"] or changes["removed"]) \
+            and previous_dense.get("embedder") == wanted_spec:
+        logger.info("Índice RAG já atualizado")
+        return dict(previous, changes=changes)
+    if previous_dense.get("documents") != indexed:
+        # vectors must line up with the chunk positions they were built for
+        rag_dense.remove_dense(index_dir)
+
+    dead = {i for i, r in enumerate(records) if r.get("deleted")}
+    keep = None
+    if len(dead) > len(records) - len(dead):
+        keep = [i for i in range(len(records)) if i not in dead]
+    texts = ["" if i in dead else r["text"] for i, r in enumerate(records)]
+
+    dense = None
+    if embedder:
+        try:
+            dense = rag_dense.update_dense(
+                index_dir, texts, dead, rag_dense.get_embedder(embedder, rag_dense.INGEST_EMBED_TIMEOUT), keep)
+        except Exception as e:
+            logger.warning(f"Embeddings não gerados ({embedder}): {e}")
+    if dense is None:
+        rag_dense.remove_dense(index_dir)
+    if keep is not None:
+        records = [records[i] for i in keep]
+        texts = [texts[i] for i in keep]
+        dead = set()
+
+    chunks_path = os.path.join(index_dir, CHUNKS_FILE)
+    with open(chunks_path + ".tmp", "w", encoding="utf-8") as out:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    os.replace(chunks_path + ".tmp", chunks_path)
+    bm25 = rag_search.build_bm25(texts, index_dir, dead)
+
+    meta = {
+        "corpus_name": manifest.get("corpus_name"),
+        "version": manifest.get("version"),
+        "corpus_version": hashlib.sha256(
+            json.dumps(sorted((k, v["sha256"]) for k, v in sources.items())).encode()).hexdigest()[:16],
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "chunk_words": chunk_words,
+        "overlap": overlap,
+        "chunk_count": len(records) - len(dead),
+        "tombstones": len(dead),
+        "sources": sources,
+        "bm25": bm25,
+        "dense": dense,
+        "changes": changes,
+    }
+    meta_path = os.path.join(index_dir, META_FILE)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+    return meta
+
+
+# =============================================================================
+# LOADING
+# =============================================================================
+
+def load_meta(index_dir: str = DEFAULT_INDEX_DIR) -> Optional[Dict]:
+    path = os.path.join(index_dir, META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_chunks(index_dir: str = DEFAULT_INDEX_DIR) -> List[Dict]:
+    path = os.path.join(index_dir, CHUNKS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk, filter and index the RAG corpus")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--out", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--chunk-words", type=int, default=CHUNK_WORDS)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--embedder", default=os.getenv("RAG_EMBEDDER", "ollama"),
+                        help="'ollama[:model]', 'hashing[:dim]' or 'none' to skip dense vectors")
+    parser.add_argument("--full", action="store_true", help="ignore the previous index and rebuild everything")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    embedder = None if args.embedder == "none" else args.embedder
+    meta = ingest(args.manifest, args.out, args.chunk_words, args.overlap, embedder, args.full)
+    print(f"{meta['chunk_count']} chunks em {args.out}/ ({meta['tombstones']} tombstones)")
+    for kind in ("added", "changed", "removed", "failed"):
+        if meta["changes"][kind]:
+            print(f"  {kind}: {', '.join(meta['changes'][kind])}")
+    for path, info in meta["sources"].items():
+        print(f"  {path}: {info['chunks']} chunks, {info['dropped']} descartados")
+
+
+if __name__ == "__main__":
+    main()
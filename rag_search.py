@@ -0,0 +1,200 @@
+"""
+Lexical retrieval over the RAG chunks (BM25).
+
+The inverted index lives next to the chunks written by rag_ingest.py as
+plain numpy arrays in CSR layout: `bm25_offsets.npy` marks where each
+term's postings start in `bm25_docs.npy` / `bm25_tfs.npy`. They are
+opened with mmap_mode="r", so loading is near-instant and every worker
+process shares the same pages through the OS cache; only the vocabulary
+(term -> id) is parsed into memory.
+
+    python rag_search.py "cãibras magnésio"
+"""
+
+import argparse
+import json
+import os
+import re
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import rag_ingest
+from carnivore_core import fold_accents
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+VOCAB_FILE = "bm25_vocab.json"
+OFFSETS_FILE = "bm25_offsets.npy"
+DOCS_FILE = "bm25_docs.npy"
+TFS_FILE = "bm25_tfs.npy"
+DOCLEN_FILE = "bm25_doclen.npy"
+LIVE_FILE = "bm25_live.npy"
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+you your can do does not but if so than then they their these those which what when how
+o os as um uma uns umas de do da dos das e em no na nos nas por para com sem que se ao aos
+é ser ou mais muito como seu sua seus suas ele ela eles elas isso este esta pelo pela
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+# =============================================================================
+# ANALYZER
+# =============================================================================
+
+def analyze(text: str) -> List[str]:
+    """
+    PT/EN analyzer: carnivore_core accent folding, stopword removal and a
+    light plural strip (eggs -> egg, ovos -> ovo).
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(fold_accents(text)):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def build_bm25(texts: Sequence[str], index_dir: str, dead: Collection[int] = ()) -> Dict:
+    """
+    Write the BM25 arrays for `texts` (doc id = position) into index_dir.
+    `dead` positions (rag_ingest tombstones) keep their doc id but are left
+    out of the document count and average length, so IDF and length
+    normalization match a fresh build of the live chunks.
+    """
+    postings: Dict[str, Dict[int, int]] = {}
+    doclen = np.zeros(len(texts), dtype=np.float32)
+    live = np.ones(len(texts), dtype=bool)
+    live[np.fromiter(dead, dtype=np.int64, count=len(dead))] = False
+    for doc_id, text in enumerate(texts):
+        if not live[doc_id]:
+            continue
+        tokens = analyze(text)
+        doclen[doc_id] = len(tokens)
+        for token in tokens:
+            term_postings = postings.setdefault(token, {})
+            term_postings[doc_id] = term_postings.get(doc_id, 0) + 1
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    for term_id, term in enumerate(terms):
+        offsets[term_id + 1] = offsets[term_id] + len(postings[term])
+    docs = np.empty(int(offsets[-1]), dtype=np.int32)
+    tfs = np.empty(int(offsets[-1]), dtype=np.float32)
+    for term_id, term in enumerate(terms):
+        start = offsets[term_id]
+        items = sorted(postings[term].items())
+        docs[start:start + len(items)] = [d for d, _ in items]
+        tfs[start:start + len(items)] = [tf for _, tf in items]
+
+    os.makedirs(index_dir, exist_ok=True)
+    for name, array in ((OFFSETS_FILE, offsets), (DOCS_FILE, docs), (TFS_FILE, tfs), (DOCLEN_FILE, doclen),
+                        (LIVE_FILE, live)):
+        _save_array(os.path.join(index_dir, name), array)
+    vocab_path = os.path.join(index_dir, VOCAB_FILE)
+    with open(vocab_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(vocab_path + ".tmp", vocab_path)
+    return {"documents": len(texts), "terms": len(terms), "postings": int(offsets[-1])}
+
+
+def _save_array(path: str, array: np.ndarray):
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+
+# =============================================================================
+# QUERY
+# =============================================================================
+
+class BM25Index:
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, VOCAB_FILE), encoding="utf-8") as f:
+            self.vocab = {term: term_id for term_id, term in enumerate(json.load(f))}
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode="r")
+        self.docs = np.load(os.path.join(index_dir, DOCS_FILE), mmap_mode="r")
+        self.tfs = np.load(os.path.join(index_dir, TFS_FILE), mmap_mode="r")
+        doclen = np.load(os.path.join(index_dir, DOCLEN_FILE), mmap_mode="r")
+        live_path = os.path.join(index_dir, LIVE_FILE)
+        # indexes written before the live mask have no tombstones to skip
+        live = np.load(live_path) if os.path.exists(live_path) else np.ones(len(doclen), dtype=bool)
+        # tombstoned docs keep their slot in the arrays but not in the corpus statistics
+        self.doc_count = int(live.sum())
+        avgdl = float(doclen[live].mean()) if self.doc_count else 0.0
+        # Per-document part of the BM25 denominator, computed once per load
+        self._norm = (BM25_K1 * (1 - BM25_B + BM25_B * doclen / (avgdl or 1.0))).astype(np.float32)
+
+    def idf(self, term_id: int) -> float:
+        df = int(self.offsets[term_id + 1] - self.offsets[term_id])
+        return float(np.log(1 + (self.doc_count - df + 0.5) / (df + 0.5)))
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (doc id, score) pairs, best first; empty if no query term is indexed"""
+        term_ids = {self.vocab[t] for t in analyze(query) if t in self.vocab}
+        if not term_ids or k <= 0:
+            return []
+        scores = np.zeros(len(self._norm), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.docs[start:end]
+            tfs = self.tfs[start:end]
+            # doc ids are unique within one postings list, so fancy += is safe
+            scores[docs] += self.idf(term_id) * tfs * (BM25_K1 + 1) / (tfs + self._norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(d), float(scores[d])) for d in ranked]
+
+
+_INDEXES: Dict[str, Tuple[float, BM25Index, List[Dict]]] = {}
+
+
+def load_index(index_dir: str) -> Optional[Tuple[BM25Index, List[Dict]]]:
+    """BM25 index + chunk records, cached per directory until the index is rebuilt"""
+    vocab_path = os.path.join(index_dir, VOCAB_FILE)
+    if not os.path.exists(vocab_path):
+        return None
+    mtime = os.path.getmtime(vocab_path)
+    cached = _INDEXES.get(index_dir)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, BM25Index(index_dir), rag_ingest.load_chunks(index_dir))
+        _INDEXES[index_dir] = cached
+    return cached[1], cached[2]
+
+
+def search(query: str, k: int = 5, index_dir: Optional[str] = None) -> List[Dict]:
+    """Top-k chunk records (with a "score" key) for a free-text query"""
+    loaded = load_index(index_dir or rag_ingest.DEFAULT_INDEX_DIR)
+    if loaded is None:
+        return []
+    index, chunks = loaded
+    return [dict(chunks[doc_id], score=score) for doc_id, score in index.search(query, k)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the BM25 index of the RAG corpus")
+    parser.add_argument("query")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--index", default=rag_ingest.DEFAULT_INDEX_DIR)
+    args = parser.parse_args()
+
+    for hit in search(args.query, args.k, args.index):
+        print(f"{hit['score']:6.2f}  {hit['id']}  {hit['text'][:100]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,38 @@
-import os
+import io
+import gzip
 import json
 import csv
-from datetime import datetime
-from typing import List, Dict
+from collections.abc import Iterator
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from html import escape
+from typing import Any, Iterable, List, Dict, Optional, TextIO
 
+import metrics
 
-def generate_daily_report(user_name: str, date: str, meals: List[Dict], totals: Dict) -> str:
-    css = """
-    <style>
+
+# =============================================================================
+# TEMPLATES (built once at import)
+# =============================================================================
+# Every page is one str.format template with the CSS already inlined.
+# Repeated fragments (meals, timeline, bars) are f-string functions, compiled
+# with the module, rendered into a list and joined once. A meal's time is
+# escaped once and shared by the meal list and the timeline; its summary is
+# escaped by each of them, since the timeline cuts the raw text to 40
+# characters first so the cut never splits an HTML entity.
+
+BASE_CSS = """
         body { font-family: 'Segoe UI', sans-serif; background-color: #121212; color: #e0e0e0; margin: 0; padding: 20px; }
-        .container { max-width: 700px; margin: 0 auto; background-color: #1e1e1e; padding: 20px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.3); }
+        .container { margin: 0 auto; background-color: #1e1e1e; padding: 20px; border-radius: 10px; }
         h1 { color: #ff5252; text-align: center; border-bottom: 2px solid #ff5252; padding-bottom: 10px; }
         h2 { color: #ffffff; margin-top: 30px; }
+        .subtitle { text-align: center; color: #888; }
+        .empty { text-align: center; color: #666; }
+        .footer { text-align: center; margin-top: 40px; color: #666; font-size: 12px; }
+"""
+
+DAILY_CSS = BASE_CSS + """
+        .container { max-width: 700px; box-shadow: 0 4px 6px rgba(0,0,0,0.3); }
         .summary-grid { display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 10px; margin-bottom: 20px; }
         .card { background: #2c2c2c; padding: 15px; border-radius: 8px; text-align: center; }
         .card-value { font-size: 24px; font-weight: bold; display: block; }
@@ -24,99 +45,247 @@ def generate_daily_report(user_name: str, date: str, meals: List[Dict], totals:
         .meal-time { color: #888; font-size: 14px; }
         .meal-title { font-weight: bold; font-size: 16px; }
         .meal-macros { font-size: 13px; color: #bbb; }
-        .tag { background: #333; padding: 2px 6px; border-radius: 4px; font-size: 10px; }
-        .footer { text-align: center; margin-top: 40px; color: #666; font-size: 12px; }
-        .chart-container { background: #252525; border-radius: 8px; padding: 20px; margin: 20px 0; }
+        .chart-container { background: #252525; border-radius: 8px; padding: 20px; margin: 20px 0; text-align: center; }
+        .chart-legend { display: flex; justify-content: center; gap: 20px; margin-top: 10px; }
         .timeline { position: relative; padding: 20px 0; }
         .timeline-item { display: flex; align-items: center; margin: 10px 0; }
         .timeline-dot { width: 12px; height: 12px; background: #ff5252; border-radius: 50%; margin-right: 15px; }
         .timeline-content { flex: 1; background: #2c2c2c; padding: 10px 15px; border-radius: 6px; }
         .timeline-time { color: #888; font-size: 12px; }
-        .progress-bar { background: #333; border-radius: 10px; height: 20px; overflow: hidden; margin: 5px 0; }
-        .progress-fill { height: 100%; border-radius: 10px; transition: width 0.3s; }
-    </style>
-    """
-    
-    summary_html = f"""
-    <div class="summary-grid">
-        <div class="card">
-            <span class="card-value p-color">{totals.get('protein', 0)}g</span>
-            <span class="card-label">Proteína</span>
+        .timeline-kcal { color: #888; font-size: 12px; }
+"""
+
+WEEKLY_CSS = BASE_CSS + """
+        .container { max-width: 800px; }
+        .stat-grid { display: grid; grid-template-columns: repeat(4, 1fr); gap: 10px; margin: 20px 0; }
+        .stat-card { background: #2c2c2c; padding: 15px; border-radius: 8px; text-align: center; }
+        .stat-value { font-size: 28px; font-weight: bold; color: #ff5252; }
+        .stat-label { font-size: 11px; color: #888; text-transform: uppercase; }
+        .bar-chart { margin: 20px 0; }
+        .bar-row { display: flex; align-items: center; margin: 8px 0; }
+        .bar-label { width: 80px; font-size: 12px; color: #888; }
+        .bar-container { flex: 1; background: #333; height: 24px; border-radius: 4px; overflow: hidden; }
+        .bar-fill { height: 100%; background: linear-gradient(90deg, #ff5252, #ff8a80); border-radius: 4px; }
+        .bar-value { width: 80px; text-align: right; font-size: 12px; }
+"""
+
+
+def _page_template(css: str, body: str) -> str:
+    """Full document template: css is inlined literally (its braces escaped), title/body stay fields"""
+    css = css.replace("{", "{{").replace("}", "}}")
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n    <meta charset=\"UTF-8\">\n    <title>{title}</title>\n"
+        f"    <style>{css}    </style>\n</head>\n<body>\n    <div class=\"container\">{body}"
+        "        <div class=\"footer\">{footer}</div>\n    </div>\n</body>\n</html>\n"
+    )
+
+
+DAILY_TEMPLATE = _page_template(DAILY_CSS, """
+        <h1>🦁 Diário Carnívoro</h1>
+        <p class="subtitle">{date} • {user_name}</p>
+        <div class="summary-grid">
+            <div class="card"><span class="card-value p-color">{protein}g</span><span class="card-label">Proteína</span></div>
+            <div class="card"><span class="card-value f-color">{fat}g</span><span class="card-label">Gordura</span></div>
+            <div class="card"><span class="card-value c-color">{calories}</span><span class="card-label">Kcal</span></div>
         </div>
-        <div class="card">
-            <span class="card-value f-color">{totals.get('fat', 0)}g</span>
-            <span class="card-label">Gordura</span>
+        <h2>📊 Distribuição de Macros</h2>
+        {chart}
+        <h2>⏰ Linha do Tempo</h2>
+        {timeline}
+        <h2>🍽️ Refeições</h2>
+        {meals}
+""")
+
+WEEKLY_TEMPLATE = _page_template(WEEKLY_CSS, """
+        <h1>📈 Relatório Semanal</h1>
+        <p class="subtitle">{user_name} • Últimos 7 dias</p>
+        <div class="stat-grid">
+            <div class="stat-card"><div class="stat-value">{total_meals}</div><div class="stat-label">Refeições</div></div>
+            <div class="stat-card"><div class="stat-value">{avg_daily_calories:.0f}</div><div class="stat-label">Kcal/dia</div></div>
+            <div class="stat-card"><div class="stat-value">{compliance:.0f}%</div><div class="stat-label">Aderência</div></div>
+            <div class="stat-card"><div class="stat-value">{weight_change:+.1f}</div><div class="stat-label">Peso (kg)</div></div>
         </div>
-        <div class="card">
-            <span class="card-value c-color">{totals.get('calories', 0)}</span>
-            <span class="card-label">Kcal</span>
+        <h2>📊 Calorias por Dia</h2>
+        <div class="bar-chart">{bars}
         </div>
-    </div>
-    """
-    
-    chart_html = _generate_macro_pie_chart(totals)
-    
-    timeline_html = _generate_timeline(meals)
-    
-    meals_html = ""
-    for m in meals:
-        icon = '📸' if m.get('source') == 'photo' else '🎙️' if m.get('source') == 'voice' else '📝'
-        macros = m.get('macros', {})
-        p = macros.get('protein', 0)
-        f = macros.get('fat', 0)
-        
-        meals_html += f"""
-        <div class="meal-item">
-            <div class="meal-header">
-                <span class="meal-title">{icon} {m.get('summary', 'Refeição')}</span>
-                <span class="meal-time">{m.get('time', '')}</span>
-            </div>
-            <div class="meal-macros">
-                P: {p}g | G: {f}g | {m.get('calories', 0)} kcal
-            </div>
+        <h2>📋 Resumo</h2>
+        <p>💪 Proteína média: {avg_daily_protein:.0f}g/dia</p>
+        <p>🧈 Gordura média: {avg_daily_fat:.0f}g/dia</p>
+        <p>⏳ Jejuns: {fasts_completed} ({total_fasting_hours:.1f}h total)</p>
+        <p>🩺 Sintomas: {symptoms_logged} registros</p>
+""")
+
+PERIOD_CSS = WEEKLY_CSS + """
+        .container { max-width: 960px; }
+        .chart { background: #252525; border-radius: 8px; padding: 10px; margin: 10px 0; }
+        .chart svg { width: 100%; height: auto; display: block; }
+        .chart-legend { display: flex; justify-content: center; gap: 20px; margin-top: 6px; font-size: 12px; color: #aaa; }
+        .heatmap { display: grid; grid-template-rows: repeat(7, 12px); grid-auto-flow: column; grid-auto-columns: 12px; gap: 3px; overflow-x: auto; padding: 10px 0; }
+        .cell { width: 12px; height: 12px; border-radius: 2px; background: #2c2c2c; }
+        .lvl1 { background: #5d1f1f; }
+        .lvl2 { background: #8e2b2b; }
+        .lvl3 { background: #c73a3a; }
+        .lvl4 { background: #ff5252; }
+"""
+
+PERIOD_TEMPLATE = _page_template(PERIOD_CSS, """
+        <h1>{heading}</h1>
+        <p class="subtitle">{user_name} • {start_date} → {end_date}</p>
+        <div class="stat-grid">
+            <div class="stat-card"><div class="stat-value">{days_tracked}</div><div class="stat-label">Dias</div></div>
+            <div class="stat-card"><div class="stat-value">{avg_daily_calories:.0f}</div><div class="stat-label">Kcal/dia</div></div>
+            <div class="stat-card"><div class="stat-value">{compliance:.0f}%</div><div class="stat-label">Aderência</div></div>
+            <div class="stat-card"><div class="stat-value">{weight_change:+.1f}</div><div class="stat-label">Peso (kg)</div></div>
         </div>
-        """
-        
-    if not meals:
-        meals_html = "<p style='text-align:center; color:#555;'>Nenhum registro hoje. Está em jejum? 🦁</p>"
-
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Relatório Carnívoro - {date}</title>
-        {css}
-    </head>
-    <body>
-        <div class="container">
-            <h1>🦁 Diário Carnívoro</h1>
-            <p style="text-align:center; color:#888;">{date} • {user_name}</p>
-            
-            {summary_html}
-            
-            <h2>📊 Distribuição de Macros</h2>
-            {chart_html}
-            
-            <h2>⏰ Linha do Tempo</h2>
-            {timeline_html}
-            
-            <h2>🍽️ Refeições</h2>
-            {meals_html}
-            
-            <div class="footer">
-                Carnivore Tracker • Stay Meat-Based 🥩
+        <h2>🔥 Calorias por Dia</h2>
+        {calorie_chart}
+        <h2>🥩 Proteína e Gordura</h2>
+        {macro_chart}
+        <h2>✅ Aderência Diária</h2>
+        {heatmap}
+        <h2>⚖️ Peso</h2>
+        {weight_chart}
+        <h2>📋 Resumo</h2>
+        <p>🍽️ Refeições: {total_meals}</p>
+        <p>💪 Proteína média: {avg_daily_protein:.0f}g/dia</p>
+        <p>🧈 Gordura média: {avg_daily_fat:.0f}g/dia</p>
+        <p>⏳ Jejuns: {fasts_completed} ({total_fasting_hours:.1f}h total)</p>
+        <p>🩺 Sintomas: {symptoms_logged} registros</p>
+""")
+
+PERIOD_HEADINGS = {"monthly": "📅 Relatório Mensal", "yearly": "📆 Relatório Anual", "all": "🦁 Histórico Completo"}
+
+def _meal_item(icon: str, summary: str, time: str, protein, fat, calories) -> str:
+    return f"""
+        <div class="meal-item">
+            <div class="meal-header"><span class="meal-title">{icon} {summary}</span><span class="meal-time">{time}</span></div>
+            <div class="meal-macros">P: {protein}g | G: {fat}g | {calories} kcal</div>
+        </div>"""
+
+
+def _timeline_item(icon: str, summary: str, time: str, calories) -> str:
+    return f"""
+            <div class="timeline-item">
+                <div class="timeline-dot"></div>
+                <div class="timeline-content">
+                    <div class="timeline-time">{time}</div>
+                    <div>{icon} {summary}</div>
+                    <div class="timeline-kcal">{calories} kcal</div>
+                </div>
+            </div>"""
+
+
+def _bar_row(label: str, pct: float, calories: float) -> str:
+    return f"""
+            <div class="bar-row">
+                <span class="bar-label">{label}</span>
+                <div class="bar-container"><div class="bar-fill" style="width: {pct}%;"></div></div>
+                <span class="bar-value">{calories:.0f} kcal</span>
+            </div>"""
+
+
+def _line_chart(series: List[tuple], span: int, height: int = 160, unit: str = "") -> str:
+    """SVG line chart; series = [(label, color, [(x, value), ...]), ...] sharing one y axis"""
+    width = 800
+    values = [v for _, _, points in series for _, v in points]
+    low, high = min(values), max(values)
+    if high == low:
+        low, high = low - 1, high + 1
+    x_scale = width / max(span - 1, 1)
+    y_scale = (height - 20) / (high - low)
+    lines = [
+        f'<polyline fill="none" stroke="{color}" stroke-width="2" points="'
+        + " ".join([f"{x * x_scale:.1f},{height - 10 - (v - low) * y_scale:.1f}" for x, v in points])
+        + '"/>'
+        for _, color, points in series
+    ]
+    legend = "".join([f'<span><span style="color:{color};">●</span> {label}</span>' for label, color, _ in series])
+    return (
+        f'<div class="chart"><svg viewBox="0 0 {width} {height}" preserveAspectRatio="none">'
+        f'<text x="4" y="12" fill="#888" font-size="11">{high:.0f}{unit}</text>'
+        f'<text x="4" y="{height - 2}" fill="#888" font-size="11">{low:.0f}{unit}</text>'
+        + "".join(lines) + f'</svg><div class="chart-legend">{legend}</div></div>'
+    )
+
+
+def _heatmap_cell(day: str, level: int, title: str) -> str:
+    return f'<div class="cell lvl{level}" title="{day}: {title}"></div>'
+
+
+PIE_CHART_TEMPLATE = """<div class="chart-container">
+            <svg width="200" height="200" viewBox="0 0 200 200">
+                <circle cx="100" cy="100" r="80" fill="none" stroke="#fff59d" stroke-width="30"
+                        stroke-dasharray="{fat_arc} 502" transform="rotate(-90 100 100)"/>
+                <circle cx="100" cy="100" r="80" fill="none" stroke="#f48fb1" stroke-width="30"
+                        stroke-dasharray="{protein_arc} 502"
+                        stroke-dashoffset="-{fat_arc}" transform="rotate(-90 100 100)"/>
+                <text x="100" y="95" text-anchor="middle" fill="#fff" font-size="14">{calories} kcal</text>
+                <text x="100" y="115" text-anchor="middle" fill="#888" font-size="11">G/P: {ratio}</text>
+            </svg>
+            <div class="chart-legend">
+                <span><span style="color:#f48fb1;">●</span> Proteína {protein_pct:.0f}%</span>
+                <span><span style="color:#fff59d;">●</span> Gordura {fat_pct:.0f}%</span>
             </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    filename = f"/tmp/report_{user_name}_{date}.html"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
-    
-    return filename
+        </div>"""
+
+NO_MEALS_HTML = "<p class=\"empty\">Nenhum registro hoje. Está em jejum? 🦁</p>"
+NO_TIMELINE_HTML = "<p class=\"empty\">Nenhuma refeição registrada</p>"
+NO_CHART_HTML = "<p class=\"empty\">Sem dados para gráfico</p>"
+NO_WEIGHT_HTML = "<p class=\"empty\">Registre o peso com /weight para ver a curva</p>"
+
+_SOURCE_ICONS = {"photo": "📸", "voice": "🎙️"}
+
+
+@lru_cache(maxsize=4096)
+def _escape(value) -> str:
+    """html.escape, memoized: meal names and times repeat across reports"""
+    return escape(str(value))
+
+
+def _meal_rows(meals: List[Dict]) -> List[tuple]:
+    """(time, icon, summary, protein, fat, calories) per meal; time escaped, summary raw"""
+    rows = []
+    for m in meals:
+        macros = m.get('macros', {})
+        rows.append((
+            _escape(m.get('time', '')),
+            _SOURCE_ICONS.get(m.get('source'), '📝'),
+            str(m.get('summary', 'Refeição')),
+            macros.get('protein', 0),
+            macros.get('fat', 0),
+            m.get('calories', 0),
+        ))
+    return rows
+
+
+# =============================================================================
+# HTML REPORTS
+# =============================================================================
+
+@metrics.timed_fn("report.generate_daily_report")
+def generate_daily_report(user_name: str, date: str, meals: List[Dict], totals: Dict) -> io.BytesIO:
+    rows = _meal_rows(meals)
+    if rows:
+        meals_html = "".join([
+            _meal_item(icon, _escape(summary), time, protein, fat, calories)
+            for time, icon, summary, protein, fat, calories in rows
+        ])
+    else:
+        meals_html = NO_MEALS_HTML
+
+    html = DAILY_TEMPLATE.format(
+        title=f"Relatório Carnívoro - {escape(date)}",
+        date=escape(date),
+        user_name=escape(user_name),
+        protein=totals.get('protein', 0),
+        fat=totals.get('fat', 0),
+        calories=totals.get('calories', 0),
+        chart=_generate_macro_pie_chart(totals),
+        timeline=_generate_timeline(meals, rows),
+        meals=meals_html,
+        footer="Carnivore Tracker • Stay Meat-Based 🥩",
+    )
+    return _html_buffer(html, f"report_{date}.html")
 
 
 def _generate_macro_pie_chart(totals: Dict) -> str:
@@ -128,178 +297,228 @@ def _generate_macro_pie_chart(totals: Dict) -> str:
     total_cal = protein_cal + fat_cal
     
     if total_cal == 0:
-        return "<p style='text-align:center; color:#666;'>Sem dados para gráfico</p>"
+        return NO_CHART_HTML
     
     protein_pct = (protein_cal / total_cal) * 100
     fat_pct = (fat_cal / total_cal) * 100
     
-    protein_angle = (protein_pct / 100) * 360
-    
-    return f"""
-    <div class="chart-container" style="text-align: center;">
-        <svg width="200" height="200" viewBox="0 0 200 200">
-            <circle cx="100" cy="100" r="80" fill="none" stroke="#fff59d" stroke-width="30" 
-                    stroke-dasharray="{fat_pct * 5.02} 502" transform="rotate(-90 100 100)"/>
-            <circle cx="100" cy="100" r="80" fill="none" stroke="#f48fb1" stroke-width="30" 
-                    stroke-dasharray="{protein_pct * 5.02} 502" 
-                    stroke-dashoffset="-{fat_pct * 5.02}" transform="rotate(-90 100 100)"/>
-            <text x="100" y="95" text-anchor="middle" fill="#fff" font-size="14">
-                {totals.get('calories', 0)} kcal
-            </text>
-            <text x="100" y="115" text-anchor="middle" fill="#888" font-size="11">
-                G/P: {round(fat/protein, 1) if protein > 0 else 0}
-            </text>
-        </svg>
-        <div style="display: flex; justify-content: center; gap: 20px; margin-top: 10px;">
-            <span><span style="color:#f48fb1;">●</span> Proteína {protein_pct:.0f}%</span>
-            <span><span style="color:#fff59d;">●</span> Gordura {fat_pct:.0f}%</span>
-        </div>
-    </div>
-    """
+    return PIE_CHART_TEMPLATE.format(
+        fat_arc=fat_pct * 5.02,
+        protein_arc=protein_pct * 5.02,
+        calories=totals.get('calories', 0),
+        ratio=round(fat / protein, 1) if protein > 0 else 0,
+        protein_pct=protein_pct,
+        fat_pct=fat_pct,
+    )
 
 
-def _generate_timeline(meals: List[Dict]) -> str:
+def _generate_timeline(meals: List[Dict], rows: Optional[List[tuple]] = None) -> str:
     if not meals:
-        return "<p style='text-align:center; color:#666;'>Nenhuma refeição registrada</p>"
+        return NO_TIMELINE_HTML
     
-    html = '<div class="timeline">'
-    for m in sorted(meals, key=lambda x: x.get('time', '')):
-        icon = '📸' if m.get('source') == 'photo' else '🎙️' if m.get('source') == 'voice' else '📝'
-        html += f"""
-        <div class="timeline-item">
-            <div class="timeline-dot"></div>
-            <div class="timeline-content">
-                <div class="timeline-time">{m.get('time', '')}</div>
-                <div>{icon} {m.get('summary', 'Refeição')[:40]}</div>
-                <div style="color:#888; font-size:12px;">{m.get('calories', 0)} kcal</div>
-            </div>
-        </div>
-        """
-    html += '</div>'
-    return html
+    rows = rows if rows is not None else _meal_rows(meals)
+    order = sorted(range(len(meals)), key=lambda i: meals[i].get('time', ''))
+    items = [
+        _timeline_item(rows[i][1], _escape(rows[i][2][:40]), rows[i][0], rows[i][5])
+        for i in order
+    ]
+    return '<div class="timeline">' + "".join(items) + '\n        </div>'
 
 
-def generate_weekly_report(user_name: str, weekly_data: Dict) -> str:
-    css = """
-    <style>
-        body { font-family: 'Segoe UI', sans-serif; background-color: #121212; color: #e0e0e0; margin: 0; padding: 20px; }
-        .container { max-width: 800px; margin: 0 auto; background-color: #1e1e1e; padding: 20px; border-radius: 10px; }
-        h1 { color: #ff5252; text-align: center; border-bottom: 2px solid #ff5252; padding-bottom: 10px; }
-        h2 { color: #ffffff; margin-top: 30px; }
-        .stat-grid { display: grid; grid-template-columns: repeat(4, 1fr); gap: 10px; margin: 20px 0; }
-        .stat-card { background: #2c2c2c; padding: 15px; border-radius: 8px; text-align: center; }
-        .stat-value { font-size: 28px; font-weight: bold; color: #ff5252; }
-        .stat-label { font-size: 11px; color: #888; text-transform: uppercase; }
-        .bar-chart { margin: 20px 0; }
-        .bar-row { display: flex; align-items: center; margin: 8px 0; }
-        .bar-label { width: 80px; font-size: 12px; color: #888; }
-        .bar-container { flex: 1; background: #333; height: 24px; border-radius: 4px; overflow: hidden; }
-        .bar-fill { height: 100%; background: linear-gradient(90deg, #ff5252, #ff8a80); border-radius: 4px; }
-        .bar-value { width: 80px; text-align: right; font-size: 12px; }
-        .footer { text-align: center; margin-top: 40px; color: #666; font-size: 12px; }
-    </style>
-    """
-    
+@metrics.timed_fn("report.generate_weekly_report")
+def generate_weekly_report(user_name: str, weekly_data: Dict) -> io.BytesIO:
     daily = weekly_data.get('daily_breakdown', {})
     max_cal = max((d.get('calories', 0) for d in daily.values()), default=1) or 1
     
-    bars_html = ""
-    for day in sorted(daily.keys()):
-        d = daily[day]
-        pct = (d.get('calories', 0) / max_cal) * 100
-        day_label = day[-5:]
-        bars_html += f"""
-        <div class="bar-row">
-            <span class="bar-label">{day_label}</span>
-            <div class="bar-container">
-                <div class="bar-fill" style="width: {pct}%;"></div>
-            </div>
-            <span class="bar-value">{d.get('calories', 0):.0f} kcal</span>
-        </div>
-        """
+    bars_html = "".join([
+        _bar_row(day[-5:], (daily[day].get('calories', 0) / max_cal) * 100, daily[day].get('calories', 0))
+        for day in sorted(daily)
+    ])
     
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Relatório Semanal</title>
-        {css}
-    </head>
-    <body>
-        <div class="container">
-            <h1>📈 Relatório Semanal</h1>
-            <p style="text-align:center; color:#888;">{user_name} • Últimos 7 dias</p>
-            
-            <div class="stat-grid">
-                <div class="stat-card">
-                    <div class="stat-value">{weekly_data.get('total_meals', 0)}</div>
-                    <div class="stat-label">Refeições</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value">{weekly_data.get('avg_daily_calories', 0):.0f}</div>
-                    <div class="stat-label">Kcal/dia</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value">{weekly_data.get('compliance', 0):.0f}%</div>
-                    <div class="stat-label">Aderência</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value">{weekly_data.get('weight_change', 0):+.1f}</div>
-                    <div class="stat-label">Peso (kg)</div>
-                </div>
-            </div>
-            
-            <h2>📊 Calorias por Dia</h2>
-            <div class="bar-chart">
-                {bars_html}
-            </div>
-            
-            <h2>📋 Resumo</h2>
-            <p>💪 Proteína média: {weekly_data.get('avg_daily_protein', 0):.0f}g/dia</p>
-            <p>🧈 Gordura média: {weekly_data.get('avg_daily_fat', 0):.0f}g/dia</p>
-            <p>⏳ Jejuns: {weekly_data.get('fasts_completed', 0)} ({weekly_data.get('total_fasting_hours', 0):.1f}h total)</p>
-            <p>🩺 Sintomas: {weekly_data.get('symptoms_logged', 0)} registros</p>
-            
-            <div class="footer">
-                Carnivore Tracker • Weekly Summary 🥩
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html = WEEKLY_TEMPLATE.format(
+        title="Relatório Semanal",
+        user_name=escape(user_name),
+        total_meals=weekly_data.get('total_meals', 0),
+        avg_daily_calories=weekly_data.get('avg_daily_calories', 0),
+        compliance=weekly_data.get('compliance', 0),
+        weight_change=weekly_data.get('weight_change', 0),
+        bars=bars_html,
+        avg_daily_protein=weekly_data.get('avg_daily_protein', 0),
+        avg_daily_fat=weekly_data.get('avg_daily_fat', 0),
+        fasts_completed=weekly_data.get('fasts_completed', 0),
+        total_fasting_hours=weekly_data.get('total_fasting_hours', 0),
+        symptoms_logged=weekly_data.get('symptoms_logged', 0),
+        footer="Carnivore Tracker • Weekly Summary 🥩",
+    )
+    return _html_buffer(html, f"weekly_report_{datetime.now().strftime('%Y-%m-%d')}.html")
+
+
+def _day_index(start: date, day: str) -> int:
+    return (date.fromisoformat(day) - start).days
+
+
+def _generate_compliance_heatmap(start: date, end: date, days: List[Dict]) -> str:
+    """One cell per calendar day (weeks as columns); shade = share of strict meals"""
+    by_day = {d['date']: d for d in days}
+    # leading blanks so each column starts on a Monday
+    cells = ['<div class="cell" style="visibility:hidden"></div>'] * start.weekday()
+    for offset in range((end - start).days + 1):
+        day = (start + timedelta(days=offset)).isoformat()
+        rollup = by_day.get(day)
+        if not rollup or not rollup['meals']:
+            cells.append(_heatmap_cell(day, 0, "sem registros"))
+            continue
+        ratio = rollup['strict'] / rollup['meals']
+        cells.append(_heatmap_cell(day, 1 + min(3, int(ratio * 4)), f"{ratio * 100:.0f}% strict"))
+    return '<div class="heatmap">' + "".join(cells) + '</div>'
+
+
+@metrics.timed_fn("report.generate_period_report")
+def generate_period_report(user_name: str, summary: Dict) -> io.BytesIO:
+    """Monthly/yearly report from database.get_period_summary (per-day rollups, not meals)"""
+    start = date.fromisoformat(summary['start_date'])
+    end = date.fromisoformat(summary['end_date'])
+    span = (end - start).days + 1
+    days = summary.get('daily_rollups', [])
+    weights = summary.get('daily_weights', [])
     
-    filename = f"/tmp/weekly_report_{user_name}_{datetime.now().strftime('%Y-%m-%d')}.html"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
+    if days:
+        calorie_chart = _line_chart(
+            [("Kcal", "#ffab91", [(_day_index(start, d['date']), d['calories']) for d in days])], span)
+        macro_chart = _line_chart([
+            ("Proteína", "#f48fb1", [(_day_index(start, d['date']), d['protein']) for d in days]),
+            ("Gordura", "#fff59d", [(_day_index(start, d['date']), d['fat']) for d in days]),
+        ], span, unit="g")
+    else:
+        calorie_chart = macro_chart = NO_CHART_HTML
+    if len(weights) >= 2:
+        weight_chart = _line_chart(
+            [("Peso", "#80cbc4", [(_day_index(start, w['date']), w['weight_kg']) for w in weights])],
+            span, height=120, unit="kg")
+    else:
+        weight_chart = NO_WEIGHT_HTML
     
-    return filename
+    period = summary.get('period', 'monthly')
+    html = PERIOD_TEMPLATE.format(
+        title=PERIOD_HEADINGS.get(period, "Relatório"),
+        heading=PERIOD_HEADINGS.get(period, "Relatório"),
+        user_name=escape(user_name),
+        start_date=start.isoformat(),
+        end_date=end.isoformat(),
+        days_tracked=summary.get('days_tracked', 0),
+        avg_daily_calories=summary.get('avg_daily_calories', 0),
+        compliance=summary.get('compliance', 0),
+        weight_change=summary.get('weight_change', 0),
+        calorie_chart=calorie_chart,
+        macro_chart=macro_chart,
+        heatmap=_generate_compliance_heatmap(start, end, days),
+        weight_chart=weight_chart,
+        total_meals=summary.get('total_meals', 0),
+        avg_daily_protein=summary.get('avg_daily_protein', 0),
+        avg_daily_fat=summary.get('avg_daily_fat', 0),
+        fasts_completed=summary.get('fasts_completed', 0),
+        total_fasting_hours=summary.get('total_fasting_hours', 0),
+        symptoms_logged=summary.get('symptoms_logged', 0),
+        footer="Carnivore Tracker • Long-Range Summary 🥩",
+    )
+    return _html_buffer(html, f"{period}_report_{end.isoformat()}.html")
 
 
-def export_to_csv(user_name: str, meals: List[Dict], date_range: str = "daily") -> str:
-    filename = f"/tmp/export_{user_name}_{date_range}_{datetime.now().strftime('%Y%m%d')}.csv"
-    
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
+# =============================================================================
+# IN-MEMORY OUTPUT
+# =============================================================================
+# Reports and exports are returned as BytesIO buffers positioned at 0, with
+# `.name` set to a suggested filename (python-telegram-bot uses it when no
+# filename is given): no temp files, no collisions between concurrent users.
+
+def _html_buffer(html: str, name: str) -> io.BytesIO:
+    buffer = io.BytesIO(html.encode("utf-8"))
+    buffer.name = name
+    return buffer
+
+
+class _TextOutput:
+    """Text stream over a BytesIO, optionally gzip-compressed; `.buffer` after the with-block"""
+
+    def __init__(self, name: str, compress: bool):
+        self.buffer = io.BytesIO()
+        self.buffer.name = name + (".gz" if compress else "")
+        self._gzip = gzip.GzipFile(filename=name, mode="wb", fileobj=self.buffer, mtime=0) if compress else None
+        self._text = io.TextIOWrapper(self._gzip or self.buffer, encoding="utf-8", newline="")
+
+    def __enter__(self) -> TextIO:
+        return self._text
+
+    def __exit__(self, *exc):
+        self._text.flush()
+        self._text.detach()
+        if self._gzip:
+            self._gzip.close()
+        self.buffer.seek(0)
+        return False
+
+
+CSV_COLUMNS = ['datetime', 'summary', 'calories', 'protein_g', 'fat_g', 'carnivore_level', 'source']
+_JSON_SEPARATORS = (",", ":")
+
+
+def _csv_row(m: Dict) -> List:
+    macros = m.get('macros', {})
+    return [
+        m.get('datetime', m.get('time', '')),
+        m.get('summary', ''),
+        m.get('calories', 0),
+        macros.get('protein', m.get('protein_g', 0)),
+        macros.get('fat', m.get('fat_g', 0)),
+        m.get('carnivore_level', 'unknown'),
+        m.get('source', 'unknown'),
+    ]
+
+
+@metrics.timed_fn("report.export_to_csv")
+def export_to_csv(user_name: str, meals: Iterable[Dict], date_range: str = "daily",
+                  compress: bool = False) -> io.BytesIO:
+    """
+    `meals` may be a list or a generator (database.iter_meal_events); rows
+    are written as they come. compress=True gzips the buffer (name *.csv.gz).
+    """
+    output = _TextOutput(f"export_{date_range}_{datetime.now().strftime('%Y%m%d')}.csv", compress)
+    with output as f:
         writer = csv.writer(f)
-        writer.writerow(['datetime', 'summary', 'calories', 'protein_g', 'fat_g', 'carnivore_level', 'source'])
-        
+        writer.writerow(CSV_COLUMNS)
         for m in meals:
-            macros = m.get('macros', {})
-            writer.writerow([
-                m.get('datetime', m.get('time', '')),
-                m.get('summary', ''),
-                m.get('calories', 0),
-                macros.get('protein', m.get('protein_g', 0)),
-                macros.get('fat', m.get('fat_g', 0)),
-                m.get('carnivore_level', 'unknown'),
-                m.get('source', 'unknown'),
-            ])
+            writer.writerow(_csv_row(m))
     
-    return filename
+    return output.buffer
+
+
+def write_json_stream(f: TextIO, value: Any):
+    """
+    json.dump that writes lists and iterators item by item (one per line),
+    so a generator of meals is never materialized.
+    """
+    if isinstance(value, dict):
+        f.write("{")
+        for i, (key, item) in enumerate(value.items()):
+            if i:
+                f.write(",")
+            f.write(json.dumps(str(key), ensure_ascii=False) + ":")
+            write_json_stream(f, item)
+        f.write("}")
+    elif isinstance(value, (list, tuple, Iterator)):
+        f.write("[")
+        for i, item in enumerate(value):
+            f.write(",\n" if i else "\n")
+            json.dump(item, f, ensure_ascii=False, separators=_JSON_SEPARATORS)
+        f.write("\n]")
+    else:
+        json.dump(value, f, ensure_ascii=False, separators=_JSON_SEPARATORS)
 
 
-def export_to_json(user_name: str, data: Dict, date_range: str = "daily") -> str:
-    filename = f"/tmp/export_{user_name}_{date_range}_{datetime.now().strftime('%Y%m%d')}.json"
+@metrics.timed_fn("report.export_to_json")
+def export_to_json(user_name: str, data: Dict, date_range: str = "daily", compress: bool = False) -> io.BytesIO:
+    """Values of `data` that are iterators (e.g. database.iter_meal_events) are streamed"""
+    output = _TextOutput(f"export_{date_range}_{datetime.now().strftime('%Y%m%d')}.json", compress)
     
     export_data = {
         "user": user_name,
@@ -308,7 +527,8 @@ def export_to_json(user_name: str, data: Dict, date_range: str = "daily") -> str
         "data": data,
     }
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(export_data, f, indent=2, ensure_ascii=False)
+    with output as f:
+        write_json_stream(f, export_data)
+        f.write("\n")
     
-    return filename
+    return output.buffer
@@ -0,0 +1,29 @@
+"""
+Stable user -> shard routing.
+
+Python's built-in hash() is salted per process, so routing has to use a
+hash that every worker (and every restart) agrees on.
+"""
+
+import zlib
+from typing import Dict, Optional
+
+
+def shard_for_user(user_id: int, shard_count: int) -> int:
+    if shard_count <= 1:
+        return 0
+    return zlib.crc32(str(user_id).encode("ascii")) % shard_count
+
+
+def extract_user_id(update: Dict) -> Optional[int]:
+    """
+    Find the sender of a raw Telegram update dict (message, edited_message,
+    callback_query, ...). Every update type carries the user under "from".
+    """
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        sender = value.get("from") or value.get("user")
+        if isinstance(sender, dict) and "id" in sender:
+            return sender["id"]
+    return None
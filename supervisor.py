@@ -0,0 +1,150 @@
+"""
+Multi-process supervisor.
+
+Runs N bot worker processes behind the webhook server. Each update is
+routed to a worker by hashing `effective_user.id`; every worker drains its
+own FIFO queue one update at a time, so a given user's updates are always
+handled in order by the same process (and the same Whisper model /
+in-process caches). Workers share the SQLite file, which runs in WAL
+mode with a busy timeout (see database.get_connection).
+
+    BOT_WORKERS=4 WEBHOOK_SECRET=... python supervisor.py
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+from typing import Callable, Dict, List, Optional
+
+import webhook_server
+from sharding import extract_user_id, shard_for_user
+
+logger = logging.getLogger(__name__)
+
+# spawn: workers must not inherit a half-initialised parent (bot.py loads
+# Whisper at import time), and it behaves the same on Linux and macOS
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class ShardedDispatcher:
+    """Owns the worker processes and their per-shard queues"""
+
+    def __init__(self, worker_count: int, target: Callable, args: tuple = ()):
+        if worker_count < 1:
+            raise ValueError("worker_count must be >= 1")
+        self.worker_count = worker_count
+        self.target = target
+        self.args = args
+        self.queues: List = []
+        self.processes: List = []
+        self.dispatched = [0] * worker_count
+
+    def start(self):
+        for index in range(self.worker_count):
+            queue = _MP_CONTEXT.Queue()
+            process = _MP_CONTEXT.Process(
+                target=self.target,
+                args=(index, queue, *self.args),
+                name=f"bot-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self.queues.append(queue)
+            self.processes.append(process)
+        logger.info(f"{self.worker_count} workers iniciados")
+
+    def shard_for(self, update: Dict) -> int:
+        user_id = extract_user_id(update)
+        key = user_id if user_id is not None else update.get("update_id", 0)
+        return shard_for_user(key, self.worker_count)
+
+    def dispatch(self, update: Dict) -> int:
+        shard = self.shard_for(update)
+        self.queues[shard].put(update)
+        self.dispatched[shard] += 1
+        return shard
+
+    def stop(self, timeout: float = 10.0):
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.queues = []
+        self.processes = []
+
+
+# =============================================================================
+# BOT WORKER
+# =============================================================================
+
+def bot_worker(index: int, queue):
+    """Worker process: one telegram Application, updates processed sequentially"""
+    logging.basicConfig(
+        format=f'%(asctime)s - worker-{index} - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    asyncio.run(_bot_worker_loop(index, queue))
+
+
+async def _bot_worker_loop(index: int, queue):
+    import bot
+    from telegram import Update
+
+    app = bot.build_application()
+    loop = asyncio.get_running_loop()
+
+    async with app:
+        if index == 0:
+            await bot.post_init(app)
+            await bot.register_webhook(app)
+        while True:
+            payload = await loop.run_in_executor(None, queue.get)
+            if payload is None:
+                break
+            try:
+                await app.process_update(Update.de_json(payload, app.bot))
+            except Exception as e:
+                logger.error(f"worker-{index}: erro no update {payload.get('update_id')}: {e}")
+
+
+# =============================================================================
+# ENTRY POINT
+# =============================================================================
+
+async def run_supervisor(worker_count: int, host: str, port: int, path: str, secret: Optional[str]):
+    dispatcher = ShardedDispatcher(worker_count, bot_worker)
+    dispatcher.start()
+
+    async def route(payload: Dict):
+        dispatcher.dispatch(payload)
+
+    server = webhook_server.WebhookServer(route, host=host, port=port, path=path, secret_token=secret)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.stop()
+        dispatcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run N sharded bot workers behind the webhook server")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BOT_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.getenv("WEBHOOK_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WEBHOOK_PORT", "8443")))
+    parser.add_argument("--path", default=os.getenv("WEBHOOK_PATH", "/telegram"))
+    parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET"))
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format='%(asctime)s - supervisor - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    asyncio.run(run_supervisor(args.workers, args.host, args.port, args.path, args.secret))
+
+
+if __name__ == "__main__":
+    main()
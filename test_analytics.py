@@ -0,0 +1,108 @@
+import pytest
+from datetime import datetime, timedelta
+
+import analytics
+import database
+
+
+@pytest.fixture(autouse=True)
+def db(monkeypatch, tmp_path):
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "analytics.db"))
+    monkeypatch.setattr(database, "DB_SHARDS", 1)
+    database.init_db()
+    database.add_user(1, "analyst")
+
+
+NOW = datetime.now()
+
+
+def add_meal(days_ago, hour, level="strict", calories=612.3, protein=51.7, fat=43.1):
+    database.add_meal_event(
+        user_id=1, dt=(NOW - timedelta(days=days_ago)).replace(hour=hour, minute=7, microsecond=0),
+        ingredients=["beef"], quantities=["300g"], carnivore_level=level, breaks_fast=True, warnings=[],
+        calories=calories, protein_g=protein, fat_g=fat, summary="Bife", source="text",
+    )
+
+
+def seed_history():
+    for days_ago in range(0, 40):
+        add_meal(days_ago, 8, calories=500.1 + days_ago, protein=40.3, fat=35.7 + days_ago / 10)
+        add_meal(days_ago, 19, level="relaxed" if days_ago % 3 else "strict", calories=733.9, protein=62.2)
+    for days_ago, symptom, severity in [(1, "headache", 3), (2, "cramps", 4), (2, "high_energy", 4),
+                                        (3, "brain_fog", 2), (4, "cramps", 5), (5, "headache", 2),
+                                        (12, "dizziness", 4), (20, "low_energy", 3), (35, "cramps", 9)]:
+        database.add_symptom(1, NOW - timedelta(days=days_ago), symptom, severity)
+    for days_ago, hours in [(2, 16.25), (5, 18.04), (9, 20.35), (31, 24)]:
+        start = NOW - timedelta(days=days_ago, hours=hours + 1)
+        database.start_fast(1, start)
+        database.end_fast(1, start + timedelta(hours=hours, seconds=17))
+    for days_ago, kg in [(1, 84.3), (4, 84.9), (8, 85.6), (15, 86.2), (25, 87.4)]:
+        database.add_weight(1, NOW - timedelta(days=days_ago), kg)
+
+
+class TestMatchesDatabase:
+    def test_metabolic_stats(self):
+        seed_history()
+        assert analytics.get_metabolic_stats(1) == database.get_metabolic_stats(1)
+
+    def test_weekly_summary(self):
+        seed_history()
+        expected = database.get_weekly_summary(1)
+        summary = analytics.get_weekly_summary(1)
+        assert summary == expected
+        assert list(summary["daily_breakdown"]) == list(expected["daily_breakdown"])
+
+    def test_empty_user(self):
+        assert analytics.get_metabolic_stats(1) == database.get_metabolic_stats(1)
+        assert analytics.get_weekly_summary(1) == database.get_weekly_summary(1)
+        assert analytics.get_metabolic_stats(99) == database.get_metabolic_stats(99)
+
+    def test_symptom_ties_keep_first_seen_order(self):
+        for days_ago, symptom in [(1, "cramps"), (2, "headache"), (3, "headache"), (4, "cramps"),
+                                  (5, "weakness"), (6, "dizziness")]:
+            database.add_symptom(1, NOW - timedelta(days=days_ago), symptom, 2)
+        assert analytics.get_metabolic_stats(1)["common_symptoms"] == ["cramps", "headache", "weakness"]
+        assert analytics.get_weekly_summary(1)["top_symptoms"] == database.get_weekly_summary(1)["top_symptoms"]
+
+    def test_meals_outside_window_ignored(self):
+        add_meal(45, 12, level="relaxed")
+        add_meal(2, 12)
+        stats = analytics.get_metabolic_stats(1)
+        assert stats["carnivore_compliance"] == 100.0
+        assert stats == database.get_metabolic_stats(1)
+
+    def test_explicit_now_excludes_later_events(self):
+        add_meal(20, 12, calories=777)
+        add_meal(0, 0, calories=999)
+        database.add_weight(1, NOW - timedelta(days=21), 90.0)
+        database.add_weight(1, NOW, 80.0)
+        window = analytics.load_window(1, NOW - timedelta(days=19))
+
+        assert analytics.weekly_summary(window)["total_calories"] == 777
+        assert window.weight_kg.tolist() == [90.0]
+
+
+class TestTrends:
+    def test_rolling_average(self):
+        add_meal(0, 12, calories=700)
+        add_meal(1, 12, calories=300)
+        rolling = analytics.rolling_daily_average(analytics.load_window(1), "calories", size=2)
+        assert len(rolling) == analytics.WINDOW_DAYS
+        assert list(rolling)[-1] == NOW.strftime('%Y-%m-%d')
+        assert rolling[NOW.strftime('%Y-%m-%d')] == 500.0
+        assert rolling[(NOW - timedelta(days=2)).strftime('%Y-%m-%d')] == 0.0
+
+    def test_rolling_average_unknown_field(self):
+        with pytest.raises(ValueError):
+            analytics.rolling_daily_average(analytics.load_window(1), "carbs")
+
+    def test_weight_regression(self):
+        window = analytics.load_window(1)
+        assert analytics.weight_regression(window) is None
+        for days_ago in range(0, 15):
+            database.add_weight(1, NOW - timedelta(days=days_ago), 90.0 - (14 - days_ago) * 0.1)
+        assert analytics.weight_regression(analytics.load_window(1)) == pytest.approx(-0.7, abs=0.01)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
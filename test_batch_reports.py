@@ -0,0 +1,136 @@
+import json
+import os
+import pytest
+from datetime import datetime, timedelta
+
+import batch_reports
+import database
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "batch.db"))
+    monkeypatch.setattr(database, "DB_SHARDS", 1)
+    database.init_db()
+    return tmp_path
+
+
+def add_meal(user_id, dt, calories=600):
+    database.add_meal_event(
+        user_id=user_id, dt=dt, ingredients=["beef"], quantities=["300g"], carnivore_level="strict",
+        breaks_fast=True, warnings=[], calories=calories, protein_g=60, fat_g=40, summary="Picanha", source="text",
+    )
+
+
+def seed(user_ids, day):
+    for uid in user_ids:
+        database.add_user(uid, f"user{uid}")
+        add_meal(uid, datetime.fromisoformat(f"{day}T12:00:00"))
+
+
+DAY = datetime.now().strftime('%Y-%m-%d')
+
+
+class TestBatchRun:
+    def test_renders_every_user(self, db):
+        seed([1, 2, 3], DAY)
+        reports_dir = str(db / "reports")
+
+        summary = batch_reports.run_batch(DAY, reports_dir, workers=1)
+        assert summary["users"] == 3 and summary["rendered"] == 3
+        assert summary["failed"] == []
+        assert summary["per_user_p95_s"] >= summary["per_user_p50_s"] > 0
+        for uid in (1, 2, 3):
+            html = open(os.path.join(reports_dir, DAY, f"{uid}.daily.html"), encoding="utf-8").read()
+            assert f"user{uid}" in html and "Picanha" in html
+            assert os.path.exists(os.path.join(reports_dir, DAY, f"{uid}.weekly.html"))
+        with open(os.path.join(reports_dir, DAY, batch_reports.RUN_FILE)) as f:
+            assert json.load(f)["rendered"] == 3
+
+    def test_no_daily_artifact_without_meals(self, db):
+        database.add_user(7, "idle")
+        reports_dir = str(db / "reports")
+        batch_reports.run_batch(DAY, reports_dir, workers=1)
+        assert batch_reports.cached_report(7, "daily", DAY, reports_dir) is None
+        assert batch_reports.cached_report(7, "weekly", DAY, reports_dir) is not None
+
+    def test_resumes_and_rerenders_only_changed_users(self, db):
+        seed([1, 2, 3], DAY)
+        reports_dir = str(db / "reports")
+        batch_reports.run_batch(DAY, reports_dir, workers=1)
+
+        # an interrupted run: user 2's artifacts never got their marker
+        os.remove(os.path.join(reports_dir, DAY, "2.json"))
+        add_meal(3, datetime.fromisoformat(f"{DAY}T18:00:00"), calories=900)
+
+        summary = batch_reports.run_batch(DAY, reports_dir, workers=1)
+        assert summary["skipped"] == 1
+        assert summary["rendered"] == 2
+        assert batch_reports.run_batch(DAY, reports_dir, workers=1)["rendered"] == 0
+
+    def test_process_pool(self, db):
+        seed(range(1, 7), DAY)
+        reports_dir = str(db / "reports")
+        summary = batch_reports.run_batch(DAY, reports_dir, workers=2)
+        assert summary["rendered"] == 6
+        assert summary["failed"] == []
+        assert sorted(int(name.split(".")[0]) for name in os.listdir(os.path.join(reports_dir, DAY))
+                      if name.endswith(".daily.html")) == list(range(1, 7))
+
+    def test_process_pool_creates_no_default_db(self, db, monkeypatch):
+        seed([1, 2], DAY)
+        workdir = db / "cwd"
+        workdir.mkdir()
+        monkeypatch.chdir(workdir)
+        monkeypatch.delenv("DB_NAME", raising=False)
+
+        summary = batch_reports.run_batch(DAY, str(db / "reports"), workers=2)
+        assert summary["rendered"] == 2 and summary["failed"] == []
+        assert os.listdir(workdir) == []
+        assert "DB_NAME" not in os.environ
+
+    def test_backfill_weekly_window_ends_at_date(self, db):
+        past = (datetime.now() - timedelta(days=40)).strftime('%Y-%m-%d')
+        database.add_user(1, "backfill")
+        add_meal(1, datetime.fromisoformat(f"{past}T12:00:00"), calories=777)
+        add_meal(1, datetime.fromisoformat(f"{DAY}T12:00:00"), calories=999)
+        reports_dir = str(db / "reports")
+
+        batch_reports.run_batch(past, reports_dir, workers=1)
+        weekly = open(os.path.join(reports_dir, past, "1.weekly.html"), encoding="utf-8").read()
+        assert "777" in weekly and "999" not in weekly
+
+    def test_window_end(self):
+        assert batch_reports._window_end("2025-01-31") == datetime(2025, 1, 31, 23, 59, 59, 999999)
+        assert batch_reports._window_end(DAY) <= datetime.now()
+
+
+class TestCachedReport:
+    def test_served_until_user_logs_again(self, db):
+        seed([1], DAY)
+        reports_dir = str(db / "reports")
+        batch_reports.run_batch(DAY, reports_dir, workers=1)
+
+        report = batch_reports.cached_report(1, "daily", DAY, reports_dir)
+        assert report.name == f"daily_report_{DAY}.html"
+        assert b"Picanha" in report.getvalue()
+
+        database.add_weight(1, datetime.now(), 85.0)
+        assert batch_reports.cached_report(1, "daily", DAY, reports_dir) is None
+        assert batch_reports.cached_report(1, "weekly", DAY, reports_dir) is None
+
+    def test_missing_and_unknown(self, db):
+        assert batch_reports.cached_report(1, "daily", DAY, str(db / "reports")) is None
+        with pytest.raises(ValueError):
+            batch_reports.cached_report(1, "monthly", DAY, str(db / "reports"))
+
+    def test_data_version_tracks_ended_fasts(self, db):
+        database.add_user(1, "faster")
+        database.start_fast(1, datetime.now())
+        before = database.get_user_data_version(1)
+        database.end_fast(1, datetime.now())
+        assert database.get_user_data_version(1) != before
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,71 @@
+import random
+import pytest
+from benchmark import compare, make_ingredient_mix, measure, populate_meals, run_suite
+
+
+class TestSyntheticData:
+    def test_ingredient_mixes(self):
+        from carnivore_core import find_matching_category
+        rng = random.Random(1)
+
+        assert all(find_matching_category(i)[0] is not None for i in make_ingredient_mix("known", 20, rng))
+        assert all(find_matching_category(i)[0] is None for i in make_ingredient_mix("unknown", 20, rng))
+        assert all(" " in i for i in make_ingredient_mix("partial", 20, rng))
+
+    def test_invalid_mix(self):
+        with pytest.raises(ValueError):
+            make_ingredient_mix("nope", 1, random.Random(1))
+
+    def test_populate_meals(self, tmp_path, monkeypatch):
+        import database
+        monkeypatch.setattr(database, "DB_NAME", database.DB_NAME)
+        db_path = str(tmp_path / "bench.db")
+        populate_meals(db_path, 500)
+
+        conn = database.get_connection()
+        try:
+            assert conn.execute("SELECT COUNT(*) FROM meal_events").fetchone()[0] == 500
+        finally:
+            conn.close()
+
+    def test_populate_meals_ignores_shards(self, tmp_path, monkeypatch):
+        import database
+        monkeypatch.setattr(database, "DB_NAME", database.DB_NAME)
+        monkeypatch.setattr(database, "DB_SHARDS", 4)
+        populate_meals(str(tmp_path / "bench.db"), 100)
+        assert sorted(p.name for p in tmp_path.iterdir() if p.suffix == ".db") == ["bench.db"]
+
+    def test_retained_bytes_keeps_build_error(self):
+        from benchmark import _retained_bytes
+
+        def build():
+            raise ValueError("build failed")
+        with pytest.raises(ValueError, match="build failed"):
+            _retained_bytes(build)
+
+
+class TestCompare:
+    def test_detects_regression(self):
+        baseline = {"a": {"median_s": 1.0}, "b": {"median_s": 1.0}}
+        current = {"a": {"median_s": 1.1}, "b": {"median_s": 2.0}, "new": {"median_s": 5.0}}
+
+        regressions = compare(baseline, current, threshold=0.25)
+        assert len(regressions) == 1
+        assert regressions[0].startswith("b:")
+
+    def test_measure(self):
+        result = measure(lambda: sum(range(10)), min_time=0.01, repeat=3)
+        assert result["median_s"] > 0
+        assert result["repeat"] == 3
+
+    def test_run_suite_core(self):
+        results = run_suite([], only="core")
+        assert "core.validate_ingredients[unknown,n=10]" in results
+
+    def test_run_suite_rag(self):
+        results = run_suite([], only="rag")
+        assert "rag.bm25_search[docs=5000,k=5]" in results
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
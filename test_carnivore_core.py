@@ -6,6 +6,8 @@ from carnivore_core import (
     validate_llm_meal_output,
     find_matching_category,
     normalize_ingredient,
+    fold_accents,
+    extract_known_foods,
     check_breaks_fast,
     calculate_fat_protein_ratio,
     estimate_processing_level,
@@ -234,6 +236,19 @@ class TestHelperFunctions:
         assert normalize_ingredient("  BEEF  ") == "beef"
         assert normalize_ingredient("Salmon") == "salmon"
     
+    def test_fold_accents(self):
+        assert fold_accents(" Salmão ") == "salmao"
+        assert fold_accents("Acém") == "acem"
+
+    def test_extract_known_foods(self):
+        foods = extract_known_foods("Picanha com SAL, arroz e feijão; ground beef and eggs")
+        assert foods == ["picanha", "sal", "arroz", "feijao", "ground beef", "eggs"]
+
+    def test_extract_known_foods_word_boundaries(self):
+        assert extract_known_foods("hamburger salada") == ["salada"]
+        assert extract_known_foods("couve-flor") == ["couve-flor"]
+        assert extract_known_foods("acém") == ["acém"]
+    
     def test_check_breaks_fast_positive(self):
         assert check_breaks_fast(100) is True
     
@@ -0,0 +1,105 @@
+import pytest
+from datetime import datetime, timedelta
+
+import cohort_analytics
+import database
+
+
+@pytest.fixture(params=[1, 3], ids=["single", "sharded"])
+def db(request, monkeypatch, tmp_path):
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "cohort.db"))
+    monkeypatch.setattr(database, "DB_SHARDS", request.param)
+    database.init_db()
+    return tmp_path
+
+
+NOW = datetime.now()
+
+
+def add_meal(user_id, days_ago, level="strict", protein=50.3, fat=41.7):
+    database.add_meal_event(
+        user_id=user_id, dt=NOW - timedelta(days=days_ago, hours=1), ingredients=["beef"], quantities=["300g"],
+        carnivore_level=level, breaks_fast=True, warnings=[], calories=600, protein_g=protein, fat_g=fat,
+        summary="Bife", source="text",
+    )
+
+
+def seed_user(user_id):
+    database.add_user(user_id, f"user{user_id}")
+    for days_ago in range(0, 35, 1 + user_id % 3):
+        add_meal(user_id, days_ago, level="relaxed" if (days_ago + user_id) % 4 == 0 else "strict",
+                 protein=40 + user_id, fat=30.1 + days_ago)
+    for days_ago in range(0, 20, 2 + user_id % 2):
+        database.add_symptom(user_id, NOW - timedelta(days=days_ago), ("cramps", "headache", "low_energy")[days_ago % 3],
+                             1 + (days_ago + user_id) % 5)
+    for days_ago in range(1, 25, 4):
+        start = NOW - timedelta(days=days_ago, hours=20)
+        database.start_fast(user_id, start)
+        database.end_fast(user_id, start + timedelta(hours=12 + user_id % 9, minutes=days_ago))
+    for i in range(user_id % 40):
+        database.add_weight(user_id, NOW - timedelta(days=i), 80 + (i * (user_id % 3 - 1)) * 0.2)
+
+
+def assert_matches_per_user_stats(rows):
+    for row in rows:
+        stats = database.get_metabolic_stats(row["user_id"])
+        for column in cohort_analytics.COLUMNS[2:-1]:
+            assert row[column] == stats[column], (row["user_id"], column)
+
+
+class TestRunCohort:
+    def test_matches_metabolic_stats(self, db):
+        user_ids = [3, 17, 42, 1000, 123456789]
+        for uid in user_ids:
+            seed_user(uid)
+        summary = cohort_analytics.run_cohort()
+        assert summary["users"] == len(user_ids)
+
+        rows = cohort_analytics.load_cohort_metrics()
+        assert sorted(row["user_id"] for row in rows) == user_ids
+        assert_matches_per_user_stats(rows)
+        assert {row["meals_30d"] for row in rows} != {0}
+
+    def test_user_without_events(self, db):
+        database.add_user(5, "idle")
+        cohort_analytics.run_cohort()
+        (row,) = cohort_analytics.load_cohort_metrics()
+        assert row["carnivore_compliance"] == 100.0
+        assert row["weight_trend"] == "insufficient data"
+        assert row["meals_30d"] == 0
+        assert_matches_per_user_stats([row])
+
+    def test_rows_without_user_are_skipped(self, db):
+        seed_user(10)
+        add_meal(4, 1)
+        add_meal(99, 1)
+        cohort_analytics.run_cohort()
+        assert [row["user_id"] for row in cohort_analytics.load_cohort_metrics()] == [10]
+
+    def test_rerun_replaces_snapshot(self, db):
+        seed_user(7)
+        cohort_analytics.run_cohort()
+        add_meal(7, 0, level="not_carnivore")
+        first = cohort_analytics.load_cohort_metrics()[0]["carnivore_compliance"]
+        cohort_analytics.run_cohort()
+        rows = cohort_analytics.load_cohort_metrics()
+        assert len(rows) == 1
+        assert rows[0]["carnivore_compliance"] < first
+        assert_matches_per_user_stats(rows)
+
+
+class TestUserMetrics:
+    def test_weight_trend_uses_newest_minus_oldest(self):
+        values = cohort_analytics.user_metrics(None, [], [], [], [(1, 84.0), (1, 85.0), (1, 86.0)], NOW)
+        assert values["weight_trend"] == "losing (-2.0 kg)"
+        assert values["days_on_protocol"] == 0
+
+    def test_electrolyte_risk_counts_only_electrolyte_symptoms(self):
+        symptoms = [(1, "cramps", 5), (1, "headache", 5), (1, "low_energy", 5), (1, "dizziness", 1)]
+        assert cohort_analytics.user_metrics(None, [], symptoms, [], [], NOW)["electrolyte_risk"] == "medium"
+        symptoms.append((1, "weakness", 5))
+        assert cohort_analytics.user_metrics(None, [], symptoms, [], [], NOW)["electrolyte_risk"] == "high"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
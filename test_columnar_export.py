@@ -0,0 +1,116 @@
+import json
+import zipfile
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+
+import columnar_export
+from columnar_export import decode_strings, encode_column, encode_strings, export_columnar, read_table
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    import database
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "columnar.db"))
+    database.init_db()
+    now = datetime(2025, 6, 1, 12, 0)
+    for user_id in (1, 2):
+        database.add_user(user_id, f"user{user_id}")
+        for i in range(5):
+            database.add_meal_event(
+                user_id=user_id, dt=now - timedelta(days=i), ingredients=["beef", "ovo"], quantities=["200g"],
+                carnivore_level="strict" if i % 2 else "relaxed", breaks_fast=True, warnings=[],
+                calories=500 + i, protein_g=40, fat_g=30, summary=f"Refeição {i} ção", source="text",
+            )
+        database.add_weight(user_id, now, 80.5 + user_id)
+        database.add_symptom(user_id, now, "cramps", 3, "")
+        database.start_fast(user_id, now)
+    return tmp_path
+
+
+class TestEncoding:
+    def test_strings_roundtrip(self):
+        values = ["", "picanha", "salmão", "a" * 1000]
+        offsets, data = encode_strings(values)
+        assert offsets.dtype == np.int64 and data.dtype == np.uint8
+        assert offsets[-1] == len(data)
+        assert decode_strings(offsets, data) == values
+
+    def test_dictionary_encoding_for_repeated_strings(self):
+        arrays = encode_column(["strict"] * 10 + ["relaxed"] * 10, "string")
+        assert set(arrays) == {"codes", "dict.offsets", "dict.data"}
+        assert arrays["codes"].dtype == np.int32
+
+    def test_plain_encoding_for_unique_strings(self):
+        arrays = encode_column([f"nota {i}" for i in range(10)], "string")
+        assert set(arrays) == {"offsets", "data"}
+
+    def test_nulls_get_validity_mask(self):
+        arrays = encode_column([1, None, 3], "int")
+        assert arrays[""].tolist() == [1, 0, 3]
+        assert arrays["valid"].tolist() == [True, False, True]
+        assert "valid" not in encode_column([1.0, 2.0], "float")
+        assert np.isnat(encode_column(["2025-01-01T10:00:00", None], "datetime")[""][1])
+
+
+class TestExport:
+    def test_whole_database_roundtrip(self, db):
+        path = str(db / "all.npz")
+        stats = export_columnar(path, chunk_rows=4)
+        assert stats["meal_events"] == {"rows": 10, "chunks": 3}
+        assert stats["fasting_events"]["rows"] == 2
+
+        meals = read_table(path, "meal_events")
+        assert len(meals["id"]) == 10
+        assert meals["calories"].dtype == np.float64
+        assert meals["datetime"].dtype == np.dtype("datetime64[us]")
+        assert meals["summary"][0] == "Refeição 0 ção"
+        assert json.loads(meals["ingredients"][0]) == ["beef", "ovo"]
+        assert sorted(set(meals["carnivore_level"])) == ["relaxed", "strict"]
+
+        fasts = read_table(path, "fasting_events")
+        assert np.isnat(fasts["end_time"]).all()
+
+    def test_per_user_and_since(self, db):
+        path = str(db / "user.npz")
+        export_columnar(path, user_id=2, since="2025-05-30")
+        meals = read_table(path, "meal_events", ["user_id", "calories"])
+        assert set(meals) == {"user_id", "calories"}
+        assert meals["user_id"].tolist() == [2, 2, 2]
+        assert read_table(path, "weight_events")["weight_kg"].tolist() == [82.5]
+
+    def test_archive_is_plain_npz(self, db):
+        path = str(db / "plain.npz")
+        export_columnar(path, tables=["weight_events"])
+        with zipfile.ZipFile(path) as archive:
+            assert all(i.compress_type == zipfile.ZIP_DEFLATED for i in archive.infolist())
+        with np.load(path) as npz:
+            assert "weight_events/00000/weight_kg" in npz.files
+        assert columnar_export.read_schema(path)["tables"]["weight_events"]["rows"] == 2
+
+    def test_empty_table(self, db):
+        import database
+        path = str(db / "empty.npz")
+        export_columnar(path, user_id=99)
+        meals = read_table(path, "meal_events")
+        assert len(meals["calories"]) == 0 and len(meals["summary"]) == 0
+        assert database.get_period_totals(99)["meal_count"] == 0
+
+    def test_sharded_ids_repeat_but_user_and_id_are_unique(self, monkeypatch, tmp_path):
+        import database
+        monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "columnar.db"))
+        monkeypatch.setattr(database, "DB_SHARDS", 2)
+        database.init_db()
+        # users 1 and 4 land in different shards
+        for user_id in (1, 4):
+            database.add_weight(user_id, datetime(2025, 6, 1), 80.0 + user_id)
+        path = str(tmp_path / "sharded.npz")
+        export_columnar(path, tables=["weight_events"])
+
+        weights = read_table(path, "weight_events")
+        assert weights["id"].tolist() == [1, 1]
+        assert sorted(zip(weights["user_id"].tolist(), weights["id"].tolist())) == [(1, 1), (4, 1)]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
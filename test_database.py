@@ -185,6 +185,7 @@ class TestDailyStats:
         assert stats["total_calories"] == 0
         assert stats["meal_count"] == 0
         assert stats["carnivore_compliance"] == 100.0
+        assert stats["fat_protein_ratio"] is None
     
     def test_daily_stats_compliance(self):
         import database
@@ -206,6 +207,147 @@ class TestDailyStats:
         assert stats["carnivore_compliance"] == 50.0
 
 
+
+class TestMealModels:
+    def test_models_and_batch_match_dicts(self):
+        import database
+        from carnivore_core import CarnivoreLevel
+        database.add_user(600, "modeluser")
+        base = datetime(2025, 4, 1, 12, 0)
+        for i in range(5):
+            database.add_meal_event(
+                user_id=600, dt=base + timedelta(days=i // 2, hours=i), ingredients=["beef"], quantities=["200g"],
+                carnivore_level="strict" if i % 2 == 0 else "relaxed", breaks_fast=True, warnings=[],
+                calories=500 + i, protein_g=40, fat_g=30, summary=f"Meal {i}", source="text",
+            )
+
+        models = list(database.iter_meal_models(600, batch_size=2))
+        dicts = list(database.iter_meal_events(600))
+        assert [m.id for m in models] == [d["id"] for d in dicts]
+        assert models[1].carnivore_level == CarnivoreLevel.RELAXED
+
+        batch = database.load_meal_batch(600, "2025-04-02")
+        assert len(batch) == 3
+        assert batch.totals()["total_calories"] == sum(d["calories"] for d in dicts[2:])
+        assert len(database.load_meal_batch(600)) == 5
+
+
+class TestDailyStatsCache:
+    def _meal(self, user_id, dt, level="strict", ingredients=("beef",), calories=500, protein=40, fat=30):
+        import database
+        database.add_meal_event(
+            user_id=user_id, dt=dt, ingredients=list(ingredients), quantities=["200g"] * len(ingredients),
+            carnivore_level=level, breaks_fast=True, warnings=[],
+            calories=calories, protein_g=protein, fat_g=fat, summary="Meal", source="text",
+        )
+
+    def _fresh(self, user_id, date):
+        import database
+        database.get_daily_stats_cache().clear()
+        return database.get_daily_stats(user_id, date)
+
+    def test_writes_update_cached_entry_in_place(self):
+        import database
+        cache = database.get_daily_stats_cache()
+        day = datetime(2025, 5, 1, 12, 0)
+        date = "2025-05-01"
+        self._meal(500, day)
+        database.get_daily_stats(500, date)
+        assert cache.misses == 1
+
+        self._meal(500, day.replace(hour=7), level="relaxed", ingredients=("eggs", "butter"), calories=300)
+        self._meal(500, day.replace(hour=20), ingredients=("beef",), calories=700)
+        cached = database.get_daily_stats(500, date)
+        assert cache.hits == 1 and cache.misses == 1
+
+        fresh = self._fresh(500, date)
+        assert sorted(cached.pop("unique_ingredients")) == sorted(fresh.pop("unique_ingredients"))
+        assert cached == fresh
+        assert cached["first_meal_time"] == "07:00" and cached["last_meal_time"] == "20:00"
+        assert cached["meal_count"] == 3
+
+    def test_other_days_and_users_untouched(self):
+        import database
+        day = datetime(2025, 5, 2, 12, 0)
+        self._meal(501, day)
+        before = database.get_daily_stats(501, "2025-05-02")
+        self._meal(501, day + timedelta(days=1))
+        self._meal(502, day)
+        assert database.get_daily_stats(501, "2025-05-02") == before
+        assert database.get_daily_stats(501, "2025-05-03")["meal_count"] == 1
+
+    def test_lru_eviction(self):
+        import database
+        cache = database.DailyStatsCache(maxsize=2)
+        for user_id in (1, 2, 3):
+            cache.put(("db", user_id, "2025-05-01"), database.DayAggregate(), cache.generation)
+        assert len(cache) == 2
+        assert cache.get(("db", 1, "2025-05-01"), (0, 0)) is None
+        assert cache.get(("db", 3, "2025-05-01"), (0, 0)) is not None
+
+    def test_load_racing_a_write_is_not_stored(self):
+        import database
+        cache = database.DailyStatsCache()
+        generation = cache.generation
+        cache.record_meal(("db", 1, "2025-05-01"), 1, "12:00", [], "strict", 1.0, 1.0, 1.0)
+        cache.put(("db", 1, "2025-05-01"), database.DayAggregate(), generation)
+        assert len(cache) == 0
+
+    def test_load_after_commit_is_not_counted_twice(self):
+        import database
+        self._meal(504, datetime(2025, 5, 6, 12, 0))
+        database.get_daily_stats(504, "2025-05-06")
+        # the load between add_meal_event's commit and its record_meal already saw the meal
+        meal_id = database.get_meal_events(504, "2025-05-06")[0]["id"]
+        database.get_daily_stats_cache().record_meal(
+            (database.get_db_path(504), 504, "2025-05-06"), meal_id, "12:00", ["beef"], "strict", 500.0, 40.0, 30.0)
+        assert database.get_daily_stats(504, "2025-05-06")["meal_count"] == 1
+
+    def _insert_elsewhere(self, user_id, dt):
+        # another worker's INSERT never reaches this process's cache
+        import sqlite3
+        import database
+        conn = sqlite3.connect(database.get_db_path(user_id))
+        conn.execute(
+            """INSERT INTO meal_events (user_id, datetime, ingredients, quantities, carnivore_level,
+                                        breaks_fast, warnings, calories, protein_g, fat_g, carbs_g)
+               VALUES (?, ?, '["eggs"]', '["3"]', 'strict', 1, '[]', 200, 18, 15, 0)""", (user_id, dt))
+        conn.commit()
+        conn.close()
+
+    def test_write_from_another_process_reloads(self, monkeypatch):
+        import database
+        monkeypatch.setattr(database, "DAILY_STATS_RECHECK_SECONDS", 0)
+        cache = database.get_daily_stats_cache()
+        self._meal(505, datetime(2025, 5, 7, 12, 0))
+        assert database.get_daily_stats(505, "2025-05-07")["meal_count"] == 1
+        self._insert_elsewhere(505, "2025-05-07T19:00:00")
+
+        stale = cache.stale
+        stats = database.get_daily_stats(505, "2025-05-07")
+        assert cache.stale == stale + 1
+        assert stats["meal_count"] == 2 and stats["last_meal_time"] == "19:00"
+        assert stats == self._fresh(505, "2025-05-07")
+
+    def test_recheck_interval(self, monkeypatch):
+        import database
+        monkeypatch.setattr(database, "DAILY_STATS_RECHECK_SECONDS", 3600)
+        self._meal(506, datetime(2025, 5, 8, 12, 0))
+        assert database.get_daily_stats(506, "2025-05-08")["meal_count"] == 1
+        self._insert_elsewhere(506, "2025-05-08T19:00:00")
+        assert database.get_daily_stats(506, "2025-05-08")["meal_count"] == 1
+
+        monkeypatch.setattr(database, "DAILY_STATS_RECHECK_SECONDS", 0)
+        assert database.get_daily_stats(506, "2025-05-08")["meal_count"] == 2
+
+    def test_prefix_queries_bypass_cache(self):
+        import database
+        self._meal(503, datetime(2025, 5, 4, 12, 0))
+        assert database.get_daily_stats(503, "2025-05")["meal_count"] == 1
+        self._meal(503, datetime(2025, 5, 5, 12, 0))
+        assert database.get_daily_stats(503, "2025-05")["meal_count"] == 2
+
+
 class TestFastingEvents:
     def test_start_and_end_fast(self):
         import database
@@ -423,5 +565,173 @@ class TestVoiceNotes:
         assert notes[0]["food_detected"] == 1
 
 
+class TestPeriodExports:
+    def _add_meals(self, user_id, days_ago):
+        import database
+        now = datetime.now()
+        for i, days in enumerate(days_ago):
+            database.add_meal_event(
+                user_id=user_id, dt=now - timedelta(days=days), ingredients=["beef"], quantities=["200g"],
+                carnivore_level="strict" if i % 2 == 0 else "relaxed", breaks_fast=True, warnings=[],
+                calories=500, protein_g=50, fat_g=30, summary=f"Meal {i}", source="text",
+            )
+
+    def test_period_start(self):
+        import database
+        now = datetime(2025, 3, 10, 12, 0)
+        assert database.period_start("daily", now) == "2025-03-10"
+        assert database.period_start("weekly", now) == "2025-03-03T12:00:00"
+        assert database.period_start("all", now) is None
+        with pytest.raises(ValueError):
+            database.period_start("decade", now)
+
+    def test_iter_meal_events_streams_in_order(self):
+        import database
+        database.add_user(1100, "streamuser")
+        self._add_meals(1100, [400, 40, 3, 0])
+
+        meals = list(database.iter_meal_events(1100, batch_size=2))
+        assert [m["summary"] for m in meals] == ["Meal 0", "Meal 1", "Meal 2", "Meal 3"]
+        assert meals[0].keys() == database.get_meal_events(1100, meals[-1]["datetime"][:10])[0].keys()
+
+        monthly = list(database.iter_meal_events(1100, database.period_start("monthly")))
+        assert [m["summary"] for m in monthly] == ["Meal 2", "Meal 3"]
+
+    def test_period_totals(self):
+        import database
+        database.add_user(1101, "totalsuser")
+        self._add_meals(1101, [400, 40, 3, 0])
+
+        totals = database.get_period_totals(1101, database.period_start("yearly"))
+        assert totals["meal_count"] == 3
+        assert totals["total_calories"] == 1500
+        assert totals["carnivore_compliance"] == pytest.approx(100 / 3)
+        assert database.get_period_totals(1101)["meal_count"] == 4
+        assert database.get_period_totals(9999)["carnivore_compliance"] == 100.0
+
+
+
+class TestPeriodRollups:
+    def _seed(self, user_id, now):
+        import database
+        database.add_user(user_id, "rollupuser")
+        for days_ago, hour, level in [(40, 12, "strict"), (10, 8, "strict"), (10, 19, "relaxed"), (2, 12, "strict")]:
+            database.add_meal_event(
+                user_id=user_id, dt=(now - timedelta(days=days_ago)).replace(hour=hour), ingredients=["beef"],
+                quantities=["200g"], carnivore_level=level, breaks_fast=True, warnings=[],
+                calories=600, protein_g=50, fat_g=40, summary="Bife", source="text",
+            )
+        database.add_weight(user_id, now - timedelta(days=20), 90.0)
+        database.add_weight(user_id, now - timedelta(days=1), 88.5)
+        database.add_symptom(user_id, now - timedelta(days=3), "headache", 2)
+        database.start_fast(user_id, now - timedelta(days=5, hours=16))
+        database.end_fast(user_id, now - timedelta(days=5))
+
+    def test_daily_rollups(self):
+        import database
+        now = datetime.now().replace(minute=0, second=0, microsecond=0)
+        self._seed(1200, now)
+
+        days = database.get_daily_rollups(1200, database.period_start("monthly", now))
+        assert [d["meals"] for d in days] == [2, 1]
+        assert days[0] == {
+            "date": (now - timedelta(days=10)).strftime('%Y-%m-%d'), "meals": 2, "calories": 1200,
+            "protein": 100, "fat": 80, "carbs": 0, "strict": 1,
+        }
+        assert len(database.get_daily_rollups(1200)) == 3
+
+    def test_period_summary(self):
+        import database
+        now = datetime.now().replace(minute=0, second=0, microsecond=0)
+        self._seed(1201, now)
+
+        summary = database.get_period_summary(1201, "monthly", now)
+        assert summary["start_date"] == (now - timedelta(days=30)).strftime('%Y-%m-%d')
+        assert summary["end_date"] == now.strftime('%Y-%m-%d')
+        assert summary["days_tracked"] == 2
+        assert summary["total_meals"] == 3
+        assert summary["avg_daily_calories"] == 900
+        assert summary["compliance"] == pytest.approx(66.7)
+        assert summary["weight_change"] == -1.5
+        assert summary["fasts_completed"] == 1
+        assert summary["total_fasting_hours"] == pytest.approx(16.0)
+        assert summary["top_symptoms"] == [("headache", 1)]
+
+        yearly = database.get_period_summary(1201, "yearly", now)
+        assert yearly["total_meals"] == 4
+        assert len(yearly["daily_rollups"]) == 3
+
+    def test_period_summary_empty(self):
+        import database
+        summary = database.get_period_summary(9999, "yearly")
+        assert summary["total_meals"] == 0
+        assert summary["compliance"] == 100.0
+        assert summary["daily_rollups"] == [] and summary["daily_weights"] == []
+
+
+class TestShardedStorage:
+    @pytest.fixture
+    def sharded(self, monkeypatch, tmp_path):
+        import database
+        monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "sharded.db"))
+        monkeypatch.setattr(database, "DB_SHARDS", 4)
+        database.init_db()
+        return tmp_path
+    
+    def test_shard_files_created(self, sharded):
+        for shard in range(4):
+            assert (sharded / f"sharded.shard{shard}.db").exists()
+        assert not (sharded / "sharded.db").exists()
+    
+    def test_routing_is_transparent(self, sharded):
+        import database
+        now = datetime.now()
+        for user_id in range(1200, 1220):
+            database.add_user(user_id, f"user{user_id}")
+            database.set_goals(user_id, 2000, user_id, 100)
+            database.add_meal_event(
+                user_id=user_id, dt=now, ingredients=["beef"], quantities=["200g"],
+                carnivore_level="strict", breaks_fast=True, warnings=[],
+                calories=500, protein_g=50, fat_g=35, summary="Beef", source="text",
+            )
+        
+        for user_id in range(1200, 1220):
+            assert database.get_goals(user_id)["protein"] == user_id
+            assert database.get_daily_stats(user_id, now.strftime('%Y-%m-%d'))["meal_count"] == 1
+    
+    def test_user_lives_in_one_shard(self, sharded):
+        import sqlite3
+        import database
+        database.add_user(1300, "shardeduser")
+        
+        holders = []
+        for path in database.iter_shard_paths():
+            conn = sqlite3.connect(path)
+            if conn.execute("SELECT 1 FROM users WHERE user_id = 1300").fetchone():
+                holders.append(path)
+            conn.close()
+        assert holders == [database.get_db_path(1300)]
+    
+    def test_connection_requires_user_id(self, sharded):
+        import database
+        with pytest.raises(ValueError):
+            database.get_connection()
+    
+    def test_cross_shard_iterators(self, sharded):
+        import database
+        for user_id in range(1400, 1410):
+            database.add_user(user_id, f"user{user_id}")
+            database.add_weight(user_id, datetime.now(), 80.0 + user_id - 1400)
+        
+        assert database.get_all_user_ids() == list(range(1400, 1410))
+        weights = sorted(r[0] for r in database.iter_table_rows("weight_events", "weight_kg", batch_size=3))
+        assert weights == [80.0 + i for i in range(10)]
+    
+    def test_iterator_rejects_unknown_table(self, sharded):
+        import database
+        with pytest.raises(ValueError):
+            list(database.iter_table_rows("sqlite_master"))
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import pytest
+import llm_backends
+import llm_parsing
+from llm_backends import FakeBackend, TaskConfig
+
+
+@pytest.fixture(autouse=True)
+def clean_breakers():
+    llm_backends.reset_breakers()
+    yield
+    llm_backends.reset_breakers()
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setitem(llm_backends._backends, "fake", backend)
+    for task in list(llm_backends.TASKS):
+        monkeypatch.setitem(llm_backends.TASKS, task, TaskConfig("fake", f"{task}-model", 5.0))
+    return backend
+
+
+class RecordingBackend(llm_backends.LLMBackend):
+    name = "recording"
+
+    def __init__(self):
+        self.calls = []
+
+    def chat(self, task, prompt, model, timeout, format=None):
+        self.calls.append((task, model, timeout, format))
+        return "ok"
+
+
+class TestRouting:
+    def test_per_task_model_and_timeout(self, monkeypatch):
+        recording = RecordingBackend()
+        monkeypatch.setitem(llm_backends._backends, "recording", recording)
+        monkeypatch.setitem(llm_backends.TASKS, "extract", TaskConfig("recording", "small", 10.0))
+        monkeypatch.setitem(llm_backends.TASKS, "plan", TaskConfig("recording", "big", 120.0))
+
+        llm_backends.complete("extract", "x", format="json")
+        llm_backends.complete("plan", "y")
+        assert recording.calls == [("extract", "small", 10.0, "json"), ("plan", "big", 120.0, None)]
+
+    def test_env_overrides(self, monkeypatch):
+        monkeypatch.setenv("LLM_BACKEND", "fake")
+        monkeypatch.setenv("LLM_GURU_MODEL", "tiny")
+        monkeypatch.setenv("LLM_GURU_TIMEOUT", "7.5")
+        config = llm_backends._task_config("guru", "ollama", 45)
+        assert config == TaskConfig("fake", "tiny", 7.5)
+
+    @pytest.mark.parametrize("backend, model", [
+        ("gemini", llm_backends.GEMINI_MODEL),
+        ("ollama", llm_backends.llm_client.OLLAMA_MODEL),
+    ])
+    def test_global_backend_picks_its_model(self, monkeypatch, backend, model):
+        monkeypatch.setenv("LLM_BACKEND", backend)
+        monkeypatch.setattr(llm_backends, "TASKS", llm_backends._build_tasks())
+        assert {config.backend for config in llm_backends.TASKS.values()} == {backend}
+        assert {config.model for config in llm_backends.TASKS.values()} == {model}
+
+    def test_per_task_backend_picks_its_model(self, monkeypatch):
+        monkeypatch.setenv("LLM_VISION_BACKEND", "ollama")
+        monkeypatch.setattr(llm_backends, "TASKS", llm_backends._build_tasks())
+        assert llm_backends.TASKS["vision"].model == llm_backends.llm_client.OLLAMA_MODEL
+        assert llm_backends.TASKS["extract"].model == llm_backends.llm_client.OLLAMA_MODEL
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            llm_backends.get_backend("nope")
+
+    def test_vision_not_supported(self, monkeypatch):
+        monkeypatch.setitem(llm_backends._backends, "recording", RecordingBackend())
+        monkeypatch.setitem(llm_backends.TASKS, "vision", TaskConfig("recording", "m", 1.0))
+        with pytest.raises(NotImplementedError):
+            llm_backends.analyze_image("vision", "p", "img.jpg")
+
+
+class TestFakeBackend:
+    def test_meal_reply_is_valid(self, fake):
+        reply = llm_backends.complete("extract", "comi picanha", format=llm_parsing.OLLAMA_JSON_FORMAT)
+        parsed, errors = llm_parsing.parse_meal_reply(reply)
+        assert errors == []
+        assert parsed["ingredients"][0] == "picanha"
+
+    def test_recipe_and_vision_are_json(self, fake):
+        assert json.loads(llm_backends.complete("recipe", "x"))["name"]
+        assert json.loads(llm_backends.analyze_image("vision", "x", "img.jpg"))["carnivore_level"] == "strict"
+        assert fake.calls == {"recipe": 1, "vision": 1}
+
+    def test_failure_rate(self, fake):
+        fake.failure_rate = 1.0
+        with pytest.raises(ConnectionError):
+            llm_backends.complete("suggest", "x")
+
+    def test_timeout(self, fake, monkeypatch):
+        fake.latency = 0.2
+        monkeypatch.setitem(llm_backends.TASKS, "plan", TaskConfig("fake", "m", 0.01))
+        with pytest.raises(TimeoutError):
+            llm_backends.complete("plan", "x")
+
+    def test_deterministic(self):
+        a = FakeBackend(failure_rate=0.5, seed=3)
+        b = FakeBackend(failure_rate=0.5, seed=3)
+
+        def outcomes(backend):
+            result = []
+            for _ in range(20):
+                try:
+                    backend.chat("suggest", "x", "m", None)
+                    result.append(True)
+                except ConnectionError:
+                    result.append(False)
+            return result
+
+        assert outcomes(a) == outcomes(b)
+        assert True in outcomes(a) and False in outcomes(a)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = llm_backends.CircuitBreaker("x", failure_threshold=2, reset_timeout=10, clock=FakeClock())
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+        assert breaker.snapshot()["rejected"] == 1
+
+    def test_success_resets_count(self):
+        breaker = llm_backends.CircuitBreaker("x", failure_threshold=2, clock=FakeClock())
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+
+    def test_half_open_single_probe(self):
+        clock = FakeClock()
+        breaker = llm_backends.CircuitBreaker("x", failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow()
+        assert breaker.state == "half_open"
+        assert not breaker.allow()
+
+        breaker.record_failure()
+        assert breaker.state == "open"
+        clock.now = 20
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.allow()
+
+    def test_complete_fails_fast_when_open(self, fake):
+        fake.failure_rate = 1.0
+        for _ in range(llm_backends.BREAKER_FAILURES):
+            with pytest.raises(ConnectionError):
+                llm_backends.complete("suggest", "x")
+        with pytest.raises(llm_backends.CircuitOpenError):
+            llm_backends.complete("extract", "x")
+        assert fake.calls["suggest"] == llm_backends.BREAKER_FAILURES
+        assert "extract" not in fake.calls
+        assert llm_backends.breaker_states()["fake"]["state"] == "open"
+
+    def test_slow_calls_count_as_failures(self, fake, monkeypatch):
+        fake.latency = 0.02
+        monkeypatch.setitem(llm_backends.TASKS, "suggest", TaskConfig("fake", "m", 0.02))
+        for _ in range(llm_backends.BREAKER_FAILURES):
+            assert llm_backends.complete("suggest", "x")
+        assert llm_backends.get_breaker("fake").state == "open"
+
+
+class TestDeadlines:
+    def test_acomplete(self, fake):
+        assert asyncio.run(llm_backends.acomplete("suggest", "x")) == "Picanha com manteiga e sal."
+
+    def test_deadline_does_not_wait_for_backend(self, monkeypatch):
+        class HangingBackend(llm_backends.LLMBackend):
+            def chat(self, task, prompt, model, timeout, format=None):
+                import time
+                time.sleep(0.5)
+                return "late"
+
+        monkeypatch.setitem(llm_backends._backends, "hang", HangingBackend())
+        monkeypatch.setitem(llm_backends.TASKS, "plan", TaskConfig("hang", "m", 0.05))
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            with pytest.raises(TimeoutError):
+                await llm_backends.acomplete("plan", "x")
+            return loop.time() - start
+
+        assert asyncio.run(run()) < 0.4
+        assert llm_backends.get_breaker("hang").failures >= 1
+
+    def test_aanalyze_image(self, fake):
+        reply = asyncio.run(llm_backends.aanalyze_image("vision", "x", "img.jpg"))
+        assert json.loads(reply)["identified_foods"] == ["steak"]
+
+
+class TestOllamaBackend:
+    def test_delegates_to_llm_client(self, monkeypatch):
+        import llm_client
+        calls = []
+        monkeypatch.setattr(llm_client, "chat", lambda *a, **kw: calls.append((a, kw)) or "ok")
+
+        backend = llm_backends.OllamaBackend()
+        assert backend.chat("suggest", "p", "mistral", 30.0) == "ok"
+        backend.vision("vision", "p", "img.jpg", "llava", 20.0)
+        assert calls[0] == (("suggest", "p"), {"format": None, "model": "mistral", "timeout": 30.0})
+        assert calls[1][1]["images"] == ["img.jpg"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
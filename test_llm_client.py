@@ -0,0 +1,91 @@
+import pytest
+import llm_client
+import metrics
+
+
+class FakeOllama:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def chat(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.fail:
+            raise ConnectionError("down")
+        return {
+            "message": {"role": "assistant", "content": "ok"},
+            "prompt_eval_duration": 200_000_000,
+            "prompt_eval_count": 40,
+            "eval_duration": 1_500_000_000,
+            "eval_count": 90,
+            "load_duration": 0,
+        }
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeOllama()
+    monkeypatch.setattr(llm_client, "ollama", fake)
+    metrics.reset()
+    return fake
+
+
+class TestChat:
+    def test_stable_prefix_and_options(self, fake):
+        llm_client.chat("suggest", "primeiro")
+        llm_client.chat("suggest", "segundo")
+
+        first, second = fake.calls
+        assert first["messages"][0] is second["messages"][0] is llm_client.SYSTEM_MESSAGE
+        assert first["options"] == second["options"] == llm_client.TASK_OPTIONS["suggest"]
+        assert first["keep_alive"] == llm_client.KEEP_ALIVE
+        assert first["messages"][1] == {"role": "user", "content": "primeiro"}
+        assert "format" not in first
+
+    def test_all_tasks_share_context_size(self):
+        assert len({opts["num_ctx"] for opts in llm_client.TASK_OPTIONS.values()}) == 1
+
+    def test_format_passed_through(self, fake):
+        assert llm_client.chat("extract", "x", format="json") == "ok"
+        assert fake.calls[0]["format"] == "json"
+        assert fake.calls[0]["options"]["temperature"] == 0.0
+
+    def test_unknown_task(self, fake):
+        with pytest.raises(KeyError):
+            llm_client.chat("nope", "x")
+
+
+class TestDurations:
+    def test_recorded_in_metrics(self, fake):
+        llm_client.chat("recipe", "x")
+        snap = metrics.snapshot()
+        assert snap["llm.recipe.prompt_eval"]["max"] == pytest.approx(0.2)
+        assert snap["llm.recipe.eval"]["max"] == pytest.approx(1.5)
+        assert snap["llm.recipe.load"]["count"] == 1
+
+    def test_missing_fields(self):
+        metrics.reset()
+        assert llm_client.record_durations("plan", {"message": {}}) == {}
+        assert "llm.plan.eval" not in metrics.snapshot()
+
+    def test_subscriptable_response(self):
+        from ollama._types import ChatResponse
+        response = ChatResponse(model="m", message={"role": "assistant", "content": "x"}, eval_duration=10**9)
+        assert llm_client.record_durations("guru", response) == {"eval": 1.0}
+
+
+class TestWarmup:
+    def test_warmup_loads_prefix(self, fake):
+        assert llm_client.warmup() is True
+        call = fake.calls[0]
+        assert call["messages"][0] is llm_client.SYSTEM_MESSAGE
+        assert call["options"]["num_predict"] == 1
+        assert call["options"]["num_ctx"] == llm_client.NUM_CTX
+
+    def test_warmup_unreachable(self, monkeypatch):
+        monkeypatch.setattr(llm_client, "ollama", FakeOllama(fail=True))
+        assert llm_client.warmup() is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
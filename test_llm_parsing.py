@@ -0,0 +1,165 @@
+import pytest
+from llm_parsing import (
+    find_json_object,
+    iter_balanced_objects,
+    validate_against_schema,
+    normalize_meal_output,
+    parse_json_reply,
+    parse_meal_reply,
+    get_parse_stats,
+    get_parse_failure_rate,
+    reset_parse_stats,
+    fallback_meal_from_text,
+)
+from carnivore_core import MEAL_SCHEMA
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    reset_parse_stats()
+    yield
+    reset_parse_stats()
+
+
+class TestFindJsonObject:
+    def test_plain_json(self):
+        assert find_json_object('{"a": 1}') == {"a": 1}
+
+    def test_markdown_fence(self):
+        text = 'Aqui está:\n```json\n{"summary": "Bife", "calories": 500}\n```\nBom apetite!'
+        assert find_json_object(text) == {"summary": "Bife", "calories": 500}
+
+    def test_prose_before_and_after(self):
+        text = 'Claro! {"is_food": false} Espero ter ajudado.'
+        assert find_json_object(text) == {"is_food": False}
+
+    def test_nested_objects(self):
+        text = 'x {"macros": {"protein": 50, "fat": {"sat": 10}}} y'
+        assert find_json_object(text) == {"macros": {"protein": 50, "fat": {"sat": 10}}}
+
+    def test_braces_inside_strings(self):
+        text = '{"summary": "bife {grande} com \\"sal\\" }"}'
+        assert find_json_object(text) == {"summary": 'bife {grande} com "sal" }'}
+
+    def test_skips_invalid_candidate(self):
+        text = 'Formato {nome da receita} -> {"name": "Picanha"}'
+        assert find_json_object(text) == {"name": "Picanha"}
+
+    def test_trailing_comma_repaired(self):
+        assert find_json_object('{"ingredients": ["beef", "eggs",],}') == {"ingredients": ["beef", "eggs"]}
+
+    def test_no_object(self):
+        assert find_json_object("Não sei responder.") is None
+        assert find_json_object("") is None
+
+    def test_unbalanced(self):
+        assert find_json_object('{"a": 1') is None
+
+    def test_iter_balanced_objects(self):
+        assert list(iter_balanced_objects('{"a": 1} and {"b": {"c": 2}}')) == ['{"a": 1}', '{"b": {"c": 2}}']
+
+
+class TestSchemaValidation:
+    def test_valid_meal(self):
+        output = {"summary": "Steak", "ingredients": ["steak"], "calories": 500, "macros": {"protein": 40, "fat": 30}}
+        assert validate_against_schema(output, MEAL_SCHEMA) == []
+
+    def test_missing_required(self):
+        errors = validate_against_schema({"summary": "Steak"}, MEAL_SCHEMA)
+        assert any("ingredients" in e for e in errors)
+        assert any("calories" in e for e in errors)
+
+    def test_wrong_types(self):
+        output = {"summary": 1, "ingredients": "steak", "calories": "500", "macros": {}}
+        errors = validate_against_schema(output, MEAL_SCHEMA)
+        assert len(errors) == 3
+
+    def test_negative_macro(self):
+        output = {"summary": "S", "ingredients": [], "calories": 10, "macros": {"protein": -1}}
+        errors = validate_against_schema(output, MEAL_SCHEMA)
+        assert errors == ["'macros.protein' must be >= 0"]
+
+    def test_bool_is_not_number(self):
+        output = {"summary": "S", "ingredients": [], "calories": True, "macros": {}}
+        assert validate_against_schema(output, MEAL_SCHEMA) == ["'calories' must be of type number"]
+
+    def test_normalize_meal_output(self):
+        normalized = normalize_meal_output({"protein_g": 50, "fat_g": 40})
+        assert normalized["macros"] == {"protein": 50, "fat": 40, "carbs": 0}
+
+
+class TestParseMealReply:
+    def test_extraction_reply(self):
+        text = '''```json
+{"is_food": true, "summary": "Ovos com bacon", "ingredients": ["eggs", "bacon"],
+ "quantities": ["3", "100g"], "calories": 500, "protein_g": 30, "fat_g": 40, "carbs_g": 0}
+```'''
+        parsed, errors = parse_meal_reply(text)
+        assert errors == []
+        assert parsed["summary"] == "Ovos com bacon"
+        assert parsed["macros"]["fat"] == 40
+
+    def test_not_food(self):
+        parsed, errors = parse_meal_reply('{"is_food": false}')
+        assert parsed == {"is_food": False}
+        assert errors == []
+
+    def test_unparseable(self):
+        parsed, errors = parse_meal_reply("Desculpe, não entendi.")
+        assert parsed is None
+        assert errors
+
+
+class TestParseMetrics:
+    def test_failure_rate(self):
+        parse_json_reply('{"a": 1}', task="recipe")
+        parse_json_reply('{"a": 1}', task="recipe")
+        parse_json_reply('nada', task="recipe")
+        parse_json_reply('nada', task="vision")
+
+        stats = get_parse_stats()
+        assert stats["recipe"] == {"attempts": 3, "failures": 1}
+        assert get_parse_failure_rate("recipe") == pytest.approx(1 / 3)
+        assert get_parse_failure_rate() == pytest.approx(0.5)
+
+    def test_empty_rate(self):
+        assert get_parse_failure_rate() == 0.0
+
+
+class TestFallbackMealParser:
+    def test_grams_before_food(self):
+        meal = fallback_meal_from_text("comi 300g de picanha com sal")
+        assert meal["is_food"] and meal["fallback"]
+        assert meal["ingredients"] == ["picanha", "sal"]
+        assert meal["quantities"] == ["300g", "a gosto"]
+        assert meal["protein_g"] == 78
+        assert meal["carbs_g"] == 0
+        assert meal["confidence"] == "low"
+
+    def test_grams_after_food_and_kg(self):
+        assert fallback_meal_from_text("ribeye 400g")["quantities"] == ["400g"]
+        assert fallback_meal_from_text("1,2kg de costela")["quantities"] == ["1200g"]
+
+    def test_egg_count_and_cooking_fat(self):
+        meal = fallback_meal_from_text("3 ovos fritos na manteiga")
+        assert meal["quantities"] == ["3 un", "~10g"]
+        assert meal["fat_g"] == round(3 * 50 * 0.10 + 10 * 0.81)
+
+    def test_forbidden_listed_without_macros(self):
+        meal = fallback_meal_from_text("pão e café")
+        assert meal["forbidden_ingredients"] == ["pao"]
+        assert meal["calories"] == 0
+
+    def test_negated_food_ignored(self):
+        assert fallback_meal_from_text("ribeye sem pão")["forbidden_ingredients"] == []
+
+    def test_not_food(self):
+        assert fallback_meal_from_text("dormi mal hoje")["is_food"] is False
+
+    def test_validates_as_meal(self):
+        meal = normalize_meal_output(fallback_meal_from_text("200g de salmão"))
+        assert validate_against_schema(meal, MEAL_SCHEMA) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
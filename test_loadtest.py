@@ -0,0 +1,66 @@
+import asyncio
+import sys
+import pytest
+
+pytest.importorskip("telegram")
+
+from loadtest import StubConfig, run_load_test
+
+
+class TestLoadTestHarness:
+    def test_small_run(self, tmp_path):
+        config = StubConfig(llm_latency=0, vision_latency=0, whisper_latency=0)
+        result = asyncio.run(run_load_test(users=5, meals_per_user=2, stub_config=config, db_dir=str(tmp_path)))
+
+        assert result.errors == 0
+        assert result.updates == 5 * (2 + 3)
+        assert set(result.handlers) == {"process_meal_input", "stats_command", "metabolic_command", "export_command"}
+        assert result.handlers["process_meal_input"]["count"] == 10
+        assert result.stages["meal.db_write"]["count"] == 10
+        assert result.throughput > 0
+
+    def test_llm_failures_fall_back_to_parser(self, tmp_path):
+        config = StubConfig(llm_latency=0, llm_failure_rate=1.0)
+        result = asyncio.run(run_load_test(users=3, meals_per_user=2, stub_config=config, db_dir=str(tmp_path)))
+
+        assert result.errors == 0
+        # the breaker opens after the first failures; meals keep being recorded by the local parser
+        assert result.stages["meal.db_write"]["count"] >= 1
+
+    def test_report_format(self, tmp_path):
+        config = StubConfig(llm_latency=0)
+        result = asyncio.run(run_load_test(users=2, meals_per_user=1, stub_config=config, db_dir=str(tmp_path)))
+
+        text = result.format()
+        assert "throughput" in text
+        assert "stats_command" in text
+        assert result.to_dict()["updates"] == result.updates
+
+    def test_whisper_stub_removed_after_run(self, tmp_path):
+        before = sys.modules.get("faster_whisper")
+        config = StubConfig(llm_latency=0, whisper_latency=0)
+        asyncio.run(run_load_test(users=1, meals_per_user=1, stub_config=config, db_dir=str(tmp_path)))
+
+        assert sys.modules.get("faster_whisper") is before
+
+    def test_errors_keep_a_sample_per_handler(self, tmp_path, monkeypatch, caplog):
+        config = StubConfig(llm_latency=0)
+        asyncio.run(run_load_test(users=1, meals_per_user=1, stub_config=config, db_dir=str(tmp_path)))
+
+        async def broken(update, context):
+            raise RuntimeError("stats quebrado")
+
+        monkeypatch.setattr(sys.modules["bot"], "stats_command", broken)
+        with caplog.at_level("ERROR", logger="loadtest"):
+            result = asyncio.run(run_load_test(users=3, meals_per_user=1, stub_config=config, db_dir=str(tmp_path)))
+
+        assert result.errors == 3
+        assert result.error_samples == {"stats_command": "RuntimeError: stats quebrado"}
+        assert "stats quebrado" in result.format()
+        # logged once with its traceback, not once per failure
+        records = [r for r in caplog.records if r.name == "loadtest"]
+        assert len(records) == 1 and records[0].exc_info
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
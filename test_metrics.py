@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+import metrics
+from llm_parsing import parse_json_reply, reset_parse_stats
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.reset()
+    reset_parse_stats()
+    yield
+    metrics.reset()
+    reset_parse_stats()
+
+
+class TestHistogram:
+    def test_percentiles(self):
+        hist = metrics.Histogram("test")
+        for ms in range(1, 101):
+            hist.observe(ms / 1000)
+
+        snap = hist.snapshot()
+        assert snap["count"] == 100
+        assert snap["p50"] == pytest.approx(0.050)
+        assert snap["p95"] == pytest.approx(0.095)
+        assert snap["p99"] == pytest.approx(0.099)
+        assert snap["max"] == pytest.approx(0.100)
+
+    def test_empty(self):
+        snap = metrics.Histogram("empty").snapshot()
+        assert snap["count"] == 0
+        assert snap["p99"] == 0.0
+
+    def test_bounded_window(self):
+        hist = metrics.Histogram("window", max_samples=10)
+        for _ in range(100):
+            hist.observe(1.0)
+        for _ in range(10):
+            hist.observe(0.001)
+
+        assert hist.count == 110
+        assert hist.percentile(0.99) == 0.001
+
+
+class TestRecording:
+    def test_timed_context(self):
+        with metrics.timed("meal.validate"):
+            pass
+        assert metrics.snapshot()["meal.validate"]["count"] == 1
+
+    def test_timed_fn_sync(self):
+        @metrics.timed_fn("db.test")
+        def work(x):
+            return x * 2
+
+        assert work(21) == 42
+        assert metrics.snapshot()["db.test"]["count"] == 1
+
+    def test_timed_fn_async(self):
+        @metrics.timed_fn("meal.reply")
+        async def reply():
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        assert asyncio.run(reply()) == "ok"
+        snap = metrics.snapshot()["meal.reply"]
+        assert snap["count"] == 1
+        assert snap["p50"] >= 0.01
+
+    def test_timed_records_on_exception(self):
+        with pytest.raises(RuntimeError):
+            with metrics.timed("meal.llm_extract"):
+                raise RuntimeError("boom")
+        assert metrics.snapshot()["meal.llm_extract"]["count"] == 1
+
+
+class TestExport:
+    def test_render_text(self):
+        metrics.observe("meal.db_write", 0.002)
+        text = metrics.render_text()
+        assert "meal.db_write" in text
+        assert "p95" in text
+
+    def test_render_text_empty(self):
+        assert "Nenhuma" in metrics.render_text()
+
+    def test_render_prometheus(self):
+        metrics.observe("meal.transcribe", 1.5)
+        parse_json_reply("sem json", task="extract")
+        text = metrics.render_prometheus()
+
+        assert '# TYPE carnivore_stage_seconds summary' in text
+        assert 'carnivore_stage_seconds{stage="meal.transcribe",quantile="0.99"} 1.500000' in text
+        assert 'carnivore_stage_seconds_count{stage="meal.transcribe"} 1' in text
+        assert 'carnivore_llm_parse_failures_total{task="extract"} 1' in text
+
+    def test_dump(self, tmp_path):
+        metrics.observe("meal.reply", 0.1)
+        path = tmp_path / "carnivore.prom"
+        metrics.dump(str(path))
+        assert 'stage="meal.reply"' in path.read_text()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -1,6 +1,8 @@
 import pytest
 from datetime import datetime, timedelta
 from models import (
+    MEAL_EVENT_COLUMNS,
+    MealEventBatch,
     MealEvent,
     FastingEvent,
     SymptomEvent,
@@ -287,6 +289,73 @@ class TestDailyStats:
         assert stats.unique_ingredients == []
 
 
+MEAL_ROW = (7, 123, "2025-03-01T12:30:00", '["beef", "eggs"]', '["200g", "2"]', "strict", 1,
+            "[]", 600.0, 50.0, 40.0, 0.0, "Bife com ovos", "voice", "whole", 0)
+
+
+class TestFromRow:
+    def test_meal_from_row(self):
+        meal = MealEvent.from_row(MEAL_ROW)
+        assert meal.id == 7 and meal.user_id == 123
+        assert meal.datetime == datetime(2025, 3, 1, 12, 30)
+        assert meal.ingredients == ["beef", "eggs"]
+        assert meal.carnivore_level == CarnivoreLevel.STRICT
+        assert meal.source == EventSource.VOICE
+        assert meal.breaks_fast is True and meal.needs_confirmation is False
+        assert meal.to_dict()["summary"] == "Bife com ovos"
+        assert len(MEAL_ROW) == len(MEAL_EVENT_COLUMNS)
+
+    def test_other_events_from_row(self):
+        fast = FastingEvent.from_row((1, 5, "2025-03-01T20:00:00", "2025-03-02T12:00:00"))
+        assert fast.duration_hours == 16.0
+        assert FastingEvent.from_row((2, 5, "2025-03-02T20:00:00", None)).is_active
+        symptom = SymptomEvent.from_row((3, 5, "2025-03-01T09:00:00", "headache", 2, None))
+        assert symptom.symptom_type == SymptomType.HEADACHE and symptom.notes == ""
+        weight = WeightEvent.from_row((4, 5, "2025-03-01T07:00:00", 88.5, "jejum"))
+        assert weight.weight_kg == 88.5 and weight.id == 4
+        with pytest.raises(ValueError):
+            SymptomEvent.from_row((3, 5, "2025-03-01T09:00:00", "headache", 9, ""))
+
+    def test_models_are_slotted(self):
+        meal = MealEvent.from_row(MEAL_ROW)
+        assert not hasattr(meal, "__dict__")
+        with pytest.raises(AttributeError):
+            meal.colour = "red"
+        assert not hasattr(DailyStats(date="2025-03-01"), "__dict__")
+
+
+class TestMealEventBatch:
+    def rows(self):
+        yield MEAL_ROW
+        yield (8, 123, "2025-03-01T19:00:00", "[]", "[]", "relaxed", 1, "[]", 400.0, 30.0, 25.0, 2.0, "", "text", "whole", 0)
+        yield (9, 123, "2025-03-02T00:15:00", "[]", "[]", "strict", 1, "[]", None, None, None, None, "", "text", "whole", 0)
+
+    def test_totals_and_daily_buckets(self):
+        batch = MealEventBatch.from_rows(self.rows())
+        assert len(batch) == 3
+        totals = batch.totals()
+        assert totals["total_calories"] == 1000 and totals["total_carbs_g"] == 2
+        assert totals["carnivore_compliance"] == pytest.approx(200 / 3)
+        days = batch.daily_totals()
+        assert list(days) == ["2025-03-01", "2025-03-02"]
+        assert days["2025-03-01"] == {"calories": 1000.0, "protein": 80.0, "fat": 65.0, "meals": 2, "strict": 1}
+
+    def test_append_model_matches_row(self):
+        from_rows = MealEventBatch.from_rows([MEAL_ROW])
+        from_model = MealEventBatch()
+        from_model.append(MealEvent.from_row(MEAL_ROW))
+        assert from_model.totals() == from_rows.totals()
+        assert list(from_model.timestamps) == list(from_rows.timestamps)
+
+    def test_numpy_views(self):
+        import numpy as np
+        columns = MealEventBatch.from_rows(self.rows()).to_numpy()
+        assert columns["calories"].tolist() == [600.0, 400.0, 0.0]
+        assert columns["datetime"][0] == np.datetime64("2025-03-01T12:30:00")
+        assert columns["strict"].tolist() == [True, False, True]
+        assert len(MealEventBatch().to_numpy()["id"]) == 0
+
+
 class TestEnums:
     def test_symptom_types(self):
         assert SymptomType.DIZZINESS.value == "dizziness"
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+import prompt_builder
+import rag_dense
+import rag_ingest
+from llm_backends import CircuitBreaker
+from prompt_builder import RetrievalCache, augment_prompt, build_context, estimate_tokens, retrieve
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    (tmp_path / "a.md").write_text(
+        "## Electrolytes\nSodium, potassium and magnesium prevent cramps.\n"
+        "## Bacon\nBacon and eggs for breakfast.\n"
+        "## Ribeye\nRibeye with butter and salt.\n",
+        encoding="utf-8",
+    )
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({"files": [{"path": "a.md"}]}))
+    path = str(tmp_path / "index")
+    rag_ingest.ingest(str(manifest), path, embedder="hashing:64")
+    prompt_builder.get_cache().clear()
+    return path
+
+
+def chunk(text, source="rag/a.md"):
+    return {"id": text, "source": source, "text": text}
+
+
+class TestBuildContext:
+    def test_respects_budget(self):
+        chunks = [chunk("x" * 400), chunk("y" * 400), chunk("z" * 400)]
+        context = build_context(chunks, budget_tokens=250)
+        assert estimate_tokens(context) <= 250
+        assert "[1] (a.md)" in context and "[2]" in context and "[3]" not in context
+
+    def test_truncates_single_oversized_chunk(self):
+        context = build_context([chunk("w" * 4000)], budget_tokens=100)
+        assert context.startswith(prompt_builder.CONTEXT_HEADER)
+        assert estimate_tokens(context) <= 100
+
+    def test_empty(self):
+        assert build_context([], 500) == ""
+        assert build_context([chunk("a")], 0) == ""
+
+
+class TestRetrieve:
+    def test_finds_relevant_chunk(self, index_dir):
+        hits = retrieve("magnesium cramps", k=1, index_dir=index_dir)
+        assert "magnesium" in hits[0]["text"]
+
+    def test_cache_hit_until_corpus_changes(self, index_dir, tmp_path):
+        cache = prompt_builder.get_cache()
+        retrieve("bacon", k=2, index_dir=index_dir)
+        retrieve("  Bacon ", k=2, index_dir=index_dir)
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        (tmp_path / "a.md").write_text("## Bacon\nCrispy bacon only.\n", encoding="utf-8")
+        rag_ingest.ingest(str(tmp_path / "manifest.json"), index_dir, embedder="hashing:64")
+        hits = retrieve("bacon", k=2, index_dir=index_dir)
+        assert cache.misses == 2
+        assert hits[0]["text"] == "## Bacon Crispy bacon only."
+
+    def test_missing_index(self, tmp_path):
+        assert retrieve("bacon", index_dir=str(tmp_path / "none")) == []
+
+
+class TestAugmentPrompt:
+    def test_prepends_context(self, index_dir):
+        prompt = augment_prompt("Sugira uma refeição.", "ribeye butter", "suggestion", index_dir=index_dir)
+        assert prompt.startswith(prompt_builder.CONTEXT_HEADER)
+        assert prompt.endswith("Sugira uma refeição.")
+        assert "Ribeye with butter" in prompt
+
+    def test_no_index_leaves_prompt_unchanged(self, tmp_path):
+        assert augment_prompt("P", "bacon", "guru", index_dir=str(tmp_path)) == "P"
+
+    def test_logs_token_count(self, index_dir, caplog):
+        with caplog.at_level("INFO", logger="prompt_builder"):
+            augment_prompt("P", "bacon", "recipe", index_dir=index_dir)
+        assert "prompt[recipe]: ~" in caplog.text
+
+
+@pytest.fixture
+def embed_breaker(monkeypatch):
+    breaker = CircuitBreaker("rag_embed", failure_threshold=1, reset_timeout=60)
+    monkeypatch.setattr(rag_dense, "embed_breaker", breaker)
+    return breaker
+
+
+class TestRetrievalDeadline:
+    def test_slow_retrieval_returns_plain_prompt(self, index_dir, embed_breaker, monkeypatch):
+        release = threading.Event()
+        monkeypatch.setattr(prompt_builder, "retrieve", lambda *args, **kwargs: release.wait(5) and [])
+
+        async def ask():
+            start = time.perf_counter()
+            prompt = await prompt_builder.aaugment_prompt("P", "bacon", "guru", timeout=0.05, index_dir=index_dir)
+            elapsed = time.perf_counter() - start
+            release.set()
+            return prompt, elapsed
+
+        prompt, elapsed = asyncio.run(ask())
+        assert prompt == "P"
+        assert elapsed < 1
+        assert embed_breaker.state == "open"
+
+    def test_fast_retrieval_adds_context(self, index_dir, embed_breaker):
+        prompt = asyncio.run(prompt_builder.aaugment_prompt("P", "ribeye butter", "recipe", index_dir=index_dir))
+        assert "Ribeye with butter" in prompt
+
+    def test_open_breaker_means_bm25_only_and_uncached(self, index_dir, embed_breaker):
+        embed_breaker.record_failure()
+        hits = retrieve("magnesium cramps", k=1, index_dir=index_dir)
+
+        assert "magnesium" in hits[0]["text"]
+        assert embed_breaker.rejected == 1
+        assert len(prompt_builder.get_cache()) == 0
+
+
+class TestRetrievalCache:
+    def test_lru_eviction(self):
+        cache = RetrievalCache(maxsize=2)
+        cache.put(("a",), [])
+        cache.put(("b",), [])
+        cache.get(("a",))
+        cache.put(("c",), [])
+        assert cache.get(("b",)) is None
+        assert cache.get(("a",)) == []
+        assert len(cache) == 2
+
+    def test_concurrent_get_and_put(self):
+        # abandoned retrieval threads keep using the cache next to new ones
+        cache = RetrievalCache(maxsize=2)
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(5000):
+                    key = ((i + offset) % 5,)
+                    if cache.get(key) is None:
+                        cache.put(key, [])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert len(cache) == 2
+        assert cache.hits + cache.misses == 20000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
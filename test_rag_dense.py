@@ -0,0 +1,142 @@
+import json
+import numpy as np
+import pytest
+import rag_dense
+import rag_ingest
+from llm_backends import CircuitBreaker
+from rag_dense import DenseIndex, HashingEmbedder, build_dense, get_embedder, quantize_int8
+
+DOCS = [
+    "Ribeye with butter and salt. Sear the ribeye steak.",
+    "Electrolytes: sodium, potassium and magnesium during fasting.",
+    "Jejum prolongado e cãibras: reponha sódio e magnésio.",
+    "Bacon and eggs cooked in bacon fat.",
+]
+
+
+class TestEmbedders:
+    def test_hashing_is_deterministic(self):
+        embedder = HashingEmbedder(64)
+        a = embedder(["bacon and eggs"])
+        assert a.shape == (1, 64)
+        assert np.array_equal(a, embedder(["bacon and eggs"]))
+
+    def test_get_embedder(self):
+        assert get_embedder("hashing:32").dim == 32
+        assert get_embedder("ollama:nomic-embed-text").model == "nomic-embed-text"
+        with pytest.raises(ValueError):
+            get_embedder("nope")
+
+
+class TestQuantization:
+    def test_int8_roundtrip(self):
+        matrix = rag_dense.l2_normalize(np.random.default_rng(1).standard_normal((10, 32)).astype(np.float32))
+        q, scales = quantize_int8(matrix)
+        assert q.dtype == np.int8
+        assert np.abs(q * scales[:, None] - matrix).max() < 0.01
+
+    def test_zero_rows(self):
+        q, scales = quantize_int8(np.zeros((2, 4), dtype=np.float32))
+        assert not q.any()
+        assert (scales == 1.0).all()
+
+
+class TestDenseIndex:
+    @pytest.mark.parametrize("dtype", ["int8", "float16"])
+    def test_search(self, tmp_path, dtype):
+        meta = build_dense(DOCS, str(tmp_path), HashingEmbedder(256), dtype=dtype)
+        index = DenseIndex(str(tmp_path))
+
+        assert meta == {"embedder": "hashing:256", "dim": 256, "dtype": dtype, "documents": 4}
+        assert isinstance(index.vectors, np.memmap)
+        hits = index.search("bacon eggs", k=2)
+        assert hits[0][0] == 3
+        assert hits[0][1] > hits[1][1]
+
+    def test_batched_queries(self, tmp_path):
+        embedder = HashingEmbedder(256)
+        build_dense(DOCS, str(tmp_path), embedder)
+        results = DenseIndex(str(tmp_path)).search_vectors(embedder(["ribeye steak", "bacon"]), k=1)
+        assert [r[0][0] for r in results] == [0, 3]
+
+    def test_k_larger_than_corpus(self, tmp_path):
+        build_dense(DOCS, str(tmp_path), HashingEmbedder(64))
+        assert len(DenseIndex(str(tmp_path)).search("bacon", k=10)) == 4
+
+    def test_invalid_dtype(self, tmp_path):
+        with pytest.raises(ValueError):
+            build_dense(DOCS, str(tmp_path), HashingEmbedder(8), dtype="float64")
+
+
+class TestIngestIntegration:
+    def _manifest(self, tmp_path):
+        (tmp_path / "a.md").write_text("## Bacon\nBacon and eggs\n## Sal\nSodium and electrolytes\n")
+        manifest = tmp_path / "manifest.json"
+        manifest.write_text(json.dumps({"files": [{"path": "a.md"}]}))
+        return str(manifest)
+
+    def test_ingest_with_embedder(self, tmp_path):
+        index_dir = str(tmp_path / "index")
+        meta = rag_ingest.ingest(self._manifest(tmp_path), index_dir, embedder="hashing:128")
+
+        assert meta["dense"]["documents"] == 2
+        hits = rag_dense.search("sodium electrolytes", k=1, index_dir=index_dir)
+        assert hits[0]["id"].endswith("#1")
+
+    def test_ingest_without_embedder_removes_stale_vectors(self, tmp_path):
+        index_dir = str(tmp_path / "index")
+        manifest = self._manifest(tmp_path)
+        rag_ingest.ingest(manifest, index_dir, embedder="hashing:128")
+        meta = rag_ingest.ingest(manifest, index_dir)
+
+        assert meta["dense"] is None
+        assert rag_dense.search("bacon", index_dir=index_dir) == []
+
+
+class TestEmbedFailures:
+    def test_ollama_embedder_uses_client_with_timeout(self, monkeypatch):
+        import ollama
+
+        created = []
+
+        class FakeClient:
+            def __init__(self, timeout=None):
+                created.append(timeout)
+
+            def embed(self, model, input):
+                return {"embeddings": [[1.0, 0.0]] * len(input)}
+
+        monkeypatch.setattr(ollama, "Client", FakeClient)
+        embedder = get_embedder("ollama:nomic-embed-text", timeout=2.5)
+        assert embedder(["a", "b"]).shape == (2, 2)
+        embedder(["c"])
+        assert created == [2.5]
+
+    def test_failure_skips_dense_path_until_cooloff(self, tmp_path, monkeypatch):
+        now = [0.0]
+        breaker = CircuitBreaker("rag_embed", failure_threshold=1, reset_timeout=60, clock=lambda: now[0])
+        monkeypatch.setattr(rag_dense, "embed_breaker", breaker)
+        (tmp_path / "a.md").write_text("## Bacon\nBacon and eggs\n## Sal\nSodium and electrolytes\n")
+        (tmp_path / "manifest.json").write_text(json.dumps({"files": [{"path": "a.md"}]}))
+        index_dir = str(tmp_path / "index")
+        rag_ingest.ingest(str(tmp_path / "manifest.json"), index_dir, embedder="hashing:64")
+        index, _ = rag_dense.load_index(index_dir)
+        calls = []
+
+        def hanging(texts):
+            calls.append(texts)
+            raise TimeoutError("embed timed out")
+
+        index._embedder = hanging
+        assert rag_dense.search("bacon", index_dir=index_dir) == []
+        assert rag_dense.search("bacon", index_dir=index_dir) == []
+        assert len(calls) == 1
+
+        now[0] = 61.0
+        index._embedder = HashingEmbedder(64)
+        assert rag_dense.search("bacon", index_dir=index_dir)
+        assert breaker.state == "closed"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,215 @@
+import json
+import pytest
+import rag_ingest
+import rag_search
+from rag_ingest import chunk_text, ingest, is_carnivore_chunk, load_chunks, load_meta, split_sections
+
+
+def write_corpus(tmp_path, files):
+    manifest = {"corpus_name": "test", "version": "1.0", "files": []}
+    for name, text, requires_filtering in files:
+        (tmp_path / name).write_text(text, encoding="utf-8")
+        manifest["files"].append({
+            "path": name, "type": "recipes", "topic": ["cooking"],
+            "strictness": "mixed", "requires_filtering": requires_filtering,
+        })
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(manifest), encoding="utf-8")
+    return str(path)
+
+
+class TestChunking:
+    def test_overlap(self):
+        words = [f"w{i}" for i in range(25)]
+        chunks = chunk_text(" ".join(words), chunk_words=10, overlap=3)
+        assert chunks[0].split() == words[0:10]
+        assert chunks[1].split() == words[7:17]
+        assert chunks[-1].split()[-1] == "w24"
+        assert len(chunks) == 4
+
+    def test_short_and_empty_text(self):
+        assert chunk_text("a b c", chunk_words=10, overlap=2) == ["a b c"]
+        assert chunk_text("   ") == []
+
+    def test_invalid_overlap(self):
+        with pytest.raises(ValueError):
+            chunk_text("a b", chunk_words=5, overlap=5)
+
+    def test_markdown_sections(self):
+        text = "intro\n## Ribeye\nsal\n## Bacon\novos\n"
+        sections = split_sections(text, markdown=True)
+        assert sections == ["intro\n", "## Ribeye\nsal\n", "## Bacon\novos\n"]
+        assert split_sections(text, markdown=False) == [text]
+
+
+class TestFiltering:
+    def test_carnivore_chunk_kept(self):
+        assert is_carnivore_chunk("Sear the ribeye with salt and butter")
+
+    def test_forbidden_chunk_dropped(self):
+        assert not is_carnivore_chunk("Serve the steak with rice and beans")
+
+    def test_chunk_without_foods_kept(self):
+        assert is_carnivore_chunk("Ancestral diets and optimal health")
+
+
+class TestIngest:
+    def test_builds_index(self, tmp_path):
+        manifest = write_corpus(tmp_path, [
+            ("basics.md", "# Basics\nEat meat.\n## Recipe\nPicanha com sal e arroz\n", False),
+            ("book.md", "## A\nSteak and eggs\n## B\nSteak with potato and bread\n", True),
+        ])
+        index_dir = str(tmp_path / "index")
+        meta = ingest(manifest, index_dir)
+
+        assert (meta["sources"]["basics.md"]["chunks"], meta["sources"]["basics.md"]["dropped"]) == (2, 0)
+        assert (meta["sources"]["book.md"]["chunks"], meta["sources"]["book.md"]["dropped"]) == (1, 1)
+        chunks = load_chunks(index_dir)
+        assert len(chunks) == meta["chunk_count"] == 3
+        assert chunks[-1]["text"] == "## A Steak and eggs"
+        assert meta["sources"]["book.md"]["chunk_ids"] == [chunks[-1]["id"]]
+        assert chunks[-1]["id"].startswith("book.md@") and chunks[-1]["id"].endswith("#0")
+        assert load_meta(index_dir)["corpus_name"] == "test"
+
+    def test_missing_source_skipped(self, tmp_path):
+        manifest = write_corpus(tmp_path, [("ok.md", "bacon", False)])
+        data = json.loads(open(manifest).read())
+        data["files"].append({"path": "missing.pdf", "requires_filtering": True})
+        open(manifest, "w").write(json.dumps(data))
+
+        meta = ingest(manifest, str(tmp_path / "index"))
+        assert list(meta["sources"]) == ["ok.md"]
+
+    def test_missing_index(self, tmp_path):
+        assert load_chunks(str(tmp_path)) == []
+        assert load_meta(str(tmp_path)) is None
+
+    @pytest.mark.skipif(rag_ingest.pypdf is None, reason="pypdf not installed")
+    def test_real_manifest(self, tmp_path):
+        meta = ingest("rag_manifest.json", str(tmp_path / "index"))
+        assert meta["sources"]["rag/carnivore_basics.md"]["chunks"] > 0
+        pdf = meta["sources"]["rag/recipes/carnivore_code_cookbook_bookey.pdf"]
+        assert pdf["chunks"] > 0 and pdf["dropped"] > 0
+
+
+class TestIncrementalIngest:
+    def _setup(self, tmp_path):
+        manifest = write_corpus(tmp_path, [
+            ("a.md", "## Bacon\nBacon and eggs\n## Sal\nSodium and electrolytes\n", False),
+            ("b.md", "## Ribeye\nRibeye with butter\n", False),
+        ])
+        return manifest, str(tmp_path / "index")
+
+    def test_unchanged_sources_are_reused(self, tmp_path, monkeypatch):
+        manifest, index_dir = self._setup(tmp_path)
+        first = ingest(manifest, index_dir)
+
+        calls = []
+        real = rag_ingest.iter_source_chunks
+        monkeypatch.setattr(rag_ingest, "iter_source_chunks", lambda *a: calls.append(a) or real(*a))
+        second = ingest(manifest, index_dir)
+
+        assert calls == []
+        assert second["changes"]["unchanged"] == ["a.md", "b.md"]
+        assert second["corpus_version"] == first["corpus_version"]
+        assert second["sources"]["a.md"]["chunk_ids"] == first["sources"]["a.md"]["chunk_ids"]
+
+    def test_changed_file_tombstones_old_chunks(self, tmp_path):
+        manifest, index_dir = self._setup(tmp_path)
+        first = ingest(manifest, index_dir)
+        (tmp_path / "b.md").write_text("## Ribeye\nRibeye with tallow\n", encoding="utf-8")
+        meta = ingest(manifest, index_dir)
+
+        assert meta["changes"]["changed"] == ["b.md"]
+        assert meta["corpus_version"] != first["corpus_version"]
+        assert meta["tombstones"] == 1
+        chunks = load_chunks(index_dir)
+        dead = [c for c in chunks if c.get("deleted")]
+        assert [c["id"] for c in dead] == first["sources"]["b.md"]["chunk_ids"]
+        assert [h["text"] for h in rag_search.search("ribeye", index_dir=index_dir)] == ["## Ribeye Ribeye with tallow"]
+
+    def test_tombstones_do_not_change_ranking(self, tmp_path):
+        manifest, index_dir = self._setup(tmp_path)
+        ingest(manifest, index_dir)
+        (tmp_path / "b.md").write_text("## Ribeye\nRibeye with tallow and bacon\n", encoding="utf-8")
+        assert ingest(manifest, index_dir)["tombstones"] == 1
+        fresh_dir = str(tmp_path / "fresh")
+        ingest(manifest, fresh_dir, full=True)
+
+        for query in ("bacon", "ribeye tallow", "sodium electrolytes"):
+            incremental = [(h["id"], h["score"]) for h in rag_search.search(query, k=4, index_dir=index_dir)]
+            fresh = [(h["id"], h["score"]) for h in rag_search.search(query, k=4, index_dir=fresh_dir)]
+            assert [i for i, _ in incremental] == [i for i, _ in fresh]
+            assert [s for _, s in incremental] == pytest.approx([s for _, s in fresh])
+
+    def test_removed_file_and_compaction(self, tmp_path):
+        manifest, index_dir = self._setup(tmp_path)
+        ingest(manifest, index_dir, embedder="hashing:64")
+        data = json.loads(open(manifest).read())
+        data["files"] = data["files"][1:]
+        open(manifest, "w").write(json.dumps(data))
+        meta = ingest(manifest, index_dir, embedder="hashing:64")
+
+        # 2 dead > 1 live: compacted away
+        assert meta["changes"]["removed"] == ["a.md"]
+        assert meta["tombstones"] == 0
+        assert [c["source"] for c in load_chunks(index_dir)] == ["b.md"]
+        assert meta["dense"]["documents"] == 1
+        assert rag_search.search("bacon", index_dir=index_dir) == []
+
+    def test_unreadable_source_keeps_its_chunks(self, tmp_path, monkeypatch):
+        manifest, index_dir = self._setup(tmp_path)
+        first = ingest(manifest, index_dir)
+        (tmp_path / "a.md").write_text("## Bacon\nBacon and tallow\n", encoding="utf-8")
+
+        def unreadable(entry, *args):
+            raise RuntimeError("PDF corrompido")
+        monkeypatch.setattr(rag_ingest, "iter_source_chunks", unreadable)
+        meta = ingest(manifest, index_dir)
+
+        assert meta["changes"]["failed"] == ["a.md"]
+        assert meta["changes"]["removed"] == []
+        assert meta["sources"]["a.md"] == first["sources"]["a.md"]
+        assert meta["tombstones"] == 0
+        assert [h["text"] for h in rag_search.search("bacon", index_dir=index_dir)] == ["## Bacon Bacon and eggs"]
+
+    def test_missing_source_is_failed_not_removed(self, tmp_path):
+        manifest, index_dir = self._setup(tmp_path)
+        ingest(manifest, index_dir)
+        (tmp_path / "a.md").unlink()
+        meta = ingest(manifest, index_dir)
+
+        assert meta["changes"]["failed"] == ["a.md"]
+        assert meta["changes"]["removed"] == []
+        assert meta["chunk_count"] == 3
+
+    def test_dense_rows_reused(self, tmp_path, monkeypatch):
+        import rag_dense
+        manifest, index_dir = self._setup(tmp_path)
+        ingest(manifest, index_dir, embedder="hashing:64")
+        (tmp_path / "b.md").write_text("## Ribeye\nRibeye with tallow\n", encoding="utf-8")
+
+        embedded = []
+        real = rag_dense.HashingEmbedder.__call__
+        monkeypatch.setattr(rag_dense.HashingEmbedder, "__call__", lambda self, t: embedded.extend(t) or real(self, t))
+        meta = ingest(manifest, index_dir, embedder="hashing:64")
+
+        assert embedded == ["## Ribeye Ribeye with tallow"]
+        assert meta["dense"]["documents"] == 4
+        hits = rag_dense.search("ribeye tallow", k=4, index_dir=index_dir)
+        assert hits[0]["text"] == "## Ribeye Ribeye with tallow"
+        assert all(not h.get("deleted") for h in hits)
+
+    def test_full_rebuild(self, tmp_path):
+        manifest, index_dir = self._setup(tmp_path)
+        ingest(manifest, index_dir)
+        (tmp_path / "b.md").write_text("## Ribeye\nRibeye with tallow\n", encoding="utf-8")
+        ingest(manifest, index_dir)
+        meta = ingest(manifest, index_dir, full=True)
+
+        assert meta["tombstones"] == 0
+        assert meta["changes"]["added"] == ["a.md", "b.md"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
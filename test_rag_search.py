@@ -0,0 +1,93 @@
+import os
+import pytest
+import rag_search
+from rag_search import BM25Index, analyze, build_bm25
+
+DOCS = [
+    "Ribeye with butter and salt. Sear the ribeye steak.",
+    "Electrolytes: sodium, potassium and magnesium during fasting.",
+    "Jejum prolongado e cãibras: reponha sódio e magnésio.",
+    "Bacon and eggs cooked in bacon fat.",
+]
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    path = str(tmp_path / "index")
+    build_bm25(DOCS, path)
+    return path
+
+
+class TestAnalyzer:
+    def test_folds_accents_and_stopwords(self):
+        assert analyze("Jejum e cãibras com magnésio") == ["jejum", "caibra", "magnesio"]
+
+    def test_plural_strip(self):
+        assert analyze("eggs ovos the grass") == ["egg", "ovo", "grass"]
+
+
+class TestBM25:
+    def test_build_stats(self, tmp_path):
+        stats = build_bm25(DOCS, str(tmp_path / "i"))
+        assert stats["documents"] == 4
+        assert stats["terms"] > 10
+
+    def test_ranking(self, index_dir):
+        index = BM25Index(index_dir)
+        hits = index.search("ribeye steak", k=3)
+        assert hits[0][0] == 0
+        assert len(hits) == 1
+
+    def test_accent_insensitive_query(self, index_dir):
+        index = BM25Index(index_dir)
+        assert index.search("magnesio sodio", k=1)[0][0] == 2
+        assert {d for d, _ in index.search("magnesium", k=5)} == {1}
+
+    def test_top_k_sorted_and_bounded(self, index_dir):
+        index = BM25Index(index_dir)
+        hits = index.search("bacon sodium ribeye jejum", k=2)
+        assert len(hits) == 2
+        assert hits[0][1] >= hits[1][1]
+
+    def test_unknown_terms(self, index_dir):
+        assert BM25Index(index_dir).search("zzz qqq") == []
+
+    def test_postings_are_memory_mapped(self, index_dir):
+        import numpy as np
+        index = BM25Index(index_dir)
+        assert isinstance(index.docs, np.memmap)
+        assert isinstance(index.tfs, np.memmap)
+
+    def test_dead_documents_left_out_of_statistics(self, tmp_path):
+        with_dead = str(tmp_path / "dead")
+        build_bm25(DOCS + ["", "", ""], with_dead, dead={4, 5, 6})
+        build_bm25(DOCS, str(tmp_path / "fresh"))
+        index, fresh = BM25Index(with_dead), BM25Index(str(tmp_path / "fresh"))
+
+        assert index.doc_count == fresh.doc_count == 4
+        for query in ("ribeye steak", "bacon sodium ribeye jejum", "magnesio"):
+            assert index.search(query, k=4) == pytest.approx(fresh.search(query, k=4))
+
+
+class TestSearch:
+    def test_search_returns_chunks(self, tmp_path):
+        import json
+        manifest = tmp_path / "manifest.json"
+        (tmp_path / "a.md").write_text("## Bacon\nBacon and eggs\n## Sal\nSodium and electrolytes\n")
+        manifest.write_text(json.dumps({"files": [{"path": "a.md"}]}))
+        index_dir = str(tmp_path / "index")
+        import rag_ingest
+        meta = rag_ingest.ingest(str(manifest), index_dir)
+
+        hits = rag_search.search("electrolytes", k=3, index_dir=index_dir)
+        assert meta["bm25"]["documents"] == 2
+        assert len(hits) == 1 and hits[0]["id"].endswith("#1")
+        assert hits[0]["score"] > 0
+
+    def test_missing_index(self, tmp_path):
+        assert rag_search.search("bacon", index_dir=str(tmp_path / "none")) == []
+        assert not os.path.exists(tmp_path / "none")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
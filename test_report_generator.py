@@ -0,0 +1,157 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+
+import report_generator
+
+
+def meal_stream(n):
+    for i in range(n):
+        yield {
+            "datetime": f"2025-01-01T{i % 24:02d}:00:00",
+            "summary": f"Refeição {i}",
+            "calories": 500 + i,
+            "protein_g": 40,
+            "fat_g": 35,
+            "carnivore_level": "strict",
+            "source": "text",
+        }
+
+
+def read_csv(buffer):
+    return list(csv.reader(io.TextIOWrapper(buffer, encoding="utf-8", newline="")))
+
+
+class TestStreamingExports:
+    def test_csv_from_generator(self):
+        buffer = report_generator.export_to_csv("stream_test", meal_stream(1000), "all")
+        rows = read_csv(buffer)
+        assert rows[0] == report_generator.CSV_COLUMNS
+        assert len(rows) == 1001
+        assert rows[1][1] == "Refeição 0"
+
+    def test_csv_accepts_legacy_meal_shape(self):
+        meals = [{"time": "12:00", "summary": "Bife", "calories": 600, "macros": {"protein": 50, "fat": 40}}]
+        rows = read_csv(report_generator.export_to_csv("legacy_test", meals))
+        assert rows[1] == ["12:00", "Bife", "600", "50", "40", "unknown", "unknown"]
+
+    def test_json_streams_iterators(self):
+        data = {"meals": meal_stream(50), "summary": {"meal_count": 50}}
+        exported = json.load(report_generator.export_to_json("stream_test", data, "yearly"))
+        assert exported["date_range"] == "yearly"
+        assert len(exported["data"]["meals"]) == 50
+        assert exported["data"]["meals"][49]["calories"] == 549
+        assert exported["data"]["summary"] == {"meal_count": 50}
+
+    def test_json_stream_matches_json_dumps(self):
+        value = {"a": [1, {"b": None}], "c": "ção", "d": (), "e": 1.5}
+        buffer = io.StringIO()
+        report_generator.write_json_stream(buffer, value)
+        assert json.loads(buffer.getvalue()) == json.loads(json.dumps(value))
+
+
+class TestInMemoryDelivery:
+    def test_buffers_are_rewound_and_named(self):
+        buffer = report_generator.export_to_csv("u", meal_stream(3), "weekly")
+        assert buffer.tell() == 0
+        assert buffer.name.startswith("export_weekly_") and buffer.name.endswith(".csv")
+
+    def test_gzip_csv_and_json(self):
+        plain = report_generator.export_to_csv("u", meal_stream(2000), "all")
+        packed = report_generator.export_to_csv("u", meal_stream(2000), "all", compress=True)
+        assert packed.name.endswith(".csv.gz")
+        assert gzip.decompress(packed.getvalue()) == plain.getvalue()
+        assert len(packed.getvalue()) < len(plain.getvalue()) / 4
+
+        packed_json = report_generator.export_to_json("u", {"meals": meal_stream(10)}, "all", compress=True)
+        assert len(json.loads(gzip.decompress(packed_json.getvalue()))["data"]["meals"]) == 10
+
+    def test_concurrent_exports_do_not_share_state(self):
+        a = report_generator.export_to_csv("same_name", meal_stream(1), "daily")
+        b = report_generator.export_to_csv("same_name", meal_stream(5), "daily")
+        assert len(read_csv(a)) == 2 and len(read_csv(b)) == 6
+
+    def test_html_reports(self):
+        meals = [{"time": "12:00", "summary": "Picanha", "calories": 800, "macros": {"protein": 60, "fat": 60}}]
+        daily = report_generator.generate_daily_report("u", "2025-01-01", meals, {"protein": 60, "fat": 60, "calories": 800})
+        assert daily.name == "report_2025-01-01.html"
+        assert "Picanha" in daily.getvalue().decode("utf-8")
+
+        weekly = report_generator.generate_weekly_report("u", {
+            "total_meals": 1, "avg_daily_calories": 800, "compliance": 100.0, "weight_change": 0,
+            "avg_daily_protein": 60, "avg_daily_fat": 60, "fasts_completed": 0, "total_fasting_hours": 0,
+            "symptoms_logged": 0, "daily_breakdown": {"2025-01-01": {"calories": 800}},
+        })
+        assert b"<html" in weekly.getvalue()
+
+
+class TestTemplates:
+    def test_css_is_shared_and_inlined(self):
+        assert report_generator.BASE_CSS in report_generator.DAILY_CSS
+        assert report_generator.BASE_CSS in report_generator.WEEKLY_CSS
+        html = report_generator.generate_daily_report("u", "2025-01-01", [], {}).getvalue().decode("utf-8")
+        assert ".meal-item {" in html
+        assert report_generator.NO_MEALS_HTML in html
+        assert report_generator.NO_CHART_HTML in html
+
+    def test_user_text_is_escaped(self):
+        meals = [{"time": "08:00", "summary": "<script>x</script>", "calories": 1, "macros": {}, "source": "voice"}]
+        html = report_generator.generate_daily_report("<b>", "2025-01-01", meals, {}).getvalue().decode("utf-8")
+        assert "<script>" not in html
+        assert "&lt;script&gt;" in html and "&lt;b&gt;" in html
+        assert "🎙️" in html
+
+    def test_one_fragment_per_meal(self):
+        meals = [{"time": f"{h:02d}:00", "summary": f"M{h}", "calories": 100, "macros": {"protein": 10, "fat": 5}}
+                 for h in range(6)]
+        html = report_generator.generate_daily_report("u", "d", meals, {"protein": 60, "fat": 30, "calories": 600})
+        text = html.getvalue().decode("utf-8")
+        assert text.count('class="meal-item"') == 6
+        assert text.count('class="timeline-item"') == 6
+
+
+def period_summary(days, weights=()):
+    return {
+        "period": "yearly", "start_date": "2024-01-01", "end_date": "2024-12-31",
+        "days_tracked": len(days), "total_meals": sum(d["meals"] for d in days),
+        "avg_daily_calories": 1800, "avg_daily_protein": 150, "avg_daily_fat": 120,
+        "compliance": 90.0, "weight_change": -4.0, "fasts_completed": 3, "total_fasting_hours": 50.0,
+        "symptoms_logged": 2, "daily_rollups": list(days), "daily_weights": list(weights),
+    }
+
+
+def rollup(day, meals=3, strict=3):
+    return {"date": day, "meals": meals, "calories": 1800, "protein": 150, "fat": 120, "carbs": 0, "strict": strict}
+
+
+class TestPeriodReport:
+    def test_charts_heatmap_and_weight_curve(self):
+        days = [rollup("2024-01-01"), rollup("2024-06-15", strict=1), rollup("2024-12-31", meals=2, strict=0)]
+        weights = [{"date": "2024-01-01", "weight_kg": 92.0}, {"date": "2024-12-31", "weight_kg": 88.0}]
+        report = report_generator.generate_period_report("<ana>", period_summary(days, weights))
+        html = report.getvalue().decode("utf-8")
+        assert report.name == "yearly_report_2024-12-31.html"
+        assert "Relatório Anual" in html and "&lt;ana&gt;" in html
+        assert html.count("<polyline") == 4  # calories, protein, fat, weight
+        # one cell per calendar day (2024 is a leap year) plus the Monday alignment
+        assert html.count('class="cell lvl') == 366
+        assert html.count('class="cell lvl4"') == 1
+        assert html.count('class="cell lvl2"') == 1
+        assert html.count('class="cell lvl1"') == 1
+
+    def test_empty_period(self):
+        html = report_generator.generate_period_report("u", period_summary([])).getvalue().decode("utf-8")
+        assert report_generator.NO_CHART_HTML in html
+        assert report_generator.NO_WEIGHT_HTML in html
+
+    def test_render_cost_independent_of_meal_count(self):
+        light = report_generator.generate_period_report("u", period_summary([rollup("2024-03-01", meals=1)]))
+        heavy = report_generator.generate_period_report("u", period_summary([rollup("2024-03-01", meals=10_000)]))
+        # same markup whatever the meal volume: only the numbers change
+        assert light.getvalue().count(b"<") == heavy.getvalue().count(b"<")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,98 @@
+import sqlite3
+import pytest
+from sharding import extract_user_id, shard_for_user
+from supervisor import ShardedDispatcher
+
+
+def recording_worker(index, queue, db_path):
+    """Writes every update it handles into a shared SQLite file"""
+    import database
+    database.DB_NAME = db_path
+    conn = database.get_connection()
+    try:
+        while True:
+            payload = queue.get()
+            if payload is None:
+                break
+            message = payload["message"]
+            conn.execute(
+                "INSERT INTO handled (worker, user_id, seq) VALUES (?, ?, ?)",
+                (index, message["from"]["id"], int(message["text"])),
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def make_update(update_id, user_id, seq):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+            "text": str(seq),
+        },
+    }
+
+
+class TestSharding:
+    def test_stable_and_in_range(self):
+        for user_id in range(1000):
+            shard = shard_for_user(user_id, 4)
+            assert 0 <= shard < 4
+            assert shard == shard_for_user(user_id, 4)
+
+    def test_spreads_users(self):
+        counts = [0] * 4
+        for user_id in range(10_000):
+            counts[shard_for_user(user_id, 4)] += 1
+        assert min(counts) > 2000
+
+    def test_single_shard(self):
+        assert shard_for_user(123, 1) == 0
+
+    def test_extract_user_id(self):
+        assert extract_user_id(make_update(1, 42, 0)) == 42
+        assert extract_user_id({"update_id": 1, "callback_query": {"id": "x", "from": {"id": 7}}}) == 7
+        assert extract_user_id({"update_id": 1, "poll": {"id": "p"}}) is None
+
+
+class TestShardedDispatcher:
+    def test_invalid_worker_count(self):
+        with pytest.raises(ValueError):
+            ShardedDispatcher(0, recording_worker)
+
+    def test_per_user_ordering_across_workers(self, tmp_path):
+        db_path = str(tmp_path / "shared.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE handled (id INTEGER PRIMARY KEY AUTOINCREMENT, worker INTEGER, user_id INTEGER, seq INTEGER)")
+        conn.commit()
+        conn.close()
+
+        users = list(range(100, 120))
+        dispatcher = ShardedDispatcher(3, recording_worker, args=(db_path,))
+        dispatcher.start()
+        update_id = 0
+        for seq in range(10):
+            for user_id in users:
+                update_id += 1
+                dispatcher.dispatch(make_update(update_id, user_id, seq))
+        dispatcher.stop(timeout=30)
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT worker, user_id, seq FROM handled ORDER BY id").fetchall()
+        conn.close()
+
+        assert len(rows) == len(users) * 10
+        for user_id in users:
+            user_rows = [r for r in rows if r[1] == user_id]
+            assert {r[0] for r in user_rows} == {shard_for_user(user_id, 3)}
+            assert [r[2] for r in user_rows] == list(range(10))
+        assert len({r[0] for r in rows}) == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
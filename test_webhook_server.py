@@ -0,0 +1,123 @@
+import asyncio
+import json
+import pytest
+from webhook_server import WebhookServer, post_update
+
+UPDATE = {
+    "update_id": 1001,
+    "message": {
+        "message_id": 1,
+        "date": 1736700000,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        "text": "comi picanha",
+    },
+}
+
+
+async def _raw_request(port: int, raw: bytes) -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    data = await reader.read(1024)
+    writer.close()
+    return data
+
+
+def _post(path: str, body: bytes, extra_headers: str = "") -> bytes:
+    return (
+        f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n{extra_headers}\r\n"
+    ).encode() + body
+
+
+def run_with_server(scenario, secret_token=None):
+    received = []
+
+    async def handle(payload):
+        received.append(payload)
+
+    async def main():
+        server = WebhookServer(handle, host="127.0.0.1", port=0, path="/telegram", secret_token=secret_token)
+        await server.start()
+        try:
+            return await scenario(server.bound_port)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main()), received
+
+
+class TestWebhookServer:
+    def test_accepts_update(self):
+        body = json.dumps(UPDATE).encode()
+        response, received = run_with_server(lambda port: _raw_request(port, _post("/telegram", body)))
+
+        assert response.startswith(b"HTTP/1.1 200")
+        assert received == [UPDATE]
+
+    def test_secret_token_required(self):
+        body = json.dumps(UPDATE).encode()
+        response, received = run_with_server(
+            lambda port: _raw_request(port, _post("/telegram", body)), secret_token="s3cr3t")
+
+        assert response.startswith(b"HTTP/1.1 403")
+        assert received == []
+
+    def test_secret_token_accepted(self):
+        body = json.dumps(UPDATE).encode()
+        header = "X-Telegram-Bot-Api-Secret-Token: s3cr3t\r\n"
+        response, received = run_with_server(
+            lambda port: _raw_request(port, _post("/telegram", body, header)), secret_token="s3cr3t")
+
+        assert response.startswith(b"HTTP/1.1 200")
+        assert len(received) == 1
+
+    def test_wrong_path(self):
+        body = json.dumps(UPDATE).encode()
+        response, received = run_with_server(lambda port: _raw_request(port, _post("/other", body)))
+        assert response.startswith(b"HTTP/1.1 404")
+        assert received == []
+
+    def test_get_not_allowed(self):
+        raw = b"GET /telegram HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n"
+        response, _ = run_with_server(lambda port: _raw_request(port, raw))
+        assert response.startswith(b"HTTP/1.1 405")
+
+    def test_invalid_json(self):
+        response, received = run_with_server(lambda port: _raw_request(port, _post("/telegram", b"{not json")))
+        assert response.startswith(b"HTTP/1.1 400")
+        assert received == []
+
+    def test_keep_alive_multiple_updates(self):
+        async def scenario(port):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            statuses = []
+            for update_id in (1, 2, 3):
+                body = json.dumps({"update_id": update_id}).encode()
+                writer.write(
+                    f"POST /telegram HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+                status_line = await reader.readline()
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                statuses.append(status_line)
+            writer.close()
+            return statuses
+
+        statuses, received = run_with_server(scenario)
+        assert all(s.startswith(b"HTTP/1.1 200") for s in statuses)
+        assert [u["update_id"] for u in received] == [1, 2, 3]
+
+    def test_post_update_helper(self):
+        async def scenario(port):
+            url = f"http://127.0.0.1:{port}/telegram"
+            return await asyncio.to_thread(post_update, url, UPDATE, "s3cr3t")
+
+        status, received = run_with_server(scenario, secret_token="s3cr3t")
+        assert status == 200
+        assert received == [UPDATE]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
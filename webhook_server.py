@@ -0,0 +1,196 @@
+"""
+Minimal embedded HTTP server for Telegram webhooks.
+
+Telegram (or a reverse proxy in front of several bot processes) POSTs each
+update as JSON to `path`. The server checks the secret token header,
+decodes the body and hands the payload to `handle_update`, answering 200
+as soon as the update is queued. Built on asyncio streams only, so it
+needs no extra dependency.
+
+Replay recorded updates against a running instance:
+
+    python webhook_server.py --url http://127.0.0.1:8443/telegram --secret s3cr3t update.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import urllib.error
+import urllib.request
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+MAX_BODY_BYTES = 1024 * 1024
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class WebhookServer:
+    def __init__(
+        self,
+        handle_update: Callable[[Dict], Awaitable[None]],
+        host: str = "0.0.0.0",
+        port: int = 8443,
+        path: str = "/telegram",
+        secret_token: Optional[str] = None,
+    ):
+        self.handle_update = handle_update
+        self.host = host
+        self.port = port
+        self.path = path if path.startswith("/") else f"/{path}"
+        self.secret_token = secret_token
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    @property
+    def bound_port(self) -> int:
+        """Actual port (useful when started with port=0)"""
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Webhook server ouvindo em http://{self.host}:{self.bound_port}{self.path}")
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            keep_alive = True
+            while keep_alive:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status = await self._dispatch(method, path, headers, body)
+                self._write_response(writer, status, keep_alive)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except _HttpError as e:
+            self._write_response(writer, e.status, keep_alive=False)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict, bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise _HttpError(400)
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        body = b""
+        if method == "POST":
+            if "content-length" not in headers:
+                raise _HttpError(411)
+            try:
+                length = int(headers["content-length"])
+            except ValueError:
+                raise _HttpError(400)
+            if length > MAX_BODY_BYTES:
+                raise _HttpError(413)
+            body = await reader.readexactly(length)
+        return method, target.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, method: str, path: str, headers: Dict, body: bytes) -> int:
+        if path != self.path:
+            return 404
+        if method != "POST":
+            return 405
+        if self.secret_token and headers.get(SECRET_HEADER) != self.secret_token:
+            logger.warning("Webhook recebido com secret token inválido")
+            return 403
+        try:
+            payload = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return 400
+        if not isinstance(payload, dict) or "update_id" not in payload:
+            return 400
+        try:
+            await self.handle_update(payload)
+        except Exception as e:
+            logger.error(f"Erro ao enfileirar update {payload.get('update_id')}: {e}")
+            return 500
+        return 200
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, keep_alive: bool):
+        connection = "keep-alive" if keep_alive else "close"
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Length: 0\r\nConnection: {connection}\r\n\r\n".encode("latin-1")
+        )
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status
+
+
+def post_update(url: str, payload: Dict, secret_token: Optional[str] = None, timeout: float = 10.0) -> int:
+    """POST one update JSON to a webhook URL and return the HTTP status"""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    if secret_token:
+        request.add_header("X-Telegram-Bot-Api-Secret-Token", secret_token)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Telegram updates against a webhook")
+    parser.add_argument("files", nargs="+", help="JSON files with one update (or a list of updates)")
+    parser.add_argument("--url", default="http://127.0.0.1:8443/telegram")
+    parser.add_argument("--secret")
+    args = parser.parse_args()
+
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for update in data if isinstance(data, list) else [data]:
+            status = post_update(args.url, update, args.secret)
+            print(f"{path} update_id={update.get('update_id')} -> {status}")
+
+
+if __name__ == "__main__":
+    main()